@@ -0,0 +1,135 @@
+# async_db.py
+import itertools
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
+class AsyncDatabaseManager:
+    """
+    Runs DatabaseManager calls (or any other blocking work) on worker threads and
+    hands the results back to the Tk event loop, so the window never freezes on a
+    slow server.
+
+    Results are delivered through after() on the Tk thread. Work submitted with a
+    key supersedes earlier work with the same key: a pending call is cancelled and
+    a running one has its result dropped when it finishes. Work submitted as serial
+    runs on a single writer thread, one call after another in submission order.
+
+    :param root: Tk widget whose event loop receives the results.
+    :param db_manager: DatabaseManager the call() shortcut dispatches to.
+    :param max_workers: Number of worker threads.
+    :param poll_interval: Milliseconds between checks for finished work.
+    """
+    def __init__(self, root, db_manager, max_workers=4, poll_interval=20):
+        self.root = root
+        self.db_manager = db_manager
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        # Callables waiting to run on the Tk thread
+        self._pending = queue.Queue()
+        self._latest = {}  # key -> (token, future) of the most recent submission
+        self._lock = threading.Lock()
+        self._tokens = itertools.count()
+        self._closed = False
+        self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, fn, *args, key=None, callback=None, errback=None, serial=False, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on a worker thread.
+
+        :param key: Optional name for the request; a newer submission with the same key makes this one stale.
+        :param callback: Called on the Tk thread with the result.
+        :param errback: Called on the Tk thread with the exception; defaults to logging it.
+        :param serial: Run on the writer thread, after everything submitted as serial before it.
+        :return: The concurrent.futures.Future of the call.
+        """
+        token = next(self._tokens)
+        executor = self.writer if serial else self.executor
+        future = executor.submit(self._run, key, fn, args, kwargs)
+        if key is not None:
+            with self._lock:
+                previous = self._latest.get(key)
+                self._latest[key] = (token, future)
+            if previous is not None:
+                previous[1].cancel()  # Only succeeds if it hasn't started yet
+        future.add_done_callback(
+            lambda done: self._pending.put(lambda: self._deliver(key, token, done, callback, errback))
+        )
+        return future
+
+    def call(self, method_name, *args, key=None, callback=None, errback=None, **kwargs):
+        """
+        Shortcut for submit(getattr(db_manager, method_name), ...).
+        """
+        method = getattr(self.db_manager, method_name)
+        return self.submit(method, *args, key=key, callback=callback, errback=errback, **kwargs)
+
+    def post(self, fn, *args):
+        """
+        Schedules fn(*args) on the Tk thread. Safe to call from worker threads.
+        """
+        self._pending.put(lambda: fn(*args))
+
+    def is_current(self, key, future):
+        with self._lock:
+            latest = self._latest.get(key)
+        return latest is not None and latest[1] is future
+
+    @staticmethod
+    def _run(key, fn, args, kwargs):
+        # The key names the UI action in the query statistics
+        with instrumentation.action(key):
+            return fn(*args, **kwargs)
+
+    def _deliver(self, key, token, future, callback, errback):
+        if future.cancelled():
+            return
+        if key is not None:
+            with self._lock:
+                latest = self._latest.get(key)
+                if latest is None or latest[0] != token:
+                    return  # The user has moved on, drop the stale result
+                del self._latest[key]
+        error = future.exception()
+        if error is not None:
+            if errback is not None:
+                errback(error)
+            else:
+                logger.error("Background task failed", exc_info=error)
+        elif callback is not None:
+            callback(future.result())
+
+    def _poll(self):
+        while True:
+            try:
+                task = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                task()
+            except Exception:
+                logger.exception("Error delivering background result")
+        if not self._closed:
+            self.root.after(self.poll_interval, self._poll)
+
+    def shutdown(self, wait_for_writes=None):
+        """
+        Stops the workers. Reads not yet started are cancelled; serial work already
+        submitted still runs, since it is usually a change the user saved.
+
+        :param wait_for_writes: Seconds to wait for that serial work; None waits until it is done.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        # shutdown(wait=True) can't be bounded, so queue a marker behind the writes and wait for it
+        writes_done = threading.Event()
+        self.writer.submit(writes_done.set)
+        self.writer.shutdown(wait=False)
+        writes_done.wait(wait_for_writes)
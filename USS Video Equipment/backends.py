@@ -0,0 +1,417 @@
+# backends.py
+import datetime
+import decimal
+import os
+import re
+import sqlite3
+import mysql.connector
+from mysql.connector import errors
+
+# Embedded database used when DatabaseManager runs without a server
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "equipment.sqlite3")
+
+class MySQLBackend:
+    """
+    The MySQL server configured in modules/connect.py.
+    """
+    name = "mysql"
+    insert_ignore = "INSERT IGNORE"
+
+    def __init__(self, host, user, passwd, database):
+        self.host = host
+        self.user = user
+        self.passwd = passwd
+        self.database = database
+
+    def connect(self):
+        return mysql.connector.connect(
+            host=self.host,
+            user=self.user,
+            passwd=self.passwd,
+            database=self.database
+        )
+
+    def table_exists(self, cursor, table):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+            (table,)
+        )
+        return cursor.fetchone()[0] > 0
+
+    def column_exists(self, cursor, table, column):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+            (table, column)
+        )
+        return cursor.fetchone()[0] > 0
+
+    def index_exists(self, cursor, table, index_name):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+            (table, index_name)
+        )
+        return cursor.fetchone()[0] > 0
+
+    def create_table_statements(self, ddl):
+        """
+        :param ddl: CREATE TABLE statement as written by mysqldump.
+        :return: Statements that create the table on this backend.
+        """
+        return [ddl]
+
+    def table_ddl(self, cursor, table):
+        """
+        :return: The table's CREATE TABLE statement in MySQL syntax.
+        """
+        cursor.execute(f"SHOW CREATE TABLE `{table}`")
+        row = cursor.fetchone()
+        if row is None:
+            raise RuntimeError(f"Could not read the structure of table {table}")
+        return row[1]
+
+    def disable_checks(self, cursor):
+        cursor.execute("SET SESSION unique_checks = 0")
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+
+    def enable_checks(self, cursor):
+        cursor.execute("SET SESSION unique_checks = 1")
+        cursor.execute("SET SESSION foreign_key_checks = 1")
+
+    def disable_keys(self, cursor, table):
+        cursor.execute(f"ALTER TABLE `{table}` DISABLE KEYS")
+
+    def enable_keys(self, cursor, table):
+        cursor.execute(f"ALTER TABLE `{table}` ENABLE KEYS")
+
+    def replace_table(self, cursor, staging, table, index_statements=()):
+        """
+        Puts a fully loaded staging table in place of table; RENAME TABLE swaps both
+        names in one step, so readers never see the table missing. MySQL commits
+        each of these statements on its own.
+        """
+        cursor.execute(f"DROP TABLE IF EXISTS `{table}__old`")
+        if self.table_exists(cursor, table):
+            cursor.execute(f"RENAME TABLE `{table}` TO `{table}__old`, `{staging}` TO `{table}`")
+            cursor.execute(f"DROP TABLE `{table}__old`")
+        else:
+            cursor.execute(f"RENAME TABLE `{staging}` TO `{table}`")
+        for statement in index_statements:
+            cursor.execute(statement)
+
+# sqlite3 error -> the mysql.connector error DatabaseManager and the pool already handle
+_ERROR_TYPES = (
+    (sqlite3.IntegrityError, errors.IntegrityError),
+    (sqlite3.DataError, errors.DataError),
+    (sqlite3.InterfaceError, errors.InterfaceError),
+    (sqlite3.NotSupportedError, errors.NotSupportedError),
+    (sqlite3.ProgrammingError, errors.ProgrammingError),
+)
+# OperationalError also covers bad SQL; only these mean the connection itself is unusable
+_CONNECTION_FAILURES = ("database is locked", "unable to open", "disk i/o error", "database disk image is malformed")
+
+def _translate_error(error):
+    for sqlite_type, mysql_type in _ERROR_TYPES:
+        if isinstance(error, sqlite_type):
+            return mysql_type(msg=str(error))
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error)
+        if any(failure in message.lower() for failure in _CONNECTION_FAILURES):
+            return errors.OperationalError(msg=message)
+        return errors.ProgrammingError(msg=message)
+    return errors.DatabaseError(msg=str(error))
+
+def _to_date(value):
+    try:
+        return datetime.date.fromisoformat(value.decode()[:10])
+    except ValueError:
+        return None  # Zero dates from MySQL dumps, which the connector also returns as None
+
+def _to_datetime(value):
+    try:
+        return datetime.datetime.fromisoformat(value.decode())
+    except ValueError:
+        return None
+
+# Values come back as the same Python types mysql.connector returns
+sqlite3.register_adapter(decimal.Decimal, str)
+sqlite3.register_adapter(datetime.date, datetime.date.isoformat)
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(sep=" "))
+sqlite3.register_converter("date", _to_date)
+sqlite3.register_converter("datetime", _to_datetime)
+sqlite3.register_converter("timestamp", _to_datetime)
+sqlite3.register_converter("decimal", lambda value: decimal.Decimal(value.decode()))
+
+class SQLiteCursor:
+    """
+    The part of the mysql.connector cursor API the app uses, over a sqlite3 cursor.
+    %s placeholders are rewritten to ?, and the prepared/buffered options are
+    accepted and ignored: sqlite3 keeps its own per-connection statement cache and
+    its cursors already step through results lazily.
+    """
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection.conn.cursor()
+
+    def execute(self, query, params=None):
+        try:
+            self._cursor.execute(self._connection.adapt(query), tuple(params) if params else ())
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def executemany(self, query, seq_params):
+        try:
+            self._cursor.executemany(self._connection.adapt(query), seq_params)
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+class SQLiteConnection:
+    """
+    The part of the mysql.connector connection API the app and ConnectionPool use,
+    over a sqlite3 connection.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.conn = None
+        self._queries = {}  # MySQL query text -> SQLite text, so sqlite3's statement cache sees the same string
+        self.reconnect()
+
+    def adapt(self, query):
+        adapted = self._queries.get(query)
+        if adapted is None:
+            if len(self._queries) > 1024:
+                self._queries.clear()  # IN lists of every length would otherwise pile up
+            adapted = self._queries[query] = query.replace("%s", "?").replace("%%", "%")
+        return adapted
+
+    def cursor(self, **kwargs):
+        return SQLiteCursor(self)
+
+    @property
+    def in_transaction(self):
+        return self.conn.in_transaction
+
+    def start_transaction(self):
+        try:
+            self.conn.execute("BEGIN")
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def commit(self):
+        try:
+            self.conn.commit()
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def rollback(self):
+        try:
+            self.conn.rollback()
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def ping(self, reconnect=False):
+        try:
+            self.conn.execute("SELECT 1")
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def reconnect(self, attempts=1, delay=0):
+        if self.conn is not None:
+            self.conn.close()
+        try:
+            self.conn = self.backend.open()
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def close(self):
+        self.conn.close()
+
+_AUTO_INCREMENT_COLUMN = re.compile(r"(`\w+`)\s+(?:int|bigint|integer)(?:\(\d+\))?(?:\s+unsigned)?\s+NOT NULL\s+AUTO_INCREMENT", re.I)
+_INDEX_LINE = re.compile(r"^\s*(UNIQUE\s+)?KEY\s+`(\w+)`\s+\(([^)]*)\)", re.I)
+_PRIMARY_KEY_LINE = re.compile(r"^\s*PRIMARY KEY\s+\(", re.I)
+_TEXT_COLUMN = re.compile(r"^(\s*`\w+`\s+(?:varchar\(\d+\)|char\(\d+\)|text|tinytext|mediumtext|longtext))", re.I)
+_MYSQL_ONLY = re.compile(r"\s+(?:CHARACTER SET \w+|COLLATE \w+|ON UPDATE CURRENT_TIMESTAMP(?:\(\d*\))?|unsigned(?!\w))", re.I)
+_SQLITE_INDEX = re.compile(r"CREATE\s+(UNIQUE\s+)?INDEX\s+\S+\s+ON\s+\S+\s*\((.*)\)", re.I | re.S)
+_BARE_COLUMN = re.compile(r"^\"?(\w+)\"?(?=\s)")
+
+def _split_definitions(body):
+    """
+    :return: The comma-separated column definitions of a CREATE TABLE body, ignoring
+        commas inside parentheses such as decimal(10,2).
+    """
+    definitions, depth, start = [], 0, 0
+    for position, char in enumerate(body):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            definitions.append(body[start:position].strip())
+            start = position + 1
+    definitions.append(body[start:].strip())
+    return [definition for definition in definitions if definition]
+
+class SQLiteBackend:
+    """
+    Embedded SQLite database file, for laptops with no reachable server.
+
+    Connections run in WAL mode, so readers on the worker threads never wait for a
+    writer, with synchronous=NORMAL (durable across application crashes, at most the
+    last commits lost on power failure), an in-memory temp store and a memory-mapped
+    read path. Tables are created from the MySQL DDL with text columns compared
+    case-insensitively, so filters and ORDER BY name behave like the server's
+    _ci collation.
+
+    :param path: Database file; created on first use.
+    :param busy_timeout: Seconds a writer waits for another writer before failing.
+    :param cache_kb: Page cache per connection, in KiB.
+    :param mmap_bytes: Bytes of the file read through mmap.
+    """
+    name = "sqlite"
+    insert_ignore = "INSERT OR IGNORE"
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH, busy_timeout=5.0, cache_kb=20000, mmap_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.database = path
+        self.busy_timeout = busy_timeout
+        self.cache_kb = cache_kb
+        self.mmap_bytes = mmap_bytes
+
+    def open(self):
+        # The pool hands a connection to one thread at a time, so cross-thread use is safe
+        conn = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False, cached_statements=256
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_kb)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_bytes)}")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def connect(self):
+        return SQLiteConnection(self)
+
+    def table_exists(self, cursor, table):
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+        return cursor.fetchone()[0] > 0
+
+    def column_exists(self, cursor, table, column):
+        cursor.execute("SELECT COUNT(*) FROM pragma_table_info(%s) WHERE name = %s", (table, column))
+        return cursor.fetchone()[0] > 0
+
+    def index_exists(self, cursor, table, index_name):
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s", (table, index_name))
+        return cursor.fetchone()[0] > 0
+
+    def create_table_statements(self, ddl):
+        """
+        Translates a mysqldump CREATE TABLE: the AUTO_INCREMENT key becomes an INTEGER
+        PRIMARY KEY, KEY lines become CREATE INDEX statements, text columns get
+        COLLATE NOCASE and MySQL-only options are dropped.
+        """
+        lines = ddl.strip().splitlines()
+        header, body = lines[0], lines[1:-1]
+        table = re.search(r"`(\w+)`", header).group(1)
+        auto_increment = _AUTO_INCREMENT_COLUMN.search(ddl)
+        columns, indexes = [], []
+        for line in body:
+            line = line.rstrip().rstrip(",")
+            index = _INDEX_LINE.match(line)
+            if index:
+                unique, index_name, index_columns = index.groups()
+                indexes.append(f"CREATE {'UNIQUE ' if unique else ''}INDEX `{index_name}` ON `{table}` ({index_columns})")
+                continue
+            if _PRIMARY_KEY_LINE.match(line) and auto_increment:
+                continue  # Already declared on the column itself
+            if auto_increment and line.strip().startswith(auto_increment.group(1)):
+                columns.append(f"  {auto_increment.group(1)} INTEGER PRIMARY KEY AUTOINCREMENT")
+                continue
+            line = _MYSQL_ONLY.sub("", line)
+            line = _TEXT_COLUMN.sub(r"\1 COLLATE NOCASE", line)
+            columns.append(line)
+        return [f"{header}\n" + ",\n".join(columns) + "\n)"] + indexes
+
+    def table_ddl(self, cursor, table):
+        """
+        Rebuilds a MySQL CREATE TABLE from the SQLite schema, so backups taken on a
+        laptop restore onto the server.
+        """
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+        row = cursor.fetchone()
+        if row is None:
+            raise RuntimeError(f"Could not read the structure of table {table}")
+        sql = re.sub(r"\s+COLLATE NOCASE", "", row[0], flags=re.I)
+        # Columns added by ALTER TABLE are appended to the stored text as-is, so
+        # split the definitions rather than trusting its line breaks
+        columns, keys = [], []
+        for definition in _split_definitions(sql[sql.index("(") + 1:sql.rindex(")")]):
+            definition = _BARE_COLUMN.sub(r"`\1`", definition)
+            primary = re.match(r"(`\w+`)\s+INTEGER PRIMARY KEY AUTOINCREMENT", definition, re.I)
+            if primary:
+                definition = f"{primary.group(1)} int NOT NULL AUTO_INCREMENT"
+                keys.append(f"  PRIMARY KEY ({primary.group(1)})")
+            columns.append(f"  {definition}")
+        cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL ORDER BY name", (table,))
+        for index_name, index_sql in cursor.fetchall():
+            match = _SQLITE_INDEX.match(index_sql)
+            if match:
+                unique, index_columns = match.groups()
+                keys.append(f"  {'UNIQUE ' if unique else ''}KEY `{index_name}` ({index_columns})")
+        return f"CREATE TABLE `{table}` (\n" + ",\n".join(columns + keys) + "\n) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci"
+
+    def disable_checks(self, cursor):
+        cursor.execute("PRAGMA foreign_keys = OFF")
+
+    def enable_checks(self, cursor):
+        cursor.execute("PRAGMA foreign_keys = ON")
+
+    def disable_keys(self, cursor, table):
+        pass  # SQLite has no deferred index maintenance; one big transaction is what keeps loads fast
+
+    def enable_keys(self, cursor, table):
+        pass
+
+    def replace_table(self, cursor, staging, table, index_statements=()):
+        """
+        Puts a fully loaded staging table in place of table. SQLite DDL is
+        transactional, so the drop, rename and index builds are committed together
+        here, or rolled back together if any of them fails.
+        """
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS `{table}`")
+            cursor.execute(f"ALTER TABLE `{staging}` RENAME TO `{table}`")
+            for statement in index_statements:
+                cursor.execute(statement)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
@@ -0,0 +1,169 @@
+# backup.py
+import datetime
+import decimal
+import gzip
+import os
+
+# The server's default collation isn't understood by older MySQL/MariaDB servers we restore onto
+SOURCE_COLLATION = "utf8mb4_0900_ai_ci"
+TARGET_COLLATION = "utf8mb4_general_ci"
+
+# Start a new INSERT statement once the current one reaches this size, like mysqldump's net_buffer_length
+MAX_INSERT_BYTES = 1024 * 1024
+
+# Same escapes as mysql_real_escape_string, which mysqldump uses
+_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "'": "\\'",
+    '"': '\\"',
+    "\0": "\\0",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\x1a": "\\Z",
+})
+
+def sql_literal(value):
+    """
+    Formats a value the way mysqldump writes it in an INSERT statement.
+
+    :param value: Value from a result row.
+    :return: SQL literal text.
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, datetime.datetime):
+        return f"'{value.isoformat(sep=' ')}'"
+    if isinstance(value, datetime.date):
+        return f"'{value.isoformat()}'"
+    if isinstance(value, (bytes, bytearray)):
+        return f"0x{value.hex()}" if value else "''"
+    return f"'{str(value).translate(_ESCAPES)}'"
+
+def dump_header(database):
+    return (
+        "-- Equipment Tracker SQL dump\n"
+        "--\n"
+        f"-- Database: {database}\n"
+        "-- ------------------------------------------------------\n\n"
+        "/*!40101 SET @OLD_CHARACTER_SET_CLIENT=@@CHARACTER_SET_CLIENT */;\n"
+        "/*!40101 SET @OLD_CHARACTER_SET_RESULTS=@@CHARACTER_SET_RESULTS */;\n"
+        "/*!40101 SET @OLD_COLLATION_CONNECTION=@@COLLATION_CONNECTION */;\n"
+        "/*!50503 SET NAMES utf8mb4 */;\n"
+        "/*!40103 SET @OLD_TIME_ZONE=@@TIME_ZONE */;\n"
+        "/*!40103 SET TIME_ZONE='+00:00' */;\n"
+        "/*!40014 SET @OLD_UNIQUE_CHECKS=@@UNIQUE_CHECKS, UNIQUE_CHECKS=0 */;\n"
+        "/*!40014 SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0 */;\n"
+        "/*!40101 SET @OLD_SQL_MODE=@@SQL_MODE, SQL_MODE='NO_AUTO_VALUE_ON_ZERO' */;\n"
+        "/*!40111 SET @OLD_SQL_NOTES=@@SQL_NOTES, SQL_NOTES=0 */;\n\n"
+    )
+
+def dump_footer():
+    return (
+        "/*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;\n\n"
+        "/*!40101 SET SQL_MODE=@OLD_SQL_MODE */;\n"
+        "/*!40014 SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS */;\n"
+        "/*!40014 SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS */;\n"
+        "/*!40101 SET CHARACTER_SET_CLIENT=@OLD_CHARACTER_SET_CLIENT */;\n"
+        "/*!40101 SET CHARACTER_SET_RESULTS=@OLD_CHARACTER_SET_RESULTS */;\n"
+        "/*!40101 SET COLLATION_CONNECTION=@OLD_COLLATION_CONNECTION */;\n"
+        "/*!40111 SET SQL_NOTES=@OLD_SQL_NOTES */;\n\n"
+        f"-- Dump completed on {datetime.datetime.now():%Y-%m-%d %H:%M:%S}\n"
+    )
+
+def table_ddl(db_manager, table, collation=TARGET_COLLATION):
+    """
+    :return: CREATE TABLE statement of the table, in MySQL syntax whatever the backend,
+        with the target collation swapped in.
+    """
+    with db_manager.create_connection() as conn:
+        cursor = conn.cursor()
+        ddl = db_manager.backend.table_ddl(cursor, table)
+        cursor.close()
+    return ddl.replace(SOURCE_COLLATION, collation)
+
+def open_output(output_file, compress):
+    if compress:
+        return gzip.open(output_file, "wt", encoding="utf-8", newline="\n")
+    return open(output_file, "w", encoding="utf-8", newline="\n")
+
+def backup_table(db_manager, output_file, table="equipment", chunk_size=1000, compress=None, collation=TARGET_COLLATION, progress=None):
+    """
+    Writes a mysqldump-compatible backup of a table without leaving the process.
+    Rows are streamed from the server in chunks and written as multi-row INSERT
+    statements as they arrive, so memory stays flat however big the table is.
+    The dump is written to a temporary file and only replaces output_file once
+    it is complete.
+
+    :param db_manager: DatabaseManager to read from.
+    :param output_file: Path of the dump.
+    :param table: Table to back up.
+    :param chunk_size: Rows fetched from the server per round.
+    :param compress: Gzip the dump while writing; None decides by a .gz extension.
+    :param collation: Collation written into the table definition in place of the server default.
+    :param progress: Optional callable(rows_written), called after each chunk.
+    :return: Number of rows written.
+    """
+    if not table.replace("_", "").isalnum():
+        raise ValueError(f"Invalid table name: {table}")
+    if compress is None:
+        compress = output_file.lower().endswith(".gz")
+
+    ddl = table_ddl(db_manager, table, collation)
+    temp_file = f"{output_file}.tmp"
+    rows_written = 0
+    try:
+        with open_output(temp_file, compress) as out:
+            out.write(dump_header(db_manager.database))
+            out.write(
+                "--\n"
+                f"-- Table structure for table `{table}`\n"
+                "--\n\n"
+                f"DROP TABLE IF EXISTS `{table}`;\n"
+                "/*!40101 SET @saved_cs_client     = @@character_set_client */;\n"
+                "/*!50503 SET character_set_client = utf8mb4 */;\n"
+                f"{ddl};\n"
+                "/*!40101 SET character_set_client = @saved_cs_client */;\n\n"
+                "--\n"
+                f"-- Dumping data for table `{table}`\n"
+                "--\n\n"
+                f"LOCK TABLES `{table}` WRITE;\n"
+                f"/*!40000 ALTER TABLE `{table}` DISABLE KEYS */;\n"
+            )
+
+            statement_start = f"INSERT INTO `{table}` VALUES "
+            statement_size = 0  # Characters in the INSERT being written, 0 when none is open
+            for rows in db_manager.iter_rows(f"SELECT * FROM `{table}`", chunk_size=chunk_size):
+                for row in rows:
+                    values = f"({','.join(sql_literal(value) for value in row)})"
+                    if statement_size and statement_size + len(values) + 1 > MAX_INSERT_BYTES:
+                        out.write(";\n")
+                        statement_size = 0
+                    if statement_size:
+                        out.write(",")
+                    else:
+                        out.write(statement_start)
+                        statement_size = len(statement_start)
+                    out.write(values)
+                    statement_size += len(values) + 1
+                rows_written += len(rows)
+                if progress is not None:
+                    progress(rows_written)
+            if statement_size:
+                out.write(";\n")
+
+            out.write(
+                f"/*!40000 ALTER TABLE `{table}` ENABLE KEYS */;\n"
+                "UNLOCK TABLES;\n"
+            )
+            out.write(dump_footer())
+        os.replace(temp_file, output_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    return rows_written
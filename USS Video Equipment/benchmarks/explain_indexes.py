@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# benchmarks/explain_indexes.py
+"""
+Shows the MySQL query plans of the app's hot queries with and without the
+secondary indexes added by migrations.py, plus their average latency.
+
+"Before" plans are produced with IGNORE INDEX hints, so the schema is never
+modified unless --migrate is given.
+
+Usage (from the "USS Video Equipment" directory):
+    python benchmarks/explain_indexes.py [--migrate] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import DatabaseManager
+from migrations import EQUIPMENT_INDEXES, run_migrations
+
+def sample_values(db_manager):
+    def first(query):
+        rows = db_manager.fetch_data(query)
+        return rows[0][0] if rows else None
+    return {
+        "kit_name": first("SELECT kit_name FROM equipment WHERE kit_name IS NOT NULL LIMIT 1"),
+        "type": first("SELECT type FROM equipment WHERE type IS NOT NULL LIMIT 1"),
+        "owner": first("SELECT owner FROM equipment WHERE owner IS NOT NULL LIMIT 1"),
+        "name": first("SELECT name FROM equipment LIMIT 1"),
+    }
+
+def hot_queries(values):
+    # (label, SQL with {hint} after the table name, params)
+    return [
+        ("refresh_equipment_list (kit + type)",
+         "SELECT id, name FROM equipment {hint} WHERE kit_name = %s AND type = %s ORDER BY name",
+         (values["kit_name"], values["type"])),
+        ("refresh_equipment_list (owner + purchased)",
+         "SELECT id, name FROM equipment {hint} WHERE owner = %s AND not_purchased = FALSE ORDER BY name",
+         (values["owner"],)),
+        ("bulk_update_shipping_info (kit lookup)",
+         "SELECT id FROM equipment {hint} WHERE kit_name IN (%s)",
+         (values["kit_name"],)),
+        ("get_box_manifest",
+         "SELECT box_number, name, weight, kit_name FROM equipment {hint} WHERE box_number IS NOT NULL ORDER BY box_number, name",
+         ()),
+        ("get_distinct_values (kit_name)",
+         "SELECT kit_name FROM equipment {hint} WHERE kit_name IS NOT NULL GROUP BY kit_name",
+         ()),
+        ("update_equipment_name (lookup)",
+         "SELECT id FROM equipment {hint} WHERE name = %s",
+         (values["name"],)),
+    ]
+
+def explain(db_manager, query, params):
+    with db_manager.create_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("EXPLAIN " + query, params)
+        plan = cursor.fetchall()
+        cursor.close()
+    return plan
+
+def time_query(db_manager, query, params, repeat):
+    with db_manager.create_connection() as conn:
+        cursor = conn.cursor()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            cursor.execute(query, params)
+            cursor.fetchall()
+        elapsed = time.perf_counter() - start
+        cursor.close()
+    return elapsed / repeat * 1000
+
+def format_plan(plan):
+    return "; ".join(
+        f"type={row.get('type')} key={row.get('key')} rows={row.get('rows')} extra={row.get('Extra') or ''}"
+        for row in plan
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--migrate", action="store_true", help="apply pending migrations before comparing")
+    parser.add_argument("--repeat", type=int, default=20, help="executions per query when timing")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    if args.migrate:
+        print(f"Applied migrations: {run_migrations(db_manager) or 'none pending'}")
+
+    with db_manager.create_connection() as conn:
+        cursor = conn.cursor()
+        present = [name for name, _ in EQUIPMENT_INDEXES if db_manager.backend.index_exists(cursor, "equipment", name)]
+        cursor.close()
+    if not present:
+        print("None of the migration indexes exist yet; run with --migrate to see the 'after' plans.")
+    before_hint = f"IGNORE INDEX ({', '.join(present)})" if present else ""
+
+    for label, query, params in hot_queries(sample_values(db_manager)):
+        before_sql = query.format(hint=before_hint)
+        after_sql = query.format(hint="")
+        print(label)
+        print(f"  before: {format_plan(explain(db_manager, before_sql, params))}")
+        print(f"  after:  {format_plan(explain(db_manager, after_sql, params))}")
+        print(f"  avg ms: before {time_query(db_manager, before_sql, params, args.repeat):.3f}"
+              f" / after {time_query(db_manager, after_sql, params, args.repeat):.3f}")
+    db_manager.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# benchmarks/hot_paths.py
+"""
+Times the tracker's hot paths against seeded databases of increasing size and
+saves the results as JSON, tagged with the current commit, so runs can be
+compared across commits.
+
+Measured at every size (1k, 10k and 100k rows by default):
+    filter_query        the equipment list query behind refresh_equipment_list
+    snapshot_filter     the same filters answered from EquipmentSnapshot
+    equipment_details   get_equipment_details on random ids, detail cache cleared
+    boxes_pdf           generate_boxes_pdf (box manifest query + PDF)
+    export_xlsx         export_to_excel of the default columns
+    shipping_update     apply_shipping_info over --shipping-items items
+Measured once:
+    display_image       every picture in Pics, cold and from the memory cache
+    cold_start          a fresh interpreter importing main_app, plus building the
+                        window when a display is available
+
+Usage (from the "USS Video Equipment" directory):
+    python benchmarks/hot_paths.py [--backend sqlite|mysql] [--sizes 1000 10000 100000]
+                                   [--output results.json] [--compare previous.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from seed import DEFAULT_SQLITE_PATH, open_database, seed
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+def summarize(samples):
+    """
+    :param samples: Durations in seconds.
+    :return: Dict of timing statistics in milliseconds.
+    """
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "median_ms": statistics.median(ordered) * 1000,
+        "min_ms": ordered[0] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+    }
+
+def time_calls(fn, repeat, setup=None, warmup=True):
+    if warmup:
+        # First call pays for lazy imports and cold caches, which cold_start covers
+        if setup is not None:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+def commit_id():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=APP_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=APP_DIR, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(dirty)
+
+def bench_database(db_manager, repeat, shipping_items, workdir):
+    # Imported here so a broken import shows up as a benchmark error, not at startup
+    from main_app import MainApplication, write_boxes_pdf
+    from export import export_equipment, DEFAULT_EXPORT_COLUMNS
+    from snapshot import EquipmentSnapshot
+
+    rng = random.Random(7)
+    ids = [row[0] for row in db_manager.fetch_data("SELECT id FROM equipment")]
+    kit = db_manager.fetch_data("SELECT kit_name FROM equipment WHERE kit_name IS NOT NULL LIMIT 1")[0][0]
+    results = {}
+
+    # query_equipment_list only reads db_manager from the window, so it runs without Tk
+    app = types.SimpleNamespace(db_manager=db_manager)
+    filters = (
+        ("All Kits", "All Types", "All Owners", "Show All"),
+        (kit, "All Types", "All Owners", "Show All"),
+        ("All Kits", "Camera", "USS", "Show Purchased"),
+    )
+    results["filter_query"] = time_calls(
+        lambda: [MainApplication.query_equipment_list(app, *selection) for selection in filters], repeat
+    )
+
+    snapshot = EquipmentSnapshot(db_manager)
+    snapshot.load()
+    results["snapshot_filter"] = time_calls(
+        lambda: [snapshot.filter(kit_name=kit), snapshot.filter(type="Camera", owner="USS", not_purchased=False)], repeat
+    )
+
+    sample_ids = [rng.choice(ids) for _ in range(50)]
+    results["equipment_details"] = time_calls(
+        lambda: [db_manager.get_equipment_details(equipment_id) for equipment_id in sample_ids], repeat,
+        setup=db_manager.detail_cache.clear
+    )
+    results["equipment_details"]["calls_per_run"] = len(sample_ids)
+
+    pdf_path = os.path.join(workdir, "boxes.pdf")
+    results["boxes_pdf"] = time_calls(lambda: write_boxes_pdf(db_manager.get_box_manifest(), pdf_path), max(1, repeat // 2))
+
+    xlsx_path = os.path.join(workdir, "export.xlsx")
+    results["export_xlsx"] = time_calls(lambda: export_equipment(db_manager, xlsx_path, DEFAULT_EXPORT_COLUMNS), max(1, repeat // 2))
+
+    shipping_ids = rng.sample(ids, min(shipping_items, len(ids)))
+    info = {"carrier": "UPS", "tracking_number": "1Z999", "shipping_status": "Shipped"}
+    results["shipping_update"] = time_calls(
+        lambda: db_manager.bulk_update_shipping_info(info, equipment_ids=shipping_ids), repeat
+    )
+    results["shipping_update"]["items"] = len(shipping_ids)
+    return results
+
+def bench_images(repeat):
+    from image_cache import ThumbnailCache
+    from pics_index import PicsIndex
+    import utils
+
+    index = PicsIndex(use_inotify=False)
+    names = sorted(os.path.splitext(name)[0] for name in os.listdir(index.directory))
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        root = None  # No display: time the decode and cache path display_image sits on
+
+    def show_all(cache):
+        if root is not None:
+            frame = tk.Frame(root)
+            for name in names:
+                utils.display_image(frame, name, cache=cache, index=index)
+            root.update()
+            frame.destroy()
+        else:
+            for name in names:
+                path = index.path_for(name)
+                if path:
+                    cache.get_thumbnail(path)
+
+    cold = time_calls(lambda: show_all(ThumbnailCache(disk_dir=None)), repeat, warmup=False)
+    warm_cache = ThumbnailCache(disk_dir=None, memory_items=len(names) + 1)
+    show_all(warm_cache)
+    warm = time_calls(lambda: show_all(warm_cache), repeat)
+    if root is not None:
+        root.destroy()
+    return {"images": len(names), "tk": root is not None, "cold": cold, "memory_cache": warm}
+
+# Runs in a fresh interpreter; the window is pointed at the benchmark database
+COLD_START_CHILD = """
+import sys, time, json
+started = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+import main_app
+imported = time.perf_counter()
+result = {{"import_ms": (imported - started) * 1000}}
+try:
+    import tkinter
+    tkinter.Tk().destroy()
+except Exception:
+    pass
+else:
+    sys.path.insert(0, {bench_dir!r})
+    from seed import open_database
+    main_app.DatabaseManager = lambda: open_database({backend!r}, {path!r}, {database!r})
+    app = main_app.MainApplication()
+    app.update()
+    result["window_ms"] = (time.perf_counter() - started) * 1000
+    app.destroy()
+print(json.dumps(result))
+"""
+
+def bench_cold_start(repeat, backend, path, database):
+    child_code = COLD_START_CHILD.format(app_dir=APP_DIR, bench_dir=BENCH_DIR, backend=backend, path=path, database=database)
+    samples = {}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", child_code],
+                                   cwd=APP_DIR, capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+        child = json.loads(completed.stdout.strip().splitlines()[-1])
+        samples.setdefault("process", []).append(elapsed)
+        for key, value in child.items():
+            samples.setdefault(key.replace("_ms", ""), []).append(value / 1000)
+    return {key: summarize(values) for key, values in samples.items()}
+
+def compare(current, previous_file):
+    with open(previous_file, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nCompared with {previous.get('commit') or previous_file}:")
+    for size, benches in current["sizes"].items():
+        for name, stats in benches.items():
+            before = previous.get("sizes", {}).get(size, {}).get(name)
+            if before and "median_ms" in stats and before.get("median_ms"):
+                change = stats["median_ms"] / before["median_ms"] - 1
+                print(f"  {size:>7} {name:<18} {before['median_ms']:10.2f} -> {stats['median_ms']:10.2f} ms ({change:+.0%})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("mysql", "sqlite"), default="sqlite")
+    parser.add_argument("--path", default=DEFAULT_SQLITE_PATH, help="SQLite file (sqlite backend)")
+    parser.add_argument("--database", default="USS_Video_Equipment_bench", help="scratch database (mysql backend)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement")
+    parser.add_argument("--shipping-items", type=int, default=500)
+    parser.add_argument("--output", help="JSON file for the results (default: benchmarks/results/<commit>-<backend>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--skip-cold-start", action="store_true")
+    args = parser.parse_args()
+
+    commit, dirty = commit_id()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "backend": args.backend,
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+
+    db_manager = open_database(args.backend, args.path, args.database)
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            print(f"Seeding {size} rows...")
+            seed(db_manager, size)
+            report["sizes"][str(size)] = results = bench_database(db_manager, args.repeat, args.shipping_items, workdir)
+            for name, stats in results.items():
+                print(f"  {name:<18} median {stats['median_ms']:10.2f} ms  p95 {stats['p95_ms']:10.2f} ms")
+    db_manager.close()
+
+    report["display_image"] = bench_images(args.repeat)
+    print(f"display_image over {report['display_image']['images']} pictures: "
+          f"cold {report['display_image']['cold']['median_ms']:.1f} ms, cached {report['display_image']['memory_cache']['median_ms']:.1f} ms")
+    if not args.skip_cold_start:
+        report["cold_start"] = bench_cold_start(args.repeat, args.backend, args.path, args.database)
+        print(f"cold start: {json.dumps({key: round(value.get('median_ms', 0), 1) for key, value in report['cold_start'].items() if isinstance(value, dict)})}")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{(commit or 'unknown')[:10]}{'-dirty' if dirty else ''}-{args.backend}.json")
+    with open(output, "w", encoding="utf-8") as out:
+        json.dump(report, out, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# benchmarks/projection_bytes.py
+"""
+Compares how many bytes the server sends, and how long a fetch takes, when a
+selection loads the full row (SELECT *) versus only the columns it needs.
+
+Bytes are read from the session's Bytes_sent status counter, which counts what
+the server sent to this connection; the cost of the SHOW STATUS round trip itself
+is measured once and subtracted.
+
+Usage (from the "USS Video Equipment" directory):
+    python benchmarks/projection_bytes.py [--items 100]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import DatabaseManager
+
+# (label, columns) of the per-item fetches being compared; the first is the baseline
+PROJECTIONS = (
+    ("display_details (SELECT *)", "*"),
+    ("on_select image (id, name)", "id, name"),
+    ("box report row (name, weight, kit_name)", "name, weight, kit_name"),
+)
+
+def bytes_sent(cursor):
+    cursor.execute("SHOW SESSION STATUS LIKE 'Bytes_sent'")
+    return int(cursor.fetchone()[1])
+
+def measure(cursor, columns, ids, status_overhead):
+    before = bytes_sent(cursor)
+    start = time.perf_counter()
+    for equipment_id in ids:
+        cursor.execute(f"SELECT {columns} FROM equipment WHERE id = %s", (equipment_id,))
+        cursor.fetchall()
+    elapsed = time.perf_counter() - start
+    sent = bytes_sent(cursor) - before - status_overhead
+    return sent / len(ids), elapsed / len(ids) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100, help="number of items fetched per projection")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    ids = [row[0] for row in db_manager.fetch_data("SELECT id FROM equipment ORDER BY id LIMIT %s", (args.items,))]
+    if not ids:
+        print("The equipment table is empty.")
+        return
+
+    with db_manager.create_connection() as conn:
+        cursor = conn.cursor()
+        # What one SHOW STATUS round trip adds to the counter
+        first = bytes_sent(cursor)
+        status_overhead = bytes_sent(cursor) - first
+
+        baseline = None
+        for label, columns in PROJECTIONS:
+            per_row, ms = measure(cursor, columns, ids, status_overhead)
+            baseline = baseline or per_row
+            print(f"{label}")
+            print(f"  {per_row:8.0f} bytes/fetch ({per_row / baseline:.0%} of SELECT *), {ms:.3f} ms/fetch")
+        cursor.close()
+    db_manager.close()
+
+if __name__ == "__main__":
+    main()
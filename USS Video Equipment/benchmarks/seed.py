@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# benchmarks/seed.py
+"""
+Fills a scratch database with synthetic equipment rows for the benchmarks.
+
+The table layout is read from the CREATE TABLE in equipment_backup.sql, and the
+values follow each column's type, with the low-cardinality columns (kit, type,
+owner, box) spread the way a real inventory is. The same seed always produces
+the same rows.
+
+Two targets are supported:
+    mysql   a scratch database on the server configured in modules/connect.py
+    sqlite  a local file through the app's SQLite backend, used when no server
+            is reachable
+
+Usage (from the "USS Video Equipment" directory):
+    python benchmarks/seed.py --rows 10000 [--backend sqlite] [--path bench.sqlite3]
+"""
+import argparse
+import datetime
+import os
+import random
+import re
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+import db
+from backends import MySQLBackend, SQLiteBackend
+from db import DatabaseManager
+from migrations import run_migrations
+from pics_index import PICS_DIR
+from restore import iter_dump
+
+SCHEMA_DUMP = os.path.join(APP_DIR, "equipment_backup.sql")
+DEFAULT_SQLITE_PATH = os.path.join(APP_DIR, "benchmarks", "bench.sqlite3")
+
+_COLUMN_TYPE = re.compile(r"^\s+`([^`]+)`\s+(\w+)(?:\((\d+)(?:,(\d+))?\))?")
+
+TYPES = ("Camera", "Lens", "Tripod", "Microphone", "Light", "Cable", "Monitor", "Switcher",
+         "Recorder", "Audio", "Battery", "Case")
+OWNERS = ("USS", "Rental", "Client", "Staff", "Partner")
+STATUSES = ("Available", "In Use", "Shipped", "Repair")
+
+def schema_columns(dump_file=SCHEMA_DUMP):
+    """
+    :return: (CREATE TABLE text, list of (column, type, length, scale)) from the dump.
+    """
+    for item in iter_dump(dump_file):
+        if item[0] == "ddl":
+            ddl = item[1]
+            columns = []
+            for line in ddl.splitlines()[1:]:
+                match = _COLUMN_TYPE.match(line)
+                if match:
+                    name, type_, length, scale = match.groups()
+                    columns.append((name, type_.lower(), int(length) if length else None, int(scale) if scale else None))
+            return ddl, columns
+    raise RuntimeError(f"{dump_file} has no CREATE TABLE for equipment")
+
+def picture_names():
+    try:
+        return sorted(os.path.splitext(name)[0] for name in os.listdir(PICS_DIR))
+    except OSError:
+        return []
+
+def generate_rows(columns, count, seed=1):
+    """
+    Builds synthetic rows for the given columns (id excluded, it is left to the database),
+    plus not_purchased, which the migrations add.
+
+    :return: (column names, list of row tuples).
+    """
+    rng = random.Random(seed)
+    names = picture_names() or [f"Item {n}" for n in range(200)]
+    kits = [f"Kit {n:03d}" for n in range(max(1, count // 25))]
+    boxes = max(1, count // 40)
+    start = datetime.date(2015, 1, 1)
+    generated = [column for column in columns if column[0] != "id"]
+
+    def value(column, type_, length, scale, row_number):
+        if column == "name":
+            return f"{rng.choice(names)} {row_number}" if rng.random() < 0.3 else rng.choice(names)
+        if column == "kit_name":
+            return rng.choice(kits) if rng.random() < 0.5 else None
+        if column == "type":
+            return rng.choice(TYPES)
+        if column == "owner":
+            return rng.choice(OWNERS)
+        if column == "status":
+            return rng.choice(STATUSES)
+        if column == "box_number":
+            return rng.randint(1, boxes) if rng.random() < 0.6 else None
+        if column == "weight":
+            return round(rng.uniform(0.2, 60), 2)
+        if column == "serial_number":
+            return "".join(rng.choices("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789", k=10))
+        if column == "website_url":
+            return f"https://example.com/products/{row_number}"
+        if type_ == "date":
+            return None if rng.random() < 0.3 else start + datetime.timedelta(days=rng.randint(0, 3650))
+        if type_ in ("decimal", "float", "double"):
+            return round(rng.uniform(5, 5000), scale or 2)
+        if type_ in ("int", "bigint", "smallint", "tinyint"):
+            return rng.randint(0, 1000)
+        if type_ == "text":
+            return f"Synthetic {column.replace('_', ' ')} for item {row_number}. " * rng.randint(1, 4)
+        text = f"{column.replace('_', ' ').title()} {rng.randint(1, 500)}"
+        return text[:length] if length else text
+
+    rows = []
+    for row_number in range(1, count + 1):
+        row = [value(column, type_, length, scale, row_number) for column, type_, length, scale in generated]
+        row.append(rng.random() < 0.1)
+        rows.append(tuple(row))
+    return [column[0] for column in generated] + ["not_purchased"], rows
+
+def open_database(backend, path=DEFAULT_SQLITE_PATH, database=None):
+    """
+    :param backend: "mysql" or "sqlite".
+    :param path: SQLite file, for the sqlite backend.
+    :param database: Scratch MySQL database, for the mysql backend; it is created if missing.
+    :return: DatabaseManager connected to the benchmark database.
+    """
+    if backend == "sqlite":
+        return DatabaseManager(backend=SQLiteBackend(path))
+    server = MySQLBackend(db.host_ct, db.user_ct, db.passwd_ct, db.database_ct)
+    if database and database != server.database:
+        db_manager = DatabaseManager(pool_size=0, backend=server)
+        db_manager.execute_query(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+        db_manager.close()
+        server = MySQLBackend(db.host_ct, db.user_ct, db.passwd_ct, database)
+    return DatabaseManager(backend=server)
+
+def seed(db_manager, count, seed=1, batch_size=1000):
+    """
+    Drops and recreates the equipment table and fills it with count synthetic rows.
+    """
+    ddl, columns = schema_columns()
+    names, rows = generate_rows(columns, count, seed)
+    with db_manager.create_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DROP TABLE IF EXISTS equipment")
+        for statement in db_manager.backend.create_table_statements(ddl):
+            cursor.execute(statement)
+        cursor.execute("ALTER TABLE equipment ADD COLUMN not_purchased BOOLEAN DEFAULT FALSE")
+        insert = f"INSERT INTO equipment ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))})"
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(insert, rows[start:start + batch_size])
+        conn.commit()
+        cursor.close()
+    run_migrations(db_manager, reapply=True)
+    db_manager.clear_caches()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="number of rows to generate")
+    parser.add_argument("--backend", choices=("mysql", "sqlite"), default="sqlite")
+    parser.add_argument("--path", default=DEFAULT_SQLITE_PATH, help="SQLite file (sqlite backend)")
+    parser.add_argument("--database", default="USS_Video_Equipment_bench", help="scratch database (mysql backend)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    db_manager = open_database(args.backend, args.path, args.database)
+    seed(db_manager, args.rows, args.seed)
+    print(f"Seeded {args.rows} rows into {db_manager.database}")
+    db_manager.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,189 +1,1036 @@
 # db.py
-import mysql.connector
-from mysql.connector import Error
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from mysql.connector import Error, DataError, IntegrityError, InterfaceError, OperationalError, ProgrammingError
 import modules.connect as ct
+from backends import MySQLBackend, SQLiteBackend, DEFAULT_SQLITE_PATH
+from instrumentation import Instrumentation
+
+logger = logging.getLogger(__name__)
 
 remote = ct.remote
 local = ct.local
 server = local # local or remote
+backend_name = "mysql" # mysql for the server above, sqlite for the embedded database file (no server needed)
+sqlite_path = DEFAULT_SQLITE_PATH
+pool_size = 4 # 0 opens a new connection for every query
+slow_query_threshold = 0.5 # Seconds; slower statements go to the "db.slow" log. None turns it off
+
+# Columns read by get_box_manifest; writes to any of them drop the cached manifest
+BOX_MANIFEST_COLUMNS = ("box_number", "name", "weight", "kit_name")
+
+# Column order of SELECT * FROM equipment
+EQUIPMENT_COLUMNS = (
+    "id", "name", "type", "brand", "model", "serial_number", "purchase_company",
+    "date_of_purchase", "cost", "date_insured", "storage_location", "status",
+    "current_holder", "current_condition", "description", "website_url",
+    "model_number", "kit_name", "carrier", "tracking_number", "shipping_address",
+    "shipping_city", "shipping_state", "shipping_zip", "shipped_date", "box_number",
+    "shipping_destination_name", "shipping_status", "weight", "owner", "not_purchased",
+    "version", "client_key"
+)
+
+# Columns shown in the details pane, in display order; id and version are bookkeeping
+DISPLAY_COLUMNS = (
+    "name", "type", "brand", "model", "serial_number", "purchase_company",
+    "date_of_purchase", "cost", "date_insured", "storage_location", "status",
+    "current_holder", "current_condition", "description", "website_url",
+    "model_number", "kit_name", "carrier", "tracking_number", "shipping_address",
+    "shipping_city", "shipping_state", "shipping_zip", "shipped_date", "box_number",
+    "shipping_destination_name", "shipping_status", "weight", "owner", "not_purchased"
+)
+
+# Column types other than text; a UNION mixing types would hand every value back as a string
+COLUMN_TYPES = {
+    "id": "int", "box_number": "int", "version": "int", "not_purchased": "int",
+    "date_of_purchase": "date", "date_insured": "date", "shipped_date": "date",
+    "cost": "decimal", "weight": "float",
+}
+
+# Columns saved by the add/update form, in the order of the statements below
+FORM_COLUMNS = (
+    "name", "brand", "model", "description", "serial_number", "purchase_company",
+    "date_of_purchase", "cost", "website_url", "date_insured", "status", "model_number",
+    "kit_name", "type", "weight", "owner", "not_purchased"
+)
+# client_key is made up by the client for each new item, so a replayed insert can find the row it already added
+EQUIPMENT_INSERT = f"INSERT INTO equipment ({', '.join(FORM_COLUMNS)}, client_key) VALUES ({', '.join(['%s'] * (len(FORM_COLUMNS) + 1))})"
+# Every form save bumps version, so an edit made against an older copy of the row can tell
+EQUIPMENT_UPDATE = f"UPDATE equipment SET {', '.join(f'{column}=%s' for column in FORM_COLUMNS)}, version=version + 1 WHERE id=%s"
+EQUIPMENT_UPDATE_IF_VERSION = EQUIPMENT_UPDATE + " AND version=%s"
 host_ct = server.host
 user_ct = server.user
 passwd_ct = server.passwd
 database_ct = server.database
 
-class MySQLConnection:
-    def __init__(self, host, user, passwd, database):
-        self.host = host
-        self.user = user
-        self.passwd = passwd
-        self.database = database
+def default_backend():
+    """
+    :return: The backend selected by backend_name.
+    """
+    if backend_name == "sqlite":
+        return SQLiteBackend(sqlite_path)
+    return MySQLBackend(host_ct, user_ct, passwd_ct, database_ct)
+
+# column names -> record class, so each result shape builds its namedtuple only once
+_record_types = {}
+_record_types_lock = threading.Lock()
+
+def record_type(columns):
+    """
+    Returns the Equipment record class for a list of result columns. Records are
+    namedtuples: fields are read by name, and they take no more memory than a plain
+    tuple because they have no per-instance __dict__.
+
+    :param columns: Column names, in result order.
+    :return: namedtuple class named Equipment.
+    """
+    key = tuple(columns)
+    cls = _record_types.get(key)
+    if cls is None:
+        with _record_types_lock:
+            cls = _record_types.get(key)
+            if cls is None:
+                cls = _record_types[key] = namedtuple("Equipment", key, rename=True)
+    return cls
+
+Equipment = record_type(EQUIPMENT_COLUMNS)
+
+class DirectConnection:
+    """
+    Context manager that opens a new connection through a backend and closes it on exit.
+    """
+    def __init__(self, backend):
+        self.backend = backend
         
     def __enter__(self):
-        self.conn = mysql.connector.connect(
-            host=self.host, 
-            user=self.user, 
-            passwd=self.passwd, 
-            database=self.database
-        )
+        self.conn = self.backend.connect()
         return self.conn
     
     def __exit__(self, exc_type, exc_value, traceback):
         self.conn.close()
 
+class PoolTimeoutError(Error):
+    pass
+
+class WriteConflict(Error):
+    pass
+
+# Errors meaning the server couldn't be reached rather than that it refused the statement;
+# writes let these through so the caller can queue the change in the journal instead
+CONNECTION_ERRORS = (OperationalError, InterfaceError)
+
+class StatementCache:
+    """
+    LRU of server-side prepared statements for one connection, keyed by SQL text.
+    Only the thread that has the connection checked out may use it.
+
+    :param conn: Connection the statements are prepared on.
+    :param max_size: Statements kept prepared before the least recently used one is closed.
+    :param count: Callable(stat name) that records hits, misses and evictions.
+    """
+    def __init__(self, conn, max_size, count):
+        self.conn = conn
+        self.max_size = max_size
+        self._count = count
+        self._cursors = OrderedDict()  # SQL text -> (the same text, prepared cursor)
+
+    def execute(self, query, params=None):
+        """
+        Runs a statement, preparing it on the server the first time it is seen.
+        The returned cursor belongs to the cache and must not be closed.
+        """
+        entry = self._cursors.get(query)
+        if entry is None:
+            self._count('statement_misses')
+            entry = (query, self.conn.cursor(prepared=True))
+            self._cursors[query] = entry
+            while len(self._cursors) > self.max_size:
+                _, (_, evicted) = self._cursors.popitem(last=False)
+                self._close(evicted)
+                self._count('statement_evictions')
+        else:
+            self._count('statement_hits')
+            self._cursors.move_to_end(query)
+        # The connector only skips re-preparing when it is handed the very same string object
+        cached_query, cursor = entry
+        try:
+            cursor.execute(cached_query, params)
+        except Error:
+            self._cursors.pop(query, None)
+            self._close(cursor)
+            raise
+        return cursor
+
+    def _close(self, cursor):
+        try:
+            cursor.close()  # Also deallocates the statement on the server
+        except Error:
+            pass
+
+    def close(self):
+        for _, cursor in self._cursors.values():
+            self._close(cursor)
+        self._cursors.clear()
+
+class ConnectionPool:
+    """
+    Keeps a bounded set of open connections and hands them out on demand.
+
+    :param backend: Backend the connections are opened through (see backends.py).
+    :param size: Maximum number of connections open at the same time.
+    :param timeout: Seconds to wait for a free connection before giving up (None waits forever).
+    :param ping_after: Idle seconds after which a connection is pinged before it is handed out.
+    :param statement_cache_size: Prepared statements kept per connection; 0 turns them off.
+    """
+    def __init__(self, backend, size=4, timeout=30, ping_after=5, statement_cache_size=32):
+        self.backend = backend
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._idle = queue.LifoQueue()  # LIFO so the most recently used socket goes out first
+        self._lock = threading.Lock()
+        self._open = 0
+        self.statement_cache_size = statement_cache_size
+        self._statements = {}  # id(conn) -> StatementCache, kept for as long as the connection lives
+        self.stats = {
+            'checkouts': 0, 'waits': 0, 'reconnects': 0, 'created': 0, 'discarded': 0,
+            'statement_hits': 0, 'statement_misses': 0, 'statement_evictions': 0
+        }
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _connect(self):
+        conn = self.backend.connect()
+        self._count('created')
+        return conn
+
+    def acquire(self):
+        self._count('checkouts')
+        try:
+            conn, released_at = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._open < self.size
+                if can_open:
+                    self._open += 1
+            if can_open:
+                try:
+                    return self._connect()
+                except Error:
+                    with self._lock:
+                        self._open -= 1
+                    raise
+            # Pool exhausted, wait for another caller to hand a connection back
+            self._count('waits')
+            try:
+                conn, released_at = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise PoolTimeoutError(msg=f"No pooled connection became free within {self.timeout}s")
+        return self._check_health(conn, released_at)
+
+    def _check_health(self, conn, released_at):
+        # Only pay for a ping when the socket has been sitting long enough to go stale
+        if time.monotonic() - released_at < self.ping_after:
+            return conn
+        try:
+            conn.ping(reconnect=False)
+            return conn
+        except Error:
+            pass
+        self._count('reconnects')
+        # Statements prepared on the old session are gone with it
+        self._forget_statements(conn)
+        try:
+            conn.reconnect(attempts=1, delay=0)
+            return conn
+        except Error:
+            self.discard(conn)
+            raise
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Error:
+            self.discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    def statements(self, conn):
+        """
+        :return: The StatementCache of a checked-out connection, or None when prepared statements are off.
+        """
+        if not self.statement_cache_size:
+            return None
+        with self._lock:
+            cache = self._statements.get(id(conn))
+            if cache is None or cache.conn is not conn:
+                cache = self._statements[id(conn)] = StatementCache(conn, self.statement_cache_size, self._count)
+            return cache
+
+    def _forget_statements(self, conn):
+        with self._lock:
+            cache = self._statements.get(id(conn))
+            if cache is not None and cache.conn is conn:
+                del self._statements[id(conn)]
+
+    def discard(self, conn):
+        self._forget_statements(conn)
+        self._count('discarded')
+        with self._lock:
+            self._open -= 1
+        try:
+            conn.close()
+        except Error:
+            pass
+
+    def connection(self):
+        return PooledConnection(self)
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(conn)
+
+class PooledConnection:
+    """
+    Context manager with the same shape as DirectConnection, backed by a ConnectionPool.
+    """
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = None
+
+    def __enter__(self):
+        self.conn = self.pool.acquire()
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and issubclass(exc_type, (InterfaceError, OperationalError, GeneratorExit)):
+            # The socket is probably broken, or a streamed result was abandoned half-read;
+            # either way don't hand it to the next caller
+            self.pool.discard(self.conn)
+        else:
+            self.pool.release(self.conn)
+        self.conn = None
+
+class RowCache:
+    """
+    Thread-safe LRU cache of query results keyed by equipment id.
+
+    :param max_size: Number of entries kept before the least recently used one is evicted.
+    """
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0  # Bumped on every invalidation so in-flight reads can't store stale rows
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._rows[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._rows.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._rows[key] = value
+            self._rows.move_to_end(key)
+            while len(self._rows) > self.max_size:
+                self._rows.popitem(last=False)
+
+    def peek(self, key):
+        # Like get, but leaves the LRU order and the hit counters alone
+        with self._lock:
+            return self._rows.get(key)
+
+    def invalidate(self, key):
+        with self._lock:
+            self.generation += 1
+            self._rows.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._rows.clear()
+
 class DatabaseManager:
-    def __init__(self):
-        self.host = host_ct
-        self.user = user_ct
-        self.passwd = passwd_ct
-        self.database = database_ct
+    def __init__(self, pool_size=pool_size, detail_cache_size=256, slow_query_threshold=slow_query_threshold, backend=None):
+        # MySQL server or embedded SQLite file; every query below runs unchanged on either
+        self.backend = backend if backend is not None else default_backend()
+        self.database = self.backend.database
+        self.pool = None
+        if pool_size:
+            self.pool = ConnectionPool(self.backend, size=pool_size)
+        # Shared by on_select, display_details and populate_fields_for_edit
+        self.detail_cache = RowCache(max_size=detail_cache_size)
+        # Bumped on every write made through this manager so local snapshots know to reload
+        self.write_version = 0
+        self._write_lock = threading.Lock()
+        # column -> sorted-as-returned list of distinct non-NULL values, shared by every dropdown
+        self.distinct_cache = {}
+        self._cache_generation = 0
+        # Result of get_box_manifest, kept for repeated PDF generations
+        self.box_manifest_cache = None
+        # Per-statement timings, shown in the diagnostics window
+        self.instrumentation = Instrumentation(slow_query_threshold=slow_query_threshold)
 
     def create_connection(self):
-        return MySQLConnection(self.host, self.user, self.passwd, self.database)
+        if self.pool is not None:
+            return self.pool.connection()
+        return DirectConnection(self.backend)
+
+    def pool_stats(self):
+        if self.pool is None:
+            return {}
+        with self.pool._lock:
+            return dict(self.pool.stats, open=self.pool._open, size=self.pool.size)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close_all()
+
+    def ping(self):
+        """
+        Runs the cheapest possible query, to find out whether the server answers.
+
+        :raises Error: If it doesn't.
+        """
+        self.fetch_data("SELECT 1", raise_errors=True)
+
+    def _note_write(self, equipment_id=None, inserted=False, columns=None):
+        with self._write_lock:
+            self.write_version += 1
+            # Inserts and deletes can add or remove values in any column
+            stale = EQUIPMENT_COLUMNS if columns is None else columns
+            if any(column in self.distinct_cache for column in stale):
+                self._cache_generation += 1
+                for column in stale:
+                    self.distinct_cache.pop(column, None)
+            if any(column in BOX_MANIFEST_COLUMNS for column in stale):
+                self._cache_generation += 1
+                self.box_manifest_cache = None
+        if inserted:
+            return  # Nothing cached can describe a row that didn't exist yet
+        if equipment_id is None:
+            self.detail_cache.clear()
+        elif isinstance(equipment_id, (list, tuple, set)):
+            for single_id in equipment_id:
+                self.detail_cache.invalidate(int(single_id))
+        else:
+            self.detail_cache.invalidate(int(equipment_id))
+
+    def clear_caches(self):
+        self._note_write()
 
     def execute_query(self, query, params=None):
+        # A raw statement can touch any row, so drop every cached detail
+        self._execute(query, params)
+        self._note_write()
+
+    def _execute(self, query, params=None):
         try:
-            with self.create_connection() as conn:
+            with self.instrumentation.timer(query) as timer, self.create_connection() as conn:
+                timer.connected()
                 cursor = conn.cursor()
                 cursor.execute(query, params)
+                timer.add_rows(max(cursor.rowcount, 0))
                 conn.commit()
+                cursor.close()
         except Error as e:
-            print(f"Error executing query: {e}")
+            logger.error("Error executing query: %s", e)
 
-    def fetch_data(self, query, params=None):
+    def _write(self, query, params=None):
+        """
+        :return: Number of rows the statement changed, or None if the server rejected it.
+        :raises OperationalError, InterfaceError: If the server can't be reached.
+        """
         try:
-            with self.create_connection() as conn:
+            with self.instrumentation.timer(query) as timer, self.create_connection() as conn:
+                timer.connected()
                 cursor = conn.cursor()
                 cursor.execute(query, params)
+                changed = cursor.rowcount
+                timer.add_rows(max(changed, 0))
+                conn.commit()
+                cursor.close()
+                return changed
+        except CONNECTION_ERRORS:
+            raise
+        except Error as e:
+            logger.error("Error executing query: %s", e)
+            return None
+
+    def _run(self, conn, query, params, prepared):
+        """
+        Executes a statement on conn, as a cached server-side prepared statement when
+        asked for and the connection is pooled (so it lives long enough to reuse it).
+
+        :return: (cursor, whether the caller must close it).
+        """
+        statements = self.pool.statements(conn) if prepared and self.pool is not None else None
+        if statements is not None:
+            return statements.execute(query, params), False
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor, True
+
+    def fetch_data(self, query, params=None, prepared=False, raise_errors=False):
+        """
+        :param raise_errors: Raise errors instead of logging them and returning [], for
+            callers that must tell a failed query from an empty result.
+        :return: List of row tuples.
+        """
+        try:
+            with self.instrumentation.timer(query) as timer, self.create_connection() as conn:
+                timer.connected()
+                cursor, owned = self._run(conn, query, params, prepared)
                 results = cursor.fetchall()
+                timer.add_rows(len(results))
+                if owned:
+                    cursor.close()
                 return results
         except Error as e:
-            print(f"Error fetching data: {e}")
+            if raise_errors:
+                raise
+            logger.error("Error fetching data: %s", e)
             return []
         
-    def get_equipment_details(self, equipment_id):
-        query = "SELECT * FROM equipment WHERE id = %s"
+    def fetch_records(self, query, params=None, prepared=False):
+        """
+        Like fetch_data, but each row is an Equipment record whose fields are named
+        after the result columns.
+        """
         try:
-            with self.create_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(query, (equipment_id,))
-                results = cursor.fetchall()
-                return results  # Only return the results
+            with self.instrumentation.timer(query) as timer, self.create_connection() as conn:
+                timer.connected()
+                cursor, owned = self._run(conn, query, params, prepared)
+                rows = cursor.fetchall()
+                timer.add_rows(len(rows))
+                record = record_type(column[0] for column in cursor.description)
+                if owned:
+                    cursor.close()
+                return [record._make(row) for row in rows]
         except Error as e:
-            print(f"Error fetching data: {e}")
+            logger.error("Error fetching data: %s", e)
             return []
+        
+    def iter_rows(self, query, params=None, chunk_size=500):
+        """
+        Streams the rows of a query in chunks with an unbuffered cursor, so memory stays
+        flat however large the result is. Errors are raised, not printed, since a
+        half-finished stream can't be turned into an empty result.
 
-    def get_unique_values(self, column_name):
-        query = f"SELECT DISTINCT {column_name} FROM equipment WHERE {column_name} IS NOT NULL"
-        return self.fetch_data(query)
+        :param chunk_size: Rows fetched from the server per round.
+        :return: Generator of row lists, each at most chunk_size long.
+        """
+        started = time.perf_counter()
+        busy = 0.0  # Time spent on the server side, not in the caller between chunks
+        connected = None
+        row_count = 0
+        error = None
+        try:
+            with self.create_connection() as conn:
+                connected = time.perf_counter()
+                cursor = conn.cursor(buffered=False)
+                cursor.execute(query, params)
+                busy += time.perf_counter() - connected
+                while True:
+                    fetch_started = time.perf_counter()
+                    rows = cursor.fetchmany(chunk_size)
+                    busy += time.perf_counter() - fetch_started
+                    if not rows:
+                        break
+                    row_count += len(rows)
+                    yield rows
+                cursor.close()
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            connect_seconds = (connected or time.perf_counter()) - started
+            self.instrumentation.record(query, connect_seconds, busy, row_count, error=error)
+            
+    def _cache_record(self, equipment_id, fields, record, generation):
+        # Each cached id holds a dict of field tuple (None for SELECT *) -> record
+        entry = dict(self.detail_cache.peek(equipment_id) or {})
+        entry[fields] = record
+        self.detail_cache.put(equipment_id, entry, generation)
 
-    def add_or_update_equipment(self, data, is_update=False, equipment_id=None):
-        with self.create_connection() as conn:
-            cursor = conn.cursor()
+    def get_equipment_details(self, equipment_id):
+        equipment_id = int(equipment_id)
+        cached = self.detail_cache.get(equipment_id)
+        if cached is not None and None in cached:
+            return [cached[None]]
+        generation = self.detail_cache.generation
         
-            # Convert weight to float (or the appropriate data type)
-            try:
-                data['weight'] = float(data['weight']) if data['weight'] else 0.0
-            except ValueError:
-                print("Invalid weight value. Setting to 0.0")
-                data['weight'] = 0.0
-                
-            try:
-                # Convert kit_name to string outside the params tuple
-                data['kit_name'] = str(data['kit_name'])
+        results = self.fetch_records("SELECT * FROM equipment WHERE id = %s", (equipment_id,), prepared=True)
+        if results:
+            self._cache_record(equipment_id, None, results[0], generation)
+        return results
+
+    def get_equipment_fields(self, equipment_id, fields):
+        """
+        Fetches only the given columns of one item, so callers that don't show the
+        description or URL don't pull them over the network.
+
+        :param equipment_id: ID of the item.
+        :param fields: Column names, in the order the record should have them.
+        :return: Equipment record with just those fields, or None if there is no such item.
+        """
+        fields = tuple(fields)
+        for field in fields:
+            if field not in EQUIPMENT_COLUMNS:
+                raise ValueError(f"Unknown equipment column: {field}")
+        equipment_id = int(equipment_id)
+        cached = self.detail_cache.get(equipment_id)
+        if cached is not None:
+            if fields in cached:
+                return cached[fields]
+            if None in cached:
+                # A full row is already here, cut the projection out of it
+                full = cached[None]
+                return record_type(fields)._make(getattr(full, field) for field in fields)
+        generation = self.detail_cache.generation
+        
+        results = self.fetch_records(f"SELECT {', '.join(fields)} FROM equipment WHERE id = %s", (equipment_id,), prepared=True)
+        if not results:
+            return None
+        self._cache_record(equipment_id, fields, results[0], generation)
+        return results[0]
+
+    def get_unique_values(self, column_name):
+        return [(value,) for value in self.get_distinct_values([column_name])[column_name]]
+
+    def get_distinct_values(self, columns):
+        """
+        Fetches the distinct non-NULL values of several columns in a single round trip.
+        Results are cached until a write touches one of the columns.
+
+        :param columns: Iterable of equipment column names.
+        :return: Dict of column name -> list of values.
+        """
+        columns = list(dict.fromkeys(columns))
+        for column in columns:
+            if column not in EQUIPMENT_COLUMNS:
+                raise ValueError(f"Unknown equipment column: {column}")
+            
+        with self._write_lock:
+            missing = [column for column in columns if column not in self.distinct_cache]
+            generation = self._cache_generation
             
+        if missing:
+            # One round trip per column type, so every value keeps its own type
+            families = {}
+            for column in missing:
+                families.setdefault(COLUMN_TYPES.get(column, "text"), []).append(column)
+            fetched = {column: [] for column in missing}
+            for family in families.values():
+                query = " UNION ALL ".join(
+                    f"SELECT %s, {column} FROM equipment WHERE {column} IS NOT NULL GROUP BY {column}"
+                    for column in family
+                )
+                for column, value in self.fetch_data(query, tuple(family)):
+                    fetched[column].append(value)
+            with self._write_lock:
+                if generation == self._cache_generation:
+                    self.distinct_cache.update(fetched)
+        else:
+            fetched = {}
+            
+        with self._write_lock:
+            return {column: list(fetched[column] if column in fetched else self.distinct_cache[column]) for column in columns}
+
+    @staticmethod
+    def _form_statement(data, equipment_id=None, expected_version=None, client_key=None):
+        """
+        Builds the statement for a save from the add/update form.
+
+        :param equipment_id: Item to update; None inserts a new one.
+        :param expected_version: Only update the row while it still has this version.
+        :param client_key: Idempotency key of a new item.
+        :return: (query, params).
+        """
+        # Convert weight to float (or the appropriate data type)
+        try:
+            data['weight'] = float(data['weight']) if data['weight'] else 0.0
+        except ValueError:
+            logger.warning("Invalid weight value. Setting to 0.0")
+            data['weight'] = 0.0
+        # Convert kit_name to string outside the params tuple
+        data['kit_name'] = str(data['kit_name'])
+        params = tuple(data[column] for column in FORM_COLUMNS)
+        if equipment_id is None:
+            return EQUIPMENT_INSERT, params + (client_key,)
+        if expected_version is None:
+            return EQUIPMENT_UPDATE, params + (equipment_id,)
+        return EQUIPMENT_UPDATE_IF_VERSION, params + (equipment_id, expected_version)
+
+    def add_or_update_equipment(self, data, is_update=False, equipment_id=None, base_version=None, client_key=None):
+        """
+        :param base_version: Only update the row while it still has this version.
+        :param client_key: Idempotency key stored with a new item (see journal.py).
+        :return: ID of the added or updated item, or None if the server rejected the write.
+        :raises WriteConflict: If the row no longer has base_version.
+        :raises OperationalError, InterfaceError: If the server can't be reached.
+        """
+        with self.instrumentation.timer(EQUIPMENT_UPDATE if is_update else EQUIPMENT_INSERT) as timer, self.create_connection() as conn:
+            timer.connected()
+            cursor = None
+            saved_id = None
+            try:
                 if is_update:
-                    # Update existing equipment
-                    query = """UPDATE equipment SET name=%s, brand=%s, model=%s, description=%s, serial_number=%s, purchase_company=%s, date_of_purchase=%s, cost=%s, website_url=%s, date_insured=%s, status=%s, model_number=%s, kit_name=%s, type=%s, weight=%s, owner=%s, not_purchased=%s WHERE id=%s"""
-                    params = (data['name'], data['brand'], data['model'], data['description'], data['serial_number'], data['purchase_company'], data['date_of_purchase'], data['cost'], data['website_url'], data['date_insured'], data['status'], data['model_number'], data['kit_name'], data['type'], data['weight'], data['owner'], data['not_purchased'], equipment_id)
+                    query, params = self._form_statement(data, equipment_id, base_version)
                 else:
-                    # Add new equipment
-                    query = """INSERT INTO equipment (name, brand, model, description, serial_number, purchase_company, date_of_purchase, cost, website_url, date_insured, status, model_number, kit_name, type, weight, owner, not_purchased) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-                    params = (data['name'], data['brand'], data['model'], data['description'], data['serial_number'], data['purchase_company'], data['date_of_purchase'], data['cost'], data['website_url'], data['date_insured'], data['status'], data['model_number'], data['kit_name'], data['type'], data['weight'], data['owner'], data['not_purchased'])
-                    
-                cursor.execute(query, params)
+                    query, params = self._form_statement(data, client_key=client_key)
+                timer.query = query
+                cursor, owned = self._run(conn, query, params, prepared=True)
+                matched = cursor.rowcount
+                timer.add_rows(max(matched, 0))
                 conn.commit()
+                if is_update and base_version is not None and not matched:
+                    raise WriteConflict(msg=f"Item {equipment_id} was changed after version {base_version} was read")
+                saved_id = equipment_id if is_update else cursor.lastrowid
+                self._note_write(equipment_id, inserted=not is_update)
+            except (WriteConflict,) + CONNECTION_ERRORS as e:
+                    timer.failed(e)
+                    raise
             except Error as e:
-                    print(f"Error: {e}")
+                    timer.failed(e)
+                    logger.error("Error saving equipment: %s", e)
             finally:
-                    cursor.close()
-                    conn.close()
+                    # The connection itself is closed (or returned to the pool) by the context manager
+                    if cursor is not None and owned:
+                        cursor.close()
+            return saved_id
                 
             
 
     def delete_equipment(self, equipment_id):
+        """
+        :return: Number of rows deleted, or None if the server rejected the delete.
+        :raises OperationalError, InterfaceError: If the server can't be reached.
+        """
         query = "DELETE FROM equipment WHERE id = %s"
-        self.execute_query(query, (equipment_id,))
+        deleted = self._write(query, (equipment_id,))
+        self._note_write(equipment_id)
+        return deleted
         
     def get_equipment_list(self):
         query = "SELECT id, name FROM equipment"
-        return self.fetch_data(query)
+        return self.fetch_records(query)
     
     def fetch_kit_names(self):
-        query = "SELECT DISTINCT kit_name FROM equipment WHERE kit_name IS NOT NULL"
-        kit_names = [str(row[0]) for row in self.fetch_data(query)]  # Convert to string
+        kit_names = [str(value) for value in self.get_distinct_values(["kit_name"])["kit_name"]]  # Convert to string
         return kit_names
     
-    def update_shipping_info(self, equipment_id, shipping_info):
-        # Start constructing the query
-        query = "UPDATE equipment SET "
-        
-        # List to store query parameters
-        params = []
-        
-        # Add each field to the query only if it's in the shipping_info dictionary
-        query_parts = []
-        for field, value in shipping_info.items():
-            query_parts.append(f"{field} = %s")
-            params.append(value)
-            
-        # Join the query parts with commas
-        query += ", ".join(query_parts)
-        
-        # Add the WHERE clause to target the specific equipment item
-        query += " WHERE id = %s"
-        params.append(equipment_id)        
-        
-        # Execute the query
-        self.execute_query(query, params)
-        
-    # Part of DatabaseManager class in db.py
-        
-    def get_boxes(self):
-        query = "SELECT DISTINCT box_number FROM equipment WHERE box_number IS NOT NULL ORDER BY box_number"
+    @staticmethod
+    def _shipping_set_clause(shipping_info):
+        """
+        :return: (SET clause, values) for the shipping fields; the row's version moves on too.
+        """
+        for field in shipping_info:
+            if field not in EQUIPMENT_COLUMNS:
+                raise ValueError(f"Unknown equipment column: {field}")
+        set_clause = ", ".join(f"{field} = %s" for field in shipping_info)
+        return f"{set_clause}, version = version + 1", list(shipping_info.values())
+
+    @classmethod
+    def _shipping_statements(cls, shipping_info, equipment_ids=(), kit_names=(), chunk_size=500):
+        """
+        :return: List of (query, params) applying shipping_info to the items and kits.
+        """
+        set_clause, values = cls._shipping_set_clause(shipping_info)
+        statements = []
+        for column, keys in (("id", equipment_ids), ("kit_name", kit_names)):
+            for start in range(0, len(keys), chunk_size):
+                chunk = keys[start:start + chunk_size]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                statements.append((f"UPDATE equipment SET {set_clause} WHERE {column} IN ({placeholders})", values + chunk))
+        return statements
+
+    def bulk_update_shipping_info(self, shipping_info, equipment_ids=(), kit_names=(), chunk_size=500):
+        """
+        Applies the same shipping fields to many items inside a single transaction.
+        A value of None sets the field to NULL.
+
+        :param shipping_info: Dict of column name -> new value.
+        :param equipment_ids: Ids of individual items to update.
+        :param kit_names: Kits whose items should all be updated.
+        :param chunk_size: Maximum ids/kits per statement, to keep IN lists reasonable.
+        :return: Number of rows changed, or None if the server rejected the update and it was rolled back.
+        :raises OperationalError, InterfaceError: If the server can't be reached.
+        """
+        equipment_ids = [int(equipment_id) for equipment_id in equipment_ids]
+        kit_names = [str(kit_name) for kit_name in kit_names]
+        statements = self._shipping_statements(shipping_info, equipment_ids, kit_names, chunk_size)
+        if not shipping_info or not statements:
+            return 0
+                
+        changed = 0
         try:
-            return self.fetch_data(query)
+            # One timing for the whole transaction; the chunks share a shape anyway
+            with self.instrumentation.timer(statements[0][0]) as timer, self.create_connection() as conn:
+                timer.connected()
+                cursor = conn.cursor()
+                try:
+                    for query, params in statements:
+                        cursor.execute(query, params)
+                        changed += cursor.rowcount
+                    timer.add_rows(changed)
+                    conn.commit()
+                except Error:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        except CONNECTION_ERRORS:
+            raise
         except Error as e:
-            print(f"Error fetching box numbers: {e}")
-            return []
+            logger.error("Error updating shipping info: %s", e)
+            return None
+        finally:
+            # Kits don't tell us which ids moved, so those updates drop every cached detail
+            self._note_write(None if kit_names else equipment_ids, columns=list(shipping_info))
+        return changed
         
-    def get_items_in_box(self, box_id):
-        query = "SELECT name, weight, kit_name FROM equipment WHERE box_number = %s"
-        try:
-            return self.fetch_data(query, (box_id,))
-        except Error as e:
-            print(f"Error fetching items for box {box_id}: {e}")
-            return []
+    # Part of DatabaseManager class in db.py
+        
+    def get_box_manifest(self, use_cache=False):
+        """
+        Every box with its items, kits and total weight, built from one query.
+
+        :param use_cache: Reuse the previous result if no write has touched box contents since.
+        :return: List of dicts ordered by box number with the keys box_number, items
+                 (list of (name, weight, kit_name)), kits, individual_items and total_weight.
+        """
+        with self._write_lock:
+            if use_cache and self.box_manifest_cache is not None:
+                return self.box_manifest_cache
+            generation = self._cache_generation
+            
+        query = "SELECT box_number, name, weight, kit_name FROM equipment WHERE box_number IS NOT NULL ORDER BY box_number, name"
+        boxes = []
+        for box_number, name, weight, kit_name in self.fetch_data(query):
+            if not boxes or boxes[-1]['box_number'] != box_number:
+                boxes.append({'box_number': box_number, 'items': [], 'kits': {}, 'individual_items': {}, 'total_weight': 0.0})
+            box = boxes[-1]
+            box['items'].append((name, weight, kit_name))
+            if weight is not None:
+                box['total_weight'] += float(weight)
+            # Items that belong to a kit are listed once under the kit's name
+            if kit_name and kit_name != "None":
+                box['kits'][kit_name] = None
+            else:
+                box['individual_items'][name] = None
+                
+        for box in boxes:
+            box['kits'] = list(box['kits'])
+            box['individual_items'] = list(box['individual_items'])
+            
+        with self._write_lock:
+            if generation == self._cache_generation:
+                self.box_manifest_cache = boxes
+        return boxes
         
     def get_unique_owners(self):
-        query = "SELECT DISTINCT owner FROM equipment WHERE owner IS NOT NULL"
-        return sorted([item[0] for item in self.fetch_data(query)])
+        return sorted(self.get_distinct_values(["owner"])["owner"])
     
     def get_unique_types(self):
-        query = "SELECT DISTINCT type FROM equipment WHERE type IS NOT NULL"
-        results = self.fetch_data(query)
-        return sorted([result[0] for result in results])
+        return sorted(self.get_distinct_values(["type"])["type"])
     
     def get_unique_names(self):
-        query = "SELECT DISTINCT name FROM equipment"
-        return [item[0] for item in self.fetch_data(query)]
+        # name is NOT NULL, so the IS NOT NULL filter in get_distinct_values changes nothing
+        return self.get_distinct_values(["name"])["name"]
     
     def update_equipment_name(self, old_name, new_name):
-        query = "UPDATE equipment SET name = %s WHERE name = %s"
-        self.execute_query(query, (new_name, old_name))
+        """
+        :return: Number of items renamed, or None if the server rejected the rename.
+        :raises OperationalError, InterfaceError: If the server can't be reached.
+        """
+        query = "UPDATE equipment SET name = %s, version = version + 1 WHERE name = %s"
+        renamed = self._write(query, (new_name, old_name))
+        # Any number of ids can share a name, so start the cache over
+        self._note_write(columns=["name"])
+        return renamed
+
+    def apply_writes(self, writes):
+        """
+        Replays writes queued in the offline journal (see journal.py), oldest first, in
+        one transaction. A write made against an older version of its rows is left out
+        as a conflict instead of overwriting the newer data, and a write the server
+        rejects is left out as failed; everything else is committed together.
+
+        :param writes: PendingWrite entries. Inserts carry a temporary negative id, which
+            later writes in the same batch may refer to.
+        :return: Dict of seq -> (outcome, detail), where outcome is "applied", "conflict"
+            or "failed". The detail of an applied insert is the new id, of an applied
+            update the row's new version, of applied shipping changes and renames the
+            number of items changed; for conflicts and failures it is the reason.
+        :raises Error: If the server can't be reached; nothing from the batch is kept.
+        """
+        results = {}
+        new_ids = {}  # temporary id -> id given by the server
+        versions = {}  # id -> {version: version a write in this batch turned it into}
+        with self.instrumentation.timer("REPLAY journal batch") as timer, self.create_connection() as conn:
+            timer.connected()
+            cursor = conn.cursor()
+            try:
+                if not conn.in_transaction:
+                    conn.start_transaction()  # Savepoints below must not commit on their own
+                for write in writes:
+                    cursor.execute("SAVEPOINT journal_write")
+                    try:
+                        result = self._apply_write(cursor, write, new_ids, versions)
+                    except (DataError, IntegrityError, ProgrammingError, KeyError, ValueError) as e:
+                        result = ("failed", str(e))
+                    if result[0] != "applied":
+                        # A write spanning several statements is kept whole or not at all;
+                        # the rest of the batch carries on either way
+                        cursor.execute("ROLLBACK TO SAVEPOINT journal_write")
+                    cursor.execute("RELEASE SAVEPOINT journal_write")
+                    results[write.seq] = result
+                timer.add_rows(len(writes))
+                conn.commit()
+            except Error:
+                try:
+                    conn.rollback()
+                except Error:
+                    pass  # The link is gone, and the server drops the transaction with it
+                raise
+            finally:
+                cursor.close()
+        if any(outcome == "applied" for outcome, _ in results.values()):
+            self._note_write()
+        return results
+
+    @staticmethod
+    def _expected_version(versions, equipment_id, base_version):
+        # Writes queued one after another were all made on the version the server had;
+        # each builds on the one before it rather than conflicting with it
+        superseded = versions.get(equipment_id, {})
+        while base_version in superseded:
+            base_version = superseded[base_version]
+        return base_version
+
+    def _apply_if_versions(self, cursor, set_clause, values, base_versions, versions):
+        """
+        Updates each item only while it still has the version the write was made on.
+
+        :param set_clause: SET clause; it must move the version on.
+        :param base_versions: Dict of id -> version the write was made on.
+        :return: None if every item was updated, otherwise the reason for the conflict.
+        """
+        expected = {equipment_id: self._expected_version(versions, equipment_id, base_version) for equipment_id, base_version in base_versions.items()}
+        query = f"UPDATE equipment SET {set_clause} WHERE id = %s AND version = %s"
+        matched = 0
+        for equipment_id, version in expected.items():
+            cursor.execute(query, values + [equipment_id, version])
+            matched += cursor.rowcount
+        if matched < len(expected):
+            return f"{len(expected) - matched} of {len(expected)} items were changed or deleted on the server"
+        for equipment_id, version in expected.items():
+            versions.setdefault(equipment_id, {})[version] = version + 1
+        return None
+
+    def _apply_write(self, cursor, write, new_ids, versions):
+        payload = write.payload
+        if write.op == "insert":
+            client_key = payload.get("client_key")
+            if client_key is not None:
+                # The journal sends a batch again if it died before recording that the
+                # server took it; the key finds the row the first attempt added
+                cursor.execute("SELECT id FROM equipment WHERE client_key = %s", (client_key,))
+                row = cursor.fetchone()
+                if row is not None:
+                    new_ids[write.equipment_id] = row[0]
+                    return "applied", row[0]
+            query, params = self._form_statement(dict(payload), client_key=client_key)
+            cursor.execute(query, params)
+            new_ids[write.equipment_id] = cursor.lastrowid
+            return "applied", cursor.lastrowid
+        
+        equipment_ids = [new_ids.get(equipment_id, equipment_id) for equipment_id in payload.get("equipment_ids", ())]
+        equipment_id = None
+        if write.equipment_id is not None:
+            equipment_id = new_ids.get(write.equipment_id, write.equipment_id)
+            equipment_ids.append(equipment_id)
+        if any(equipment_id < 0 for equipment_id in equipment_ids):
+            return "failed", "The item was added offline and never reached the server"
+        
+        base_versions = {new_ids.get(int(key), int(key)): version for key, version in payload.get("versions", {}).items()}
+        
+        if write.op == "update":
+            base_version = self._expected_version(versions, equipment_id, write.base_version)
+            query, params = self._form_statement(dict(payload), equipment_id, base_version)
+            cursor.execute(query, params)
+            # version always changes, so the row counts as affected whenever it matched
+            matched = cursor.rowcount
+            cursor.execute("SELECT version FROM equipment WHERE id = %s", (equipment_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return "conflict", "The item was deleted on the server"
+            if not matched:
+                return "conflict", f"The item was changed on the server (now version {row[0]}, edited from version {base_version})"
+            versions.setdefault(equipment_id, {})[row[0] - 1] = row[0]
+            return "applied", row[0]
+        if write.op == "shipping":
+            changed = 0
+            if base_versions:
+                set_clause, values = self._shipping_set_clause(payload["fields"])
+                conflict = self._apply_if_versions(cursor, set_clause, values, base_versions, versions)
+                if conflict:
+                    return "conflict", conflict
+                changed += len(base_versions)
+            # Items and kits the window had no version for are updated as they are now
+            equipment_ids = [equipment_id for equipment_id in equipment_ids if equipment_id not in base_versions]
+            kit_names = [str(kit_name) for kit_name in payload.get("kit_names", ())]
+            for query, params in self._shipping_statements(payload["fields"], equipment_ids, kit_names):
+                cursor.execute(query, params)
+                changed += cursor.rowcount
+            return "applied", changed
+        if write.op == "delete":
+            if write.base_version is None:
+                cursor.execute("DELETE FROM equipment WHERE id = %s", (equipment_id,))
+                return "applied", None
+            base_version = self._expected_version(versions, equipment_id, write.base_version)
+            cursor.execute("DELETE FROM equipment WHERE id = %s AND version = %s", (equipment_id, base_version))
+            if cursor.rowcount:
+                return "applied", None
+            cursor.execute("SELECT version FROM equipment WHERE id = %s", (equipment_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return "applied", None  # Already gone, which is all the delete asked for
+            return "conflict", f"The item was changed on the server (now version {row[0]}, deleted from version {base_version})"
+        if write.op == "rename":
+            if base_versions:
+                conflict = self._apply_if_versions(cursor, "name = %s, version = version + 1", [payload["new_name"]], base_versions, versions)
+                if conflict:
+                    return "conflict", conflict
+                return "applied", len(base_versions)
+            cursor.execute("UPDATE equipment SET name = %s, version = version + 1 WHERE name = %s", (payload["new_name"], payload["old_name"]))
+            return "applied", cursor.rowcount
+        return "failed", f"Unknown write: {write.op}"
         
     def fetch_all_equipment(self):
         query = "SELECT name, brand, model, model_number, serial_number, purchase_company, date_of_purchase, cost, owner, website_url FROM equipment"
-        return self.fetch_data(query)
+        return self.fetch_records(query)
         
         
         
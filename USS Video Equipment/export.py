@@ -0,0 +1,107 @@
+# export.py
+import csv
+import datetime
+import os
+from startup import lazy_import
+from db import EQUIPMENT_COLUMNS
+
+# Header text for columns whose title-cased name reads wrong
+COLUMN_LABEL_OVERRIDES = {
+    "id": "ID",
+    "website_url": "Website URL",
+    "shipping_zip": "Shipping ZIP",
+    "shipping_destination_name": "Destination Name",
+    "date_of_purchase": "Date of Purchase",
+}
+
+# The columns the Export to Excel button has always written
+DEFAULT_EXPORT_COLUMNS = (
+    "name", "brand", "model", "model_number", "serial_number",
+    "purchase_company", "date_of_purchase", "cost", "owner", "website_url"
+)
+
+# Only needed for Excel output
+xlsxwriter = lazy_import("xlsxwriter")
+
+class ExportCancelled(Exception):
+    pass
+
+def column_label(column):
+    return COLUMN_LABEL_OVERRIDES.get(column, column.replace("_", " ").title())
+
+class CsvRowWriter:
+    def __init__(self, file_path, headers):
+        self.file = open(file_path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+class XlsxRowWriter:
+    def __init__(self, file_path, headers):
+        # constant_memory flushes each row to disk as soon as the next one starts
+        self.workbook = xlsxwriter.Workbook(file_path, {"constant_memory": True})
+        self.worksheet = self.workbook.add_worksheet("Equipment")
+        self.date_format = self.workbook.add_format({"num_format": "yyyy-mm-dd"})
+        self.worksheet.write_row(0, 0, headers, self.workbook.add_format({"bold": True}))
+        self.next_row = 1
+
+    def write_rows(self, rows):
+        for row in rows:
+            for column, value in enumerate(row):
+                if isinstance(value, (datetime.date, datetime.datetime)):
+                    self.worksheet.write_datetime(self.next_row, column, value, self.date_format)
+                elif value is not None:
+                    self.worksheet.write(self.next_row, column, value)
+            self.next_row += 1
+
+    def close(self):
+        self.workbook.close()
+
+def export_equipment(db_manager, file_path, columns=DEFAULT_EXPORT_COLUMNS, chunk_size=500, progress=None, cancel_event=None):
+    """
+    Streams the equipment table into an .xlsx or .csv file chunk by chunk, so memory
+    use doesn't grow with the table. The format follows the file extension.
+
+    :param db_manager: DatabaseManager to read from.
+    :param file_path: Destination file; .csv writes CSV, anything else writes Excel.
+    :param columns: Equipment columns to export, in order.
+    :param chunk_size: Rows read and written per round.
+    :param progress: Optional callable(rows_done, rows_total), called after each chunk.
+    :param cancel_event: Optional threading.Event; when set the export stops and the partial file is removed.
+    :return: Number of rows written.
+    """
+    columns = list(columns)
+    if not columns:
+        raise ValueError("No columns selected for export")
+    for column in columns:
+        if column not in EQUIPMENT_COLUMNS:
+            raise ValueError(f"Unknown equipment column: {column}")
+
+    total_rows = db_manager.fetch_data("SELECT COUNT(*) FROM equipment")
+    total = total_rows[0][0] if total_rows else 0
+    headers = [column_label(column) for column in columns]
+    writer_class = CsvRowWriter if file_path.lower().endswith(".csv") else XlsxRowWriter
+    query = f"SELECT {', '.join(columns)} FROM equipment ORDER BY name"
+
+    writer = writer_class(file_path, headers)
+    written = 0
+    finished = False
+    try:
+        for rows in db_manager.iter_rows(query, chunk_size=chunk_size):
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExportCancelled()
+            writer.write_rows(rows)
+            written += len(rows)
+            if progress is not None:
+                progress(written, max(total, written))
+        finished = True
+    finally:
+        writer.close()
+        if not finished and os.path.exists(file_path):
+            os.remove(file_path)
+    return written
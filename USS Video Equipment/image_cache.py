@@ -0,0 +1,173 @@
+# image_cache.py
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from startup import lazy_import
+
+# PIL is only loaded when the first picture is shown
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DISK_DIR = os.path.join(os.path.expanduser("~"), ".cache", "VideoEquipTracker", "thumbnails")
+
+class ThumbnailCache:
+    """
+    Two-level cache of scaled-down equipment images.
+
+    Level one is an in-memory LRU of PIL thumbnails (and the PhotoImage built from
+    each one). Level two is a directory of pre-scaled PNGs that survives restarts.
+    Both are keyed by the source file's path, mtime and size, so editing or
+    replacing a picture in Pics is picked up automatically.
+
+    :param max_size: Longest edge of a thumbnail, in pixels.
+    :param memory_items: Number of thumbnails kept in memory.
+    :param disk_dir: Directory of the persistent cache, or None to keep thumbnails in memory only.
+    :param disk_bytes: Size limit of the persistent cache; the oldest files go first.
+    """
+    def __init__(self, max_size=400, memory_items=64, disk_dir=DEFAULT_DISK_DIR, disk_bytes=50 * 1024 * 1024):
+        self.max_size = max_size
+        self.memory_items = memory_items
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()  # key -> [thumbnail, PhotoImage or None]
+        self._lock = threading.Lock()
+        self._disk_usage = None
+        self.stats = {'memory_hits': 0, 'memory_misses': 0, 'disk_hits': 0, 'disk_misses': 0, 'disk_evictions': 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def source_key(self, image_path):
+        st = os.stat(image_path)
+        return (os.path.abspath(image_path), st.st_mtime_ns, st.st_size)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(f"{key[0]}|{key[1]}|{key[2]}|{self.max_size}".encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.png")
+
+    def _remember(self, key, thumbnail):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                entry = self._memory[key] = [thumbnail, None]
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+            return entry
+
+    def get_thumbnail(self, image_path):
+        """
+        Returns the thumbnail of an image file, decoding it only on a full miss.
+        Safe to call from worker threads.
+
+        :param image_path: Path of the source image.
+        :return: PIL Image no larger than max_size on either edge.
+        """
+        return self._entry(image_path)[0]
+
+    def get_photo(self, image_path):
+        """
+        Returns a Tk PhotoImage of the thumbnail. Must be called on the Tk thread.
+
+        :param image_path: Path of the source image.
+        :return: ImageTk.PhotoImage.
+        """
+        entry = self._entry(image_path)
+        if entry[1] is None:
+            entry[1] = ImageTk.PhotoImage(entry[0])
+        return entry[1]
+
+    def _entry(self, image_path):
+        key = self.source_key(image_path)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return entry
+            self.stats['memory_misses'] += 1
+
+        thumbnail = self._load_from_disk(key)
+        if thumbnail is None:
+            thumbnail = self._decode(image_path)
+            self._save_to_disk(key, thumbnail)
+        return self._remember(key, thumbnail)
+
+    def _decode(self, image_path):
+        image = Image.open(image_path)
+        # Let the JPEG decoder scale down while decoding instead of inflating the full frame
+        image.draft("RGB", (self.max_size, self.max_size))
+        image.thumbnail((self.max_size, self.max_size), Image.Resampling.LANCZOS)
+        if image.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            image = image.convert("RGB")
+        return image
+
+    def _load_from_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with Image.open(path) as cached:
+                cached.load()
+                thumbnail = cached.copy()
+        except (OSError, ValueError):
+            self._count('disk_misses')
+            return None
+        try:
+            os.utime(path)  # Mark as recently used for eviction
+        except OSError:
+            pass
+        self._count('disk_hits')
+        return thumbnail
+
+    def _save_to_disk(self, key, thumbnail):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            thumbnail.save(temp_path, format="PNG", compress_level=1)  # Favour write speed over size
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+        except OSError:
+            logger.exception("Error writing thumbnail cache")
+            return
+        with self._lock:
+            if self._disk_usage is not None:
+                self._disk_usage += size
+        self._enforce_disk_limit()
+
+    def _enforce_disk_limit(self):
+        with self._lock:
+            usage = self._disk_usage
+        if usage is not None and usage <= self.disk_bytes:
+            return
+        try:
+            entries = [entry for entry in os.scandir(self.disk_dir) if entry.name.endswith(".png")]
+        except OSError:
+            return
+        files = sorted(((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries))
+        usage = sum(size for _, size, _ in files)
+        # Trim to 90% so we don't rescan on every write once the cache is full
+        target = self.disk_bytes * 0.9
+        for _, size, path in files:
+            if usage <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            usage -= size
+            self._count('disk_evictions')
+        with self._lock:
+            self._disk_usage = usage
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
@@ -0,0 +1,237 @@
+# instrumentation.py
+import collections
+import contextlib
+import datetime
+import json
+import logging
+import math
+import re
+import threading
+import time
+
+slow_log = logging.getLogger("db.slow")
+
+# Latencies kept per SQL shape for the percentiles; older ones drop off
+SAMPLES_PER_SHAPE = 1024
+
+# Slow statements kept for the diagnostics window
+SLOW_QUERIES_KEPT = 200
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+_shapes = {}  # query text -> shape, so each distinct statement is normalised once
+_context = threading.local()
+
+def sql_shape(query):
+    """
+    Reduces a statement to its shape: literals and placeholders become ?, IN lists of
+    any length become (...), and whitespace is collapsed. Queries that only differ in
+    their values are counted together.
+
+    :param query: SQL text.
+    :return: Normalised SQL text.
+    """
+    shape = _shapes.get(query)
+    if shape is None:
+        shape = _STRING.sub("?", query)
+        shape = _NUMBER.sub("?", shape)
+        shape = _PLACEHOLDER.sub("?", shape)
+        shape = _IN_LIST.sub("(...)", shape)
+        shape = _SPACE.sub(" ", shape).strip()
+        if len(_shapes) > 4096:
+            _shapes.clear()  # Ad hoc statements with inlined values would otherwise pile up
+        _shapes[query] = shape
+    return shape
+
+@contextlib.contextmanager
+def action(label):
+    """
+    Labels the queries run on this thread inside the block, e.g. with the UI action
+    that triggered them, so the diagnostics can tell which action a statement serves.
+    """
+    previous = getattr(_context, "action", None)
+    _context.action = label
+    try:
+        yield
+    finally:
+        _context.action = previous
+
+def current_action():
+    return getattr(_context, "action", None)
+
+def percentile(sorted_values, fraction):
+    """
+    :return: Nearest-rank percentile of an ascending list, or 0.0 for an empty one.
+    """
+    if not sorted_values:
+        return 0.0
+    # The epsilon keeps float noise such as 0.07 * 100 == 7.000000000000001 from adding a rank
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values) - 1e-9) - 1))
+    return sorted_values[rank]
+
+class ShapeStats:
+    """
+    Running totals of one SQL shape.
+    """
+    def __init__(self, shape):
+        self.shape = shape
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.connect_seconds = 0.0
+        self.execute_seconds = 0.0
+        self.max_seconds = 0.0
+        self.samples = collections.deque(maxlen=SAMPLES_PER_SHAPE)
+        self.actions = collections.Counter()
+
+    def as_dict(self):
+        latencies = sorted(self.samples)
+        count = self.count or 1
+        return {
+            "shape": self.shape,
+            "count": self.count,
+            "errors": self.errors,
+            "rows": self.rows,
+            "connect_ms_avg": self.connect_seconds / count * 1000,
+            "execute_ms_avg": self.execute_seconds / count * 1000,
+            "total_ms": (self.connect_seconds + self.execute_seconds) * 1000,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": self.max_seconds * 1000,
+            "actions": dict(self.actions),
+        }
+
+class QueryTimer:
+    """
+    Times one database call, split into getting a connection and running the statement.
+    Used as a context manager around the connection; call connected() once the
+    connection is in hand and add_rows() for what came back. query may be changed
+    inside the block when the statement is only decided there.
+    """
+    def __init__(self, instrumentation, query):
+        self.instrumentation = instrumentation
+        self.query = query
+        self.rows = 0
+        self.error = None
+        self.started = None
+        self.connected_at = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def connected(self):
+        self.connected_at = time.perf_counter()
+
+    def add_rows(self, count):
+        self.rows += count
+
+    def failed(self, error):
+        # For callers that handle the error themselves inside the block
+        self.error = error
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        finished = time.perf_counter()
+        connected_at = self.connected_at if self.connected_at is not None else finished
+        self.instrumentation.record(
+            self.query, connected_at - self.started, finished - connected_at, self.rows,
+            error=exc_value if exc_value is not None else self.error
+        )
+        return False
+
+class Instrumentation:
+    """
+    Collects per-shape query statistics for a DatabaseManager: call count, errors,
+    connection and execution time, rows returned and p50/p95/p99 latency over the
+    most recent SAMPLES_PER_SHAPE calls. Statements slower than slow_query_threshold
+    are logged to the "db.slow" logger and kept for the diagnostics window.
+
+    :param slow_query_threshold: Seconds; None turns the slow query log off.
+    :param enabled: Set to False to skip all bookkeeping.
+    """
+    def __init__(self, slow_query_threshold=None, enabled=True):
+        self.slow_query_threshold = slow_query_threshold
+        self.enabled = enabled
+        self.started_at = datetime.datetime.now()
+        self._stats = {}  # shape -> ShapeStats
+        self.slow_queries = collections.deque(maxlen=SLOW_QUERIES_KEPT)
+        self._lock = threading.Lock()
+
+    def timer(self, query):
+        return QueryTimer(self, query)
+
+    def record(self, query, connect_seconds, execute_seconds, rows=0, error=None):
+        if not self.enabled:
+            return
+        shape = sql_shape(query)
+        label = current_action()
+        total = connect_seconds + execute_seconds
+        with self._lock:
+            stats = self._stats.get(shape)
+            if stats is None:
+                stats = self._stats[shape] = ShapeStats(shape)
+            stats.count += 1
+            stats.rows += rows
+            stats.connect_seconds += connect_seconds
+            stats.execute_seconds += execute_seconds
+            stats.max_seconds = max(stats.max_seconds, total)
+            stats.samples.append(total)
+            stats.actions[label or "-"] += 1
+            if error is not None:
+                stats.errors += 1
+        if self.slow_query_threshold is not None and total >= self.slow_query_threshold:
+            entry = {
+                "at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "ms": total * 1000,
+                "connect_ms": connect_seconds * 1000,
+                "rows": rows,
+                "action": label,
+                "query": _SPACE.sub(" ", query).strip()[:500],
+                "error": None if error is None else str(error),
+            }
+            with self._lock:
+                self.slow_queries.append(entry)
+            slow_log.warning("%.1f ms (%.1f ms connecting, %d rows, action %s): %s",
+                             entry["ms"], entry["connect_ms"], rows, label or "-", entry["query"])
+
+    def snapshot(self):
+        """
+        :return: List of per-shape dicts, most total time first.
+        """
+        with self._lock:
+            shapes = [stats.as_dict() for stats in self._stats.values()]
+        return sorted(shapes, key=lambda stats: stats["total_ms"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.slow_queries.clear()
+        self.started_at = datetime.datetime.now()
+
+    def to_dict(self, extra=None):
+        with self._lock:
+            slow_queries = list(self.slow_queries)
+        report = {
+            "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "since": self.started_at.isoformat(timespec="seconds"),
+            "slow_query_threshold_ms": None if self.slow_query_threshold is None else self.slow_query_threshold * 1000,
+            "queries": self.snapshot(),
+            "slow_queries": slow_queries,
+        }
+        if extra:
+            report.update(extra)
+        return report
+
+    def dump_json(self, file_path, extra=None):
+        """
+        Writes the statistics to a JSON file.
+
+        :param extra: Optional dict of other sections to include, e.g. pool statistics.
+        """
+        with open(file_path, "w", encoding="utf-8") as out:
+            json.dump(self.to_dict(extra), out, indent=2, default=str)
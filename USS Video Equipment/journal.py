@@ -0,0 +1,414 @@
+# journal.py
+import datetime
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import namedtuple
+from mysql.connector import Error
+from backends import SQLiteBackend
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pending_writes.sqlite3")
+
+PendingWrite = namedtuple("PendingWrite", "seq op equipment_id base_version payload created_at attempts status error")
+
+_COLUMNS = ", ".join(PendingWrite._fields)
+
+class WriteJournal:
+    """
+    Durable queue of writes on their way to the server. Saves from the add/update form,
+    deletes, renames and shipping changes that can't reach the server (or would
+    overtake older ones still queued) are recorded here, so nothing is lost when the
+    link drops; JournalSyncer replays them in order.
+
+    The queue is a SQLite file written with synchronous=FULL, so a write is on disk
+    before the call returns. Items added through the journal get a temporary negative
+    id until the server assigns theirs; later writes may use either. Every other write
+    carries the versions of the rows it was made on, and is left as a conflict if the
+    server has moved past them by the time it arrives.
+
+    Each entry is replayed at least once: if the program dies between the server
+    committing a batch and the journal recording it, that batch is sent again. New
+    items carry a client key, so an insert sent twice still adds only one row.
+
+    :param path: Journal file; created on first use.
+    """
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self.conn = SQLiteBackend(path).connect()
+        self._lock = threading.Lock()
+        cursor = self.conn.cursor()
+        cursor.execute("PRAGMA synchronous = FULL")
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS pending_writes ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "op TEXT NOT NULL, "
+            "equipment_id INTEGER, "
+            "base_version INTEGER, "
+            "payload TEXT NOT NULL, "
+            "created_at TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "status TEXT NOT NULL DEFAULT 'pending', "
+            "error TEXT)"
+        )
+        # Temporary id -> server id, for writes queued against items added offline
+        cursor.execute("CREATE TABLE IF NOT EXISTS synced_ids (temp_id INTEGER PRIMARY KEY, equipment_id INTEGER NOT NULL)")
+        # Versions our synced writes replaced, so a write made on the same copy of the row
+        # as an earlier one (queued before it or saved from a form opened before it
+        # synced) builds on it instead of conflicting with it
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS superseded ("
+            "equipment_id INTEGER NOT NULL, "
+            "version INTEGER NOT NULL, "
+            "new_version INTEGER NOT NULL, "
+            "PRIMARY KEY (equipment_id, version))"
+        )
+        cursor.execute("SELECT COUNT(*) FROM pending_writes")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("DELETE FROM superseded")  # No write or open form from the last session can use them
+        self.conn.commit()
+        cursor.close()
+
+    def _enqueue(self, op, payload, equipment_id=None, base_version=None):
+        """
+        :return: seq of the new entry, or None if it couldn't be written.
+        """
+        created_at = datetime.datetime.now().isoformat(timespec="seconds")
+        try:
+            with self._lock:
+                cursor = self.conn.cursor()
+                try:
+                    cursor.execute(
+                        "INSERT INTO pending_writes (op, equipment_id, base_version, payload, created_at) VALUES (%s, %s, %s, %s, %s)",
+                        (op, equipment_id, base_version, json.dumps(payload, default=str), created_at)
+                    )
+                    seq = cursor.lastrowid
+                    if op == "insert":
+                        cursor.execute("UPDATE pending_writes SET equipment_id = %s WHERE seq = %s", (-seq, seq))
+                    self.conn.commit()
+                except Error:
+                    self.conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+            return seq
+        except Error as e:
+            logger.error("Error writing to the journal: %s", e)
+            return None
+
+    def add_or_update_equipment(self, data, is_update=False, equipment_id=None, base_version=None, client_key=None):
+        """
+        Queues a save from the add/update form.
+
+        :param base_version: version of the row the form was filled from; the edit is
+            only applied while the server still has it. None overwrites unconditionally.
+        :param client_key: Idempotency key of a new item; one is made up if not given.
+        :return: ID of the item (a temporary negative one for new items), or None if the journal couldn't be written.
+        """
+        if is_update:
+            seq = self._enqueue("update", data, int(equipment_id), base_version)
+            return None if seq is None else int(equipment_id)
+        seq = self._enqueue("insert", dict(data, client_key=client_key or str(uuid.uuid4())))
+        return None if seq is None else -seq
+
+    def delete_equipment(self, equipment_id, base_version=None):
+        return self._enqueue("delete", {}, int(equipment_id), base_version)
+
+    def bulk_update_shipping_info(self, shipping_info, equipment_ids=(), kit_names=(), versions=None):
+        """
+        Queues the same shipping fields for many items and kits, applied in one statement group.
+
+        :param versions: Dict of id -> version the items had when the change was made;
+            those items are only changed while the server still has them. Items and kits
+            without one are changed whatever they hold.
+        :return: Number of items and kits queued, or None if the journal couldn't be written.
+        """
+        equipment_ids = [int(equipment_id) for equipment_id in equipment_ids]
+        kit_names = [str(kit_name) for kit_name in kit_names]
+        if not shipping_info or not (equipment_ids or kit_names):
+            return 0
+        payload = {"fields": shipping_info, "equipment_ids": equipment_ids, "kit_names": kit_names, "versions": versions or {}}
+        if self._enqueue("shipping", payload) is None:
+            return None
+        return len(equipment_ids) + len(kit_names)
+
+    def update_equipment_name(self, old_name, new_name, versions=None):
+        """
+        :param versions: Dict of id -> version of the items named old_name when the rename
+            was made; only those are renamed, and only while the server still has them.
+            None renames whatever has old_name when it arrives.
+        """
+        return self._enqueue("rename", {"old_name": old_name, "new_name": new_name, "versions": versions or {}})
+
+    @staticmethod
+    def _load_superseded(cursor):
+        cursor.execute("SELECT equipment_id, version, new_version FROM superseded")
+        superseded = {}
+        for equipment_id, version, new_version in cursor.fetchall():
+            superseded.setdefault(equipment_id, {})[version] = new_version
+        return superseded
+
+    @staticmethod
+    def _latest_version(superseded, equipment_id, version):
+        chain = superseded.get(equipment_id, {})
+        while version in chain:
+            version = chain[version]
+        return version
+
+    def _rows(self, where, params=(), limit=None):
+        query = f"SELECT {_COLUMNS} FROM pending_writes WHERE {where} ORDER BY seq"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            cursor.execute("SELECT temp_id, equipment_id FROM synced_ids")
+            synced = dict(cursor.fetchall())
+            superseded = self._load_superseded(cursor)
+            cursor.close()
+        writes = []
+        for row in rows:
+            write = PendingWrite(*row)
+            payload = json.loads(write.payload)
+            # Items added offline may have reached the server since this write was queued
+            if "equipment_ids" in payload:
+                payload["equipment_ids"] = [synced.get(equipment_id, equipment_id) for equipment_id in payload["equipment_ids"]]
+            if "versions" in payload:
+                payload["versions"] = {
+                    equipment_id: self._latest_version(superseded, equipment_id, version)
+                    for equipment_id, version in ((int(key), version) for key, version in payload["versions"].items())
+                }
+            equipment_id = write.equipment_id
+            base_version = write.base_version
+            if write.op != "insert":
+                equipment_id = synced.get(equipment_id, equipment_id)
+            if base_version is not None:
+                base_version = self._latest_version(superseded, equipment_id, base_version)
+            writes.append(write._replace(equipment_id=equipment_id, base_version=base_version, payload=payload))
+        return writes
+
+    def pending(self, limit=None):
+        """
+        :return: The oldest writes still to be sent, as PendingWrite entries.
+        """
+        return self._rows("status = 'pending'", limit=limit)
+
+    def entries(self):
+        """
+        :return: Every entry, including conflicts and failures kept for review.
+        """
+        return self._rows("1 = 1")
+
+    def counts(self):
+        """
+        :return: Dict of status -> number of entries.
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT status, COUNT(*) FROM pending_writes GROUP BY status")
+            counts = dict(cursor.fetchall())
+            cursor.close()
+        return counts
+
+    def complete(self, writes, results):
+        """
+        Records the outcome of a replayed batch: applied writes leave the journal,
+        conflicts and failures stay with their reason until retried or discarded.
+
+        :param writes: The PendingWrite entries that were sent.
+        :param results: Dict of seq -> (outcome, detail) from DatabaseManager.apply_writes.
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                superseded = self._load_superseded(cursor)
+                for write in writes:
+                    if write.seq not in results:
+                        continue
+                    outcome, detail = results[write.seq]
+                    if outcome != "applied":
+                        cursor.execute(
+                            "UPDATE pending_writes SET status = %s, error = %s, attempts = attempts + 1 WHERE seq = %s",
+                            (outcome, detail, write.seq)
+                        )
+                        continue
+                    cursor.execute("DELETE FROM pending_writes WHERE seq = %s", (write.seq,))
+                    if write.op == "insert":
+                        cursor.execute("INSERT OR REPLACE INTO synced_ids (temp_id, equipment_id) VALUES (%s, %s)", (write.equipment_id, detail))
+                        continue
+                    # Later writes to these items were made on the versions this one replaced
+                    if write.op == "update":
+                        replaced = {write.equipment_id: detail - 1}
+                    else:
+                        replaced = write.payload.get("versions", {})
+                    for equipment_id, version in replaced.items():
+                        version = self._latest_version(superseded, equipment_id, version)
+                        superseded.setdefault(equipment_id, {})[version] = version + 1
+                        cursor.execute(
+                            "INSERT OR REPLACE INTO superseded (equipment_id, version, new_version) VALUES (%s, %s, %s)",
+                            (equipment_id, version, version + 1)
+                        )
+                cursor.execute("SELECT COUNT(*) FROM pending_writes")
+                if cursor.fetchone()[0] == 0:
+                    cursor.execute("DELETE FROM synced_ids")  # Nothing left that could refer to them
+                self.conn.commit()
+            except Error:
+                self.conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def retry(self, seq, overwrite=False):
+        """
+        Puts a conflicting or failed entry back in the queue.
+
+        :param overwrite: Drop the version check, so the write replaces whatever the server has.
+        """
+        if not overwrite:
+            self._execute("UPDATE pending_writes SET status = 'pending', error = NULL WHERE seq = %s", (seq,))
+            return
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("SELECT payload FROM pending_writes WHERE seq = %s", (seq,))
+                row = cursor.fetchone()
+                if row is None:
+                    return
+                payload = json.loads(row[0])
+                payload.pop("versions", None)
+                cursor.execute(
+                    "UPDATE pending_writes SET status = 'pending', error = NULL, base_version = NULL, payload = %s WHERE seq = %s",
+                    (json.dumps(payload, default=str), seq)
+                )
+                self.conn.commit()
+            finally:
+                cursor.close()
+
+    def discard(self, seq):
+        self._execute("DELETE FROM pending_writes WHERE seq = %s", (seq,))
+
+    def _execute(self, query, params):
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(query, params)
+                self.conn.commit()
+            finally:
+                cursor.close()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+class JournalSyncer:
+    """
+    Background thread sending the journal to the server in batches. It runs every
+    interval seconds, or straight away after flush(); while the server can't be
+    reached it waits twice as long after each failed attempt, up to max_backoff.
+
+    :param journal: WriteJournal to replay.
+    :param db_manager: DatabaseManager of the server.
+    :param batch_size: Writes sent per transaction.
+    :param on_synced: Called on the syncer thread with (writes, results) after each batch.
+    :param on_status: Called on the syncer thread after every attempt, so the window can show the state.
+    """
+    def __init__(self, journal, db_manager, batch_size=100, interval=5.0, max_backoff=60.0, on_synced=None, on_status=None):
+        self.journal = journal
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.on_synced = on_synced
+        self.on_status = on_status
+        self.online = None  # Unknown until the server has answered or failed to
+        self.last_error = None
+        self.last_sync = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="journal-sync", daemon=True)
+        self._thread.start()
+
+    def flush(self):
+        """
+        Sends what is queued now instead of at the next interval.
+        """
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        delay = 0  # Writes left from the last session go out straight away
+        while True:
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                with instrumentation.action("sync"):
+                    checked = self.sync_once() > 0
+                    if not checked and not self._stopped.is_set():
+                        # Nothing was sent, so ask the server directly before calling it online
+                        self.db_manager.ping()
+                        checked = True
+            except Error as e:
+                self.online = False
+                self.last_error = str(e)
+                delay = min(max(delay * 2, self.interval), self.max_backoff)
+                logger.warning("Journal sync failed, retrying in %.0f s: %s", delay, e)
+            except Exception:
+                self.last_error = "Unexpected error, see the log"
+                delay = self.max_backoff
+                logger.exception("Journal sync failed")
+            else:
+                if checked:
+                    self.online = True
+                    self.last_error = None
+                delay = self.interval
+            if self.on_status is not None:
+                self.on_status()
+
+    def sync_once(self):
+        """
+        Sends every pending write, one batch per transaction.
+
+        :return: Number of writes sent.
+        :raises Error: If the server can't be reached; the unsent writes stay queued.
+        """
+        sent = 0
+        while not self._stopped.is_set():
+            writes = self.journal.pending(self.batch_size)
+            if not writes:
+                break
+            results = self.db_manager.apply_writes(writes)
+            self.journal.complete(writes, results)
+            sent += len(writes)
+            self.last_sync = datetime.datetime.now()
+            if self.on_synced is not None:
+                self.on_synced(writes, results)
+        return sent
+
+    def status(self):
+        """
+        :return: Dict with the pending, conflict and failed counts and the connection state.
+        """
+        counts = self.journal.counts()
+        return {
+            "pending": counts.get("pending", 0),
+            "conflict": counts.get("conflict", 0),
+            "failed": counts.get("failed", 0),
+            "online": self.online,
+            "last_error": self.last_error,
+            "last_sync": self.last_sync,
+        }
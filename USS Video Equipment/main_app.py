@@ -1,57 +1,111 @@
 # main_app.py
+import sys
+import startup
+if startup.REPORT_FLAG in sys.argv:
+    startup.import_timer.install()
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import filedialog
 from db import DatabaseManager
-from db import host_ct, user_ct, passwd_ct, database_ct
-from utils import initialize_fonts, display_image
-from widgets import DateInput, ColumnDropdown
+from db import EQUIPMENT_COLUMNS, DISPLAY_COLUMNS, CONNECTION_ERRORS, WriteConflict
+from export import export_equipment, ExportCancelled, column_label, DEFAULT_EXPORT_COLUMNS
+from backup import backup_table
+from restore import restore_dump
+from snapshot import EquipmentSnapshot
+from search_index import SearchIndex
+from migrations import run_migrations
+from async_db import AsyncDatabaseManager
+from journal import WriteJournal, JournalSyncer
+from utils import initialize_fonts, display_image, pics_index, thumbnail_cache
+from prefetch import ImagePrefetcher
+from widgets import DateInput, ColumnDropdown, VirtualListbox, VirtualChecklist
 import webbrowser
+import logging
+import threading
 import os
-from fpdf import FPDF
-import subprocess
+import uuid
 import modules.connect as ct
 from datetime import datetime
-import re
-import pandas as pd
 from tkinter import ttk
 
-def backup_table_to_sql(host, user, password, database, table, output_file):
-    try:
-        # Run mysqldump to create the SQL file
-        command = f"mysqldump -h {host} -u {user} -p{password} {database} {table} > {output_file}"
-        subprocess.run(command, shell=True, check=True)
-        
-        # Read the created SQL file
-        with open(output_file, 'r', encoding='utf-8') as file:
-            sql_content = file.read()
+logger = logging.getLogger(__name__)
+
+# Only needed for the box report; loaded the first time it is generated
+fpdf = startup.lazy_import("fpdf")
+
+# Columns whose distinct values feed the filter and add/update dropdowns
+DROPDOWN_COLUMNS = ("kit_name", "type", "owner")
+
+def write_boxes_pdf(boxes, filename):
+    """
+    Writes the box report as a PDF.
+
+    :param boxes: Box manifest as returned by DatabaseManager.get_box_manifest.
+    :param filename: Path of the PDF to create.
+    """
+    pdf = fpdf.FPDF()
+    pdf.add_page()
+    
+    for box in boxes:
+        # Writing to PDF
+        pdf.set_font("Arial", 'B', size=12)
+        pdf.cell(0, 7, txt=f"Box {box['box_number']}:", ln=True, align='L')
+        pdf.set_font("Arial", size=10)
+        
+        for kit_name in box['kits']:
+            pdf.cell(0, 5, txt=f"  - {kit_name} (Kit)", ln=True, align='L')
             
-        # Replace the collation
-        updated_sql_content = re.sub(r'utf8mb4_0900_ai_ci', 'utf8mb4_general_ci', sql_content)
-        
-        # Write the modified content back to the file
-        with open(output_file, 'w', encoding='utf-8') as file:
-            file.write(updated_sql_content)
+        for item_name in box['individual_items']:
+            pdf.cell(0, 5, txt=f"  - {item_name}", ln=True, align='L')
+            
+        pdf.set_font("Arial",'I', size=10)
+        pdf.cell(0, 8, txt=f"Total Weight: {box['total_weight']:.2f} lbs", ln=True, align='L')
             
-    except subprocess.CalledProcessError as e:
-        print("An error occurred while executing mysqldump:", e)
+        pdf.cell(0, 5, txt="", ln=True, align='L')
         
+    pdf.output(name=filename, dest='F')
+
 class MainApplication(tk.Tk):
-    def __init__(self):
+    def __init__(self, use_snapshot=True):
         super().__init__()
         self.title("Video Production Equipment Tracker")
         self.heading_font, self.bold_font, self.value_font = initialize_fonts()
         self.db_manager = DatabaseManager()
+        run_migrations(self.db_manager)
+        # Slow queries run on worker threads; results come back through after()
+        self.db_async = AsyncDatabaseManager(self, self.db_manager)
+        # Saves go straight to the server while it answers; when it doesn't they land in a
+        # local journal and reach the server in the background once it is back
+        self.journal = WriteJournal()
+        self.syncer = JournalSyncer(
+            self.journal, self.db_manager,
+            on_synced=lambda writes, results: self.db_async.post(self.on_journal_synced, writes, results),
+            on_status=lambda: self.db_async.post(self.update_sync_status)
+        )
+        # Decodes the images next to the selection so arrow-key browsing never waits on a JPEG
+        self.image_prefetcher = ImagePrefetcher(thumbnail_cache, pics_index)
+        # Answer list filters from an in-memory copy instead of querying on every dropdown change
+        self.snapshot = EquipmentSnapshot(self.db_manager, journal=self.journal) if use_snapshot else None
+        # Type-ahead search over names, brands, models and serials; kept up to date by our own writes
+        self.search_index = SearchIndex()
         self.current_editing_id = None  # Add this line
-        self.kit_names = ["All Kits"] + self.get_kit_names()
-        self.types = ["All Types"] + self.get_unique_types()
-        self.equipment_IDs = []
+        self.current_editing_version = None  # version of the row the edit form was filled from
+        # Filled in by refresh_dropdowns once the distinct values arrive from a worker
+        self.kit_names = ["All Kits"]
+        self.types = ["All Types"]
+        self.owners = ["All Owners"]
         self.selected_name_for_rename = None
         self.purchased_filter_var = tk.StringVar(value="Show Purchased")
+        self.search_var = tk.StringVar()
     
         self.setup_frames()
+        self.refresh_dropdowns()
+        self.reload_search_index()
         
         self.refresh_equipment_list()
+        self.update_sync_status()
+        self.syncer.start()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def format_label_text(self, index):
         # Example implementation - modify as per your requirements
@@ -61,9 +115,6 @@ class MainApplication(tk.Tk):
         else:
             return "Unknown Column"
     
-    def get_kit_names(self):
-        return sorted(self.db_manager.fetch_kit_names())
-        
     def setup_frames(self):
         self.setup_left_frame()  # Create and grid left_frame first
         self.setup_middle_frame()
@@ -114,7 +165,7 @@ class MainApplication(tk.Tk):
         
         # Type Dropdown (Renamed to type_name_dropdown)
         tk.Label(au_input_frame, text="Type:", font=self.bold_font).grid(row=row, column=0, sticky='e')
-        self.type_name_dropdown = ColumnDropdown(au_input_frame, "type", self.db_manager, row=row, column=1)
+        self.type_name_dropdown = ColumnDropdown(au_input_frame, "type", self.db_manager, row=row, column=1, values=())
         row += 1
         
         # Name Entry
@@ -171,7 +222,7 @@ class MainApplication(tk.Tk):
         
         # Kit Name Dropdown
         tk.Label(au_input_frame, text="Kit Name:", font=self.bold_font).grid(row=row, column=0, sticky='e')
-        self.kit_name_dropdown = ColumnDropdown(au_input_frame, "kit_name", self.db_manager, row=row, column=1)
+        self.kit_name_dropdown = ColumnDropdown(au_input_frame, "kit_name", self.db_manager, row=row, column=1, values=())
         row += 1
         
         # Purchased
@@ -272,8 +323,6 @@ class MainApplication(tk.Tk):
         self.type_dropdown = tk.OptionMenu(mid_filter_frame, self.type_var, *self.types, command=lambda _: self.refresh_equipment_list())
         self.type_dropdown.grid(column=1,row=1)
         
-        self.owners = ["All Owners"] + self.db_manager.get_unique_owners()
-        
         # Owner Dropdown
         self.owner_var = tk.StringVar(value=self.owners[0])
         self.owner_dropdown = tk.OptionMenu(mid_filter_frame, self.owner_var, *self.owners, command=lambda _: self.refresh_equipment_list())
@@ -285,8 +334,18 @@ class MainApplication(tk.Tk):
         self.purchased_filter_dropdown.grid(column=0, row=2, padx=10, pady=10, columnspan=3)
         self.purchased_filter_dropdown.bind("<<ComboboxSelected>>", lambda _: self.refresh_equipment_list())
         
-        # Equipment Listbox
-        self.equipment_listbox = tk.Listbox(self.middle_frame, font=self.value_font, width=50, height=50)
+        # Search box; the list narrows on every keystroke
+        search_frame = tk.Frame(self.middle_frame)
+        search_frame.grid(column=0, row=row, columnspan=2, padx=10, sticky='w')
+        row += 1
+        tk.Label(search_frame, text="Search:", font=self.bold_font).grid(column=0, row=0)
+        self.search_entry = tk.Entry(search_frame, textvariable=self.search_var, width=40)
+        self.search_entry.grid(column=1, row=0, padx=5)
+        self.search_entry.bind("<Escape>", lambda _: self.search_var.set(""))
+        self.search_var.trace_add("write", lambda *_: self.refresh_equipment_list())
+        
+        # Equipment Listbox; only the visible rows are drawn, so large inventories refresh instantly
+        self.equipment_listbox = VirtualListbox(self.middle_frame, font=self.value_font, width=50, height=50)
         self.equipment_listbox.grid(row=row, column=0, columnspan=2, padx=10, pady=10)
         self.equipment_listbox.bind('<<ListboxSelect>>', self.on_select)
         row += 1 
@@ -302,9 +361,6 @@ class MainApplication(tk.Tk):
         self.delete_button = tk.Button(mid_buttons_frame, text="Delete Equipment", command=self.delete_equipment)
         self.delete_button.grid(row=0, column=1)
         
-        # Initial Populate Listbox
-        self.refresh_equipment_list()
-        
     def setup_window_frame(self):
         self.window_frame = tk.Frame(self.left_frame)
         self.window_frame.grid(column=0, row=1, padx=10, pady=10)
@@ -327,6 +383,21 @@ class MainApplication(tk.Tk):
         self.export_excel_button = tk.Button(self.window_frame, text="Export to Excel", command=self.export_to_excel)
         self.export_excel_button.grid(column=1, row=1, padx=10, pady=10)  # Adjust the grid parameters as needed
         
+        self.image_report_button = tk.Button(self.window_frame, text="Image Report", command=self.open_image_report_window)
+        self.image_report_button.grid(column=2, row=1, padx=10, pady=10)
+        
+        self.restore_sql_button = tk.Button(self.window_frame, text="Restore SQL File", command=self.restore_sql_file)
+        self.restore_sql_button.grid(column=3, row=1, padx=10, pady=10)
+        
+        self.diagnostics_button = tk.Button(self.window_frame, text="Diagnostics", command=self.open_diagnostics_window)
+        self.diagnostics_button.grid(column=3, row=0, padx=10, pady=10)
+        
+        self.pending_button = tk.Button(self.window_frame, text="Pending Changes", command=self.open_pending_window)
+        self.pending_button.grid(column=0, row=2, padx=10, pady=10)
+        
+        self.sync_status_label = tk.Label(self.window_frame, text="", anchor='w')
+        self.sync_status_label.grid(column=1, row=2, columnspan=3, padx=10, pady=10, sticky='w')
+        
         
     def open_boxes_window(self):
         self.boxes_window = tk.Toplevel(self)
@@ -362,45 +433,18 @@ class MainApplication(tk.Tk):
             return
         
         filename = f"{directory}/boxes_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        pdf = FPDF()
-        pdf.add_page()
-        
-        # Fetch box data
-        boxes = self.db_manager.get_boxes()  # Modify as per your method to fetch box data
         
-        for box in boxes:
-            box_id = box[0]
-            items_in_box = self.db_manager.get_items_in_box(box_id)  # Fetch items in the box
-            
-            # Distinguish between individual items and kits
-            kits_in_box = set()
-            individual_items = set()
-            for item in items_in_box:
-                kit_name = item[2]  # Assuming kit_name is at index 17
-                if kit_name and kit_name != "None":
-                    kits_in_box.add(kit_name)
-                else:
-                    individual_items.add(item[0])  # Assuming item name is at index 0
-                    
-            # Writing to PDF
-            pdf.set_font("Arial", 'B', size=12)
-            pdf.cell(0, 7, txt=f"Box {box_id}:", ln=True, align='L')
-            total_weight = sum(item[1] for item in items_in_box if item[1] is not None and len(item) > 1)
-            pdf.set_font("Arial", size=10)
+        def build_pdf():
+            # Every box and its contents in one query; reused until a write touches box contents
+            boxes = self.db_manager.get_box_manifest(use_cache=True)
+            write_boxes_pdf(boxes, filename)
             
-            for kit_name in kits_in_box:
-                pdf.cell(0, 5, txt=f"  - {kit_name} (Kit)", ln=True, align='L')
-                
-            for item_name in individual_items:
-                pdf.cell(0, 5, txt=f"  - {item_name}", ln=True, align='L')
-                
-            pdf.set_font("Arial",'I', size=10)
-            pdf.cell(0, 8, txt=f"Total Weight: {total_weight:.2f} lbs", ln=True, align='L')
-                
-            pdf.cell(0, 5, txt="", ln=True, align='L')
-                
-        pdf.output(name=filename, dest='F').encode('latin1')
-        messagebox.showinfo("Success", f"PDF generated at {filename}")
+        self.db_async.submit(
+            build_pdf,
+            key="boxes_pdf",
+            callback=lambda _: messagebox.showinfo("Success", f"PDF generated at {filename}"),
+            errback=lambda e: messagebox.showerror("Error", f"PDF could not be generated: {e}")
+        )
         
     def open_rename_window(self):
         self.rename_window = tk.Toplevel(self)
@@ -411,15 +455,13 @@ class MainApplication(tk.Tk):
         self.rename_listbox.grid(row=0, column=0, padx=10, pady=10)
         self.rename_listbox.bind('<<ListboxSelect>>', self.on_rename_listbox_select)
         
-        # Populate the listbox with unique names sorted alphabetically
-        unique_names = self.db_manager.get_unique_names()  # Method to be implemented in DatabaseManager
-        for name in sorted(unique_names):
-            self.rename_listbox.insert(tk.END, name)
-            
         # Entry field for new name
         self.new_name_entry = tk.Entry(self.rename_window)
         self.new_name_entry.grid(row=1, column=0, padx=10, pady=10)
         
+        # Populate the listbox with unique names sorted alphabetically, once they arrive
+        self.refresh_rename_listbox()
+        
         # Button to execute renaming
         rename_button = tk.Button(self.rename_window, text="Rename", command=self.execute_rename)
         rename_button.grid(row=2, column=0, padx=10, pady=10)
@@ -441,47 +483,88 @@ class MainApplication(tk.Tk):
         
         if old_name and new_name and new_name != old_name:
             # Proceed with the renaming logic
-            self.db_manager.update_equipment_name(old_name, new_name)
-            self.rename_image_file(old_name, new_name)
-            
-            # Refresh the listboxes with updated names
-            self.refresh_rename_listbox()
-            self.refresh_equipment_list()  # Refresh the main equipment listbox
+            versions = self.row_versions(names=[old_name])
             
+            def renamed(count, queued):
+                if count is None:
+                    messagebox.showerror("Error", "The rename could not be saved")
+                    return
+                self.search_index.rename(old_name, new_name)
+                self.rename_image_file(old_name, new_name)
+                
+                # Refresh the listboxes with updated names
+                self.refresh_rename_listbox()
+                self.refresh_equipment_list()  # Refresh the main equipment listbox
+                
+                self.show_saved(f"'{old_name}' has been renamed to '{new_name}'", queued)
+                
+            self.save_write(
+                lambda: self.db_manager.update_equipment_name(old_name, new_name),
+                lambda: self.journal.update_equipment_name(old_name, new_name, versions=versions),
+                renamed
+            )
             # Reset the selected name for rename
             self.selected_name_for_rename = None
-            
-            messagebox.showinfo("Success", f"'{old_name}' has been renamed to '{new_name}'")
         else:
             messagebox.showerror("Input Error", "Invalid input. Please ensure the new name is different.")
             
     def refresh_rename_listbox(self):
-        # Clear existing items
-        self.rename_listbox.delete(0, tk.END)
+        # Clear the new name entry field
+        self.new_name_entry.delete(0, tk.END)
         
-        # Fetch updated unique names and repopulate the listbox
-        unique_names = self.db_manager.get_unique_names()
+        # Fetch updated unique names on a worker and repopulate the listbox
+        self.db_async.call("get_unique_names", key="rename_names", callback=self.show_rename_names)
+        
+    def show_rename_names(self, unique_names):
+        if not self.rename_window.winfo_exists():
+            return  # Closed while the names were loading
+        self.rename_listbox.delete(0, tk.END)
         for name in sorted(unique_names):
             self.rename_listbox.insert(tk.END, name)
-            
-        # Clear the new name entry field
-        self.new_name_entry.delete(0, tk.END)
                 
     def rename_image_file(self, old_name, new_name):
-        for ext in ['.png', '.jpg']:
-            old_path = os.path.join('Pics', f'{old_name}{ext}')
-            new_path = os.path.join('Pics', f'{new_name}{ext}')
-            if os.path.exists(old_path):
-                os.rename(old_path, new_path)
-                break
+        pics_index.rename(old_name, new_name)
+        
+    def open_image_report_window(self):
+        report_window = tk.Toplevel(self)
+        report_window.title("Image Report")
+        
+        # Equipment rows with no picture on the left, pictures with no row on the right
+        missing_label = tk.Label(report_window, text="Equipment without an image (loading...)", font=self.bold_font)
+        missing_label.grid(row=0, column=0, padx=10, pady=5)
+        unmatched_label = tk.Label(report_window, text="Images without equipment (loading...)", font=self.bold_font)
+        unmatched_label.grid(row=0, column=1, padx=10, pady=5)
+        missing_listbox = tk.Listbox(report_window, width=50, height=20)
+        missing_listbox.grid(row=1, column=0, padx=10, pady=10)
+        unmatched_listbox = tk.Listbox(report_window, width=50, height=20)
+        unmatched_listbox.grid(row=1, column=1, padx=10, pady=10)
+        
+        def show_report(equipment_names):
+            if not report_window.winfo_exists():
+                return
+            missing = pics_index.missing_images(equipment_names)
+            unmatched = pics_index.unmatched_images(equipment_names)
+            missing_label.config(text=f"Equipment without an image ({len(missing)})")
+            unmatched_label.config(text=f"Images without equipment ({len(unmatched)})")
+            missing_listbox.insert(tk.END, *missing)
+            unmatched_listbox.insert(tk.END, *(os.path.basename(path) for path in unmatched))
+            
+        self.db_async.call("get_unique_names", key="image_report", callback=show_report)
                 
     def populate_boxes_listbox(self):
+        # Load every box with its items once, on a worker; selecting a box is then answered locally
+        self.box_manifest = {}
+        self.db_async.call("get_box_manifest", key="boxes", callback=self.show_boxes)
+        
+    def show_boxes(self, boxes):
+        if not self.boxes_window.winfo_exists():
+            return
         self.boxes_listbox.delete(0, tk.END)
         max_length = 0  # Variable to store the length of the longest item
         upper_limit = 30  # Upper limit for the width
-        boxes = self.db_manager.get_boxes()  # Implement this method in your DatabaseManager
-        for box in boxes:
-            item_text = f"Box {box[0]}"
+        self.box_manifest = {str(box['box_number']): box for box in boxes}
+        for box_id in self.box_manifest:
+            item_text = f"Box {box_id}"
             max_length = max(max_length, len(item_text))
             self.boxes_listbox.insert(tk.END, item_text)
         self.boxes_listbox.config(width=min(max_length, upper_limit))
@@ -504,10 +587,12 @@ class MainApplication(tk.Tk):
         if not box_id:
             return  # Exit if no box is selected
         
-        items = self.db_manager.get_items_in_box(box_id)
+        box = self.box_manifest.get(box_id)
+        if box is None:
+            return
+        items = box['items']
         
-        # Assuming that each item is a tuple in the format (name, weight)
-        total_weight = round(sum(item[1] for item in items if item[1] is not None), 2)
+        total_weight = round(box['total_weight'], 2)
         
         # Update total weight label
         self.total_weight_label.config(text=f"Total Weight: {total_weight} lbs")
@@ -522,9 +607,21 @@ class MainApplication(tk.Tk):
         if selected_id:
             response = messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this equipment?")
             if response:
-                self.db_manager.delete_equipment(selected_id)
-                messagebox.showinfo("Success", "Equipment deleted successfully")
-                self.refresh_equipment_list()
+                base_version = self.row_versions(ids=[selected_id]).get(selected_id)
+                
+                def deleted(count, queued):
+                    if count is None:
+                        messagebox.showerror("Error", "The delete could not be saved")
+                        return
+                    self.search_index.remove(selected_id)
+                    self.show_saved("Equipment deleted successfully", queued)
+                    self.refresh_equipment_list()
+                    
+                self.save_write(
+                    lambda: self.db_manager.delete_equipment(selected_id),
+                    lambda: self.journal.delete_equipment(selected_id, base_version=base_version),
+                    deleted
+                )
             
     def toggle_insured(self):
         if self.is_insured_var.get():
@@ -539,34 +636,38 @@ class MainApplication(tk.Tk):
             self.date_insured_input.year_entry.grid_remove()
     
     def get_unique_kit_names(self):
-        query = "SELECT DISTINCT kit_name FROM equipment WHERE kit_name IS NOT NULL"
-        return [item[0] for item in self.fetch_data(query)]
-    
-    def get_unique_types(self):
-        query = "SELECT DISTINCT type FROM equipment WHERE type IS NOT NULL"
-        return sorted([item[0] for item in self.db_manager.fetch_data(query)])
+        return self.db_manager.get_distinct_values(["kit_name"])["kit_name"]
     
     def refresh_dropdowns(self):
+        # One round trip for every dropdown, on a worker; later lookups are served from the manager's cache
+        self.db_async.call("get_distinct_values", DROPDOWN_COLUMNS, key="dropdowns", callback=self.show_dropdown_values)
+        
+    def show_dropdown_values(self, values):
         # Refresh Kit Names
-        self.kit_names = ["All Kits"] + self.get_kit_names()
+        self.kit_names = ["All Kits"] + sorted(str(kit_name) for kit_name in values["kit_name"])
         self.update_option_menu(self.kit_dropdown, self.kit_var, self.kit_names)
         
         # Refresh Types
-        unique_types = self.get_unique_types()
+        unique_types = sorted(values["type"])
         if "All Types" not in unique_types:
             unique_types.insert(0, "All Types")
         self.types = unique_types
         self.update_option_menu(self.type_dropdown, self.type_var, self.types)
         
         # Refresh Owners
-        self.owners = ["All Owners"] + self.get_unique_owners()
+        self.owners = ["All Owners"] + sorted(values["owner"])
         self.update_option_menu(self.owner_dropdown, self.owner_var, self.owners)
         
+        # And the add/update form
+        self.type_name_dropdown.set_options(values["type"])
+        self.kit_name_dropdown.set_options(values["kit_name"])
+        
     def update_option_menu(self, dropdown, variable, options):
         menu = dropdown["menu"]
         menu.delete(0, "end")
         for option in options:
-            menu.add_command(label=option, command=lambda value=option: variable.set(value))
+            # Same as picking from the menu built in setup_middle_frame: the list follows the filter
+            menu.add_command(label=option, command=lambda value=option: (variable.set(value), self.refresh_equipment_list()))
         variable.set(options[0])
 
     def add_equipment(self):
@@ -604,12 +705,25 @@ class MainApplication(tk.Tk):
             messagebox.showerror("Input Error", "Invalid cost value. Please enter a valid number.")
             return  # Stop the execution if the cost value is invalid
         
-        # Call DatabaseManager method to add equipment
-        self.db_manager.add_or_update_equipment(equipment_data, is_update=False)
-        self.refresh_equipment_list()
+        # The same key goes with the queued copy, so an insert the server took before the
+        # connection dropped isn't added a second time when the journal replays it
+        client_key = str(uuid.uuid4())
         
-        # Show confirmation popup
-        messagebox.showinfo("Success", "Equipment added successfully")
+        def added(new_id, queued):
+            if new_id is None:
+                messagebox.showerror("Error", "The equipment could not be saved")
+                return
+            self.search_index.update(new_id, equipment_data)
+            self.refresh_equipment_list()
+            
+            # Show confirmation popup
+            self.show_saved("Equipment added successfully", queued)
+            
+        self.save_write(
+            lambda: self.db_manager.add_or_update_equipment(equipment_data, client_key=client_key),
+            lambda: self.journal.add_or_update_equipment(equipment_data, client_key=client_key),
+            added
+        )
 
     def edit_equipment(self):
         selected_id = self.get_selected_equipment_id()
@@ -618,18 +732,23 @@ class MainApplication(tk.Tk):
             self.populate_fields_for_edit(selected_id)
             self.update_button.grid()
             
-    def populate_fields_for_edit(self, equipment_id):
-        equipment_details = self.db_manager.get_equipment_details(equipment_id)
+    def populate_fields_for_edit(self, equipment_id, equipment_details=None):
+        if equipment_details is None:
+            # Fetched on a worker; only the item edited last fills the form
+            self.db_async.call(
+                "get_equipment_details", equipment_id,
+                key="edit_details",
+                callback=lambda details: self.populate_fields_for_edit(equipment_id, details)
+            )
+            return
+        if equipment_id != self.current_editing_id:
+            return  # Another item was picked for editing meanwhile
         if not equipment_details:
-            print("Error: Equipment details not found.")
+            logger.error("Equipment details not found for id %s", equipment_id)
             return
         
-        equipment_tuple = equipment_details[0]
-        
-        # Check if equipment_tuple has enough elements
-        if len(equipment_tuple) < 29:  # Adjust the number based on your data structure
-            print("Error: Equipment tuple does not have enough elements.")
-            return
+        equipment = equipment_details[0]
+        self.current_editing_version = equipment.version
     
         # Clear existing content in the fields
         self.entry_name.delete(0, tk.END)
@@ -644,53 +763,48 @@ class MainApplication(tk.Tk):
         self.entry_url.delete(0, tk.END)
     
         # Populate the fields with the equipment details
-        self.entry_name.insert(0, equipment_tuple[1])  # Name
-        self.entry_brand.insert(0, equipment_tuple[3])  # Brand
-        model_value = str(equipment_tuple[4]) if equipment_tuple[4] is not None else ""
+        self.entry_name.insert(0, equipment.name)
+        self.entry_brand.insert(0, equipment.brand)
+        model_value = str(equipment.model) if equipment.model is not None else ""
         self.entry_model.insert(0, model_value)
-        model_number = equipment_tuple[16] if equipment_tuple[16] else ''
+        model_number = equipment.model_number if equipment.model_number else ''
         self.entry_model_number.delete(0, tk.END)
-        self.entry_model_number.insert(0, model_number)  # Model Number
-        self.entry_description.insert(0, equipment_tuple[14])  # Description
-        serial_number_value = str(equipment_tuple[5]) if equipment_tuple[5] is not None else ""
+        self.entry_model_number.insert(0, model_number)
+        self.entry_description.insert(0, equipment.description)
+        serial_number_value = str(equipment.serial_number) if equipment.serial_number is not None else ""
         self.entry_sn.insert(0, serial_number_value)
-        self.entry_weight.insert(0, str(equipment_tuple[28]))
-        self.status_var.set(equipment_tuple[11])  # Status
-        purchase_company_value = str(equipment_tuple[6]) if equipment_tuple[6] is not None else ""
+        self.entry_weight.insert(0, str(equipment.weight))
+        self.status_var.set(equipment.status)
+        purchase_company_value = str(equipment.purchase_company) if equipment.purchase_company is not None else ""
         self.entry_purchaseCompany.insert(0, purchase_company_value)
-        if equipment_tuple[7]:  # Checking if the date_of_purchase is not None
-            self.purchase_date_input.set_date(equipment_tuple[7])
+        if equipment.date_of_purchase:
+            self.purchase_date_input.set_date(equipment.date_of_purchase)
         else:
             self.purchase_date_input.reset()  # Reset or clear the date fields if no date is present
             
-        self.entry_cost.insert(0, str(equipment_tuple[8]))  # Cost
-        self.entry_url.insert(0, equipment_tuple[15])  # URL
+        self.entry_cost.insert(0, str(equipment.cost))
+        self.entry_url.insert(0, equipment.website_url)
         
         # Populate the not_purchased checkbox
-        not_purchased_index = 30
-        self.not_purchased_var.set(equipment_tuple[not_purchased_index])
+        self.not_purchased_var.set(equipment.not_purchased)
     
         # Handling insured date (if applicable)
-        if equipment_tuple[9]:  # Date Insured
+        if equipment.date_insured:
             self.is_insured_var.set(True)
-            self.date_insured_input.set_date(equipment_tuple[9])
+            self.date_insured_input.set_date(equipment.date_insured)
         else:
             self.is_insured_var.set(False)
             
         # Type Dropdown (Use type_name_dropdown)
-        self.type_name_dropdown.var.set(equipment_tuple[2])  # Type
+        self.type_name_dropdown.var.set(equipment.type)
     
         # Toggle insured date visibility
         self.toggle_insured()
         
         # Update the Kit Name Dropdown
-        kit_name_index = 17  # Update this index based on your database structure
-        kit_name = equipment_tuple[kit_name_index]
-        if isinstance(kit_name, tuple) and len(kit_name) > 0:
-            kit_name = kit_name[0]
-        self.kit_name_dropdown.var.set(kit_name)
+        self.kit_name_dropdown.var.set(equipment.kit_name)
         
-        self.owner_name_dropdown.set(equipment_tuple[29])
+        self.owner_name_dropdown.set(equipment.owner)
     
         # Show update button, hide add button
         self.update_button.grid()
@@ -720,45 +834,91 @@ class MainApplication(tk.Tk):
             'not_purchased': self.not_purchased_var.get()
         }
         
-        # Update equipment
-        self.db_manager.add_or_update_equipment(updated_data, is_update=True, equipment_id=self.current_editing_id)
+        # Update equipment; it only replaces the row if nobody changed it since the form was filled
+        equipment_id, base_version = self.current_editing_id, self.current_editing_version
         
-        # Refresh the equipment list
-        self.refresh_equipment_list()
-        
-        # Find and select the updated equipment in the listbox
-        for index, item in enumerate(self.equipment_listbox.get(0, tk.END)):
-            selected = self.equipment_IDs[index]
-            if int(selected) == self.current_editing_id:
-                self.equipment_listbox.selection_set(index)
-                self.equipment_listbox.see(index)
-                self.equipment_listbox.activate(index)  # This line activates the selection
-                break
+        def updated(saved_id, queued):
+            if saved_id is None:
+                messagebox.showerror("Error", "The changes could not be saved")
+                return
+            self.search_index.update(equipment_id, updated_data)
             
-        # Reset the editing ID
-        self.current_editing_id = None
-        
-        self.update_button.grid_remove()
-        
-        # Show confirmation popup
-        messagebox.showinfo("Success", "Equipment updated successfully")
+            # Refresh the equipment list and reselect the updated equipment once it has loaded
+            self.refresh_equipment_list(select_id=equipment_id)
+            
+            # Reset the editing ID, unless another item was opened for editing meanwhile
+            if self.current_editing_id == equipment_id:
+                self.current_editing_id = None
+                self.current_editing_version = None
+                self.update_button.grid_remove()
+            
+            # Show confirmation popup
+            self.show_saved("Equipment updated successfully", queued)
+            
+        def failed(error):
+            if isinstance(error, WriteConflict):
+                messagebox.showerror("Changed Elsewhere", "This item was changed by someone else after you opened it. Open it again to see their changes, then make yours.")
+            else:
+                logger.error("Error updating equipment", exc_info=error)
+                messagebox.showerror("Error", "The changes could not be saved")
+                
+        self.save_write(
+            lambda: self.db_manager.add_or_update_equipment(updated_data, is_update=True, equipment_id=equipment_id, base_version=base_version),
+            lambda: self.journal.add_or_update_equipment(updated_data, is_update=True, equipment_id=equipment_id, base_version=base_version),
+            updated, failed
+        )
     
     def get_selected_equipment_id(self):
-        try:
-            selected = self.equipment_IDs[self.equipment_listbox.curselection()[0]]
-            return int(selected)  # Ensure it's an integer
-        except tk.TclError:
+        selected = self.equipment_listbox.selected_id()
+        if selected is None:
             messagebox.showerror("Error", "No equipment selected")
-            return None
+        return selected
             
-    def refresh_equipment_list(self):
-        self.equipment_listbox.delete(0, tk.END)  # Clear existing items in the listbox
-        
+    def refresh_equipment_list(self, select_id=None):
         selected_kit_name = self.kit_var.get()
         selected_type = self.type_var.get()
         selected_owner = self.owner_var.get()
         selected_purchased_filter = self.purchased_filter_var.get()  # Get the selected value from the dropdown
-        
+        search_query = self.search_var.get().strip()
+        
+        if self.snapshot is not None:
+            load = lambda: self.snapshot.filter(
+                kit_name=None if selected_kit_name == "All Kits" else selected_kit_name,
+                type=None if selected_type == "All Types" else selected_type,
+                owner=None if selected_owner == "All Owners" else selected_owner,
+                not_purchased={"Show Purchased": False, "Show Not Purchased": True}.get(selected_purchased_filter),
+                ids=self.loaded_search_index().match(search_query) if search_query else None
+            )
+        elif search_query:
+            load = lambda: self.loaded_search_index().search(
+                search_query, self.query_equipment_list(selected_kit_name, selected_type, selected_owner, selected_purchased_filter)
+            )
+        else:
+            load = lambda: self.query_equipment_list(selected_kit_name, selected_type, selected_owner, selected_purchased_filter)
+            
+        # Only the latest filter change gets to fill the listbox
+        self.db_async.submit(load, key="equipment_list", callback=lambda equipment_list: self.show_equipment_list(equipment_list, select_id, search_query))
+        
+    def loaded_search_index(self):
+        # Runs on a worker thread; a search typed before the startup load finished waits for it
+        if not self.search_index.loaded:
+            self.search_index.load(self.db_manager)
+        return self.search_index
+    
+    def reload_search_index(self):
+        self.db_async.submit(self.search_index.load, self.db_manager, key="search_index")
+        
+    def show_equipment_list(self, equipment_list, select_id=None, search_query=""):
+        decorate = None
+        if search_query:
+            decorate = lambda equipment_id: self.search_index.highlight(equipment_id, search_query)
+        self.equipment_listbox.set_rows(equipment_list, decorate)
+            
+        # Find and select the requested equipment in the listbox
+        if select_id is not None:
+            self.equipment_listbox.select_id(select_id)
+            
+    def query_equipment_list(self, selected_kit_name, selected_type, selected_owner, selected_purchased_filter):
         # Adjust the query based on the selected filters
         query = "SELECT id, name FROM equipment"
         conditions = []
@@ -785,12 +945,7 @@ class MainApplication(tk.Tk):
             
         query += " ORDER BY name"  # Add this line to sort by name
         
-        self.equipment_IDs = []
-        equipment_list = self.db_manager.fetch_data(query, tuple(params))
-        for equipment in equipment_list:
-            display_text = f"{equipment[1]}"
-            self.equipment_IDs.append(f"{equipment[0]}")
-            self.equipment_listbox.insert(tk.END, display_text)
+        return self.db_manager.fetch_records(query, tuple(params))
             
     def on_select(self, event):
         if not self.equipment_listbox.curselection():
@@ -798,57 +953,63 @@ class MainApplication(tk.Tk):
         
         selected_index = self.equipment_listbox.curselection()[0]
 
-        selected_id = self.equipment_IDs[selected_index]
+        selected_id = self.equipment_listbox.selected_id()
         
-        equipment_details = self.db_manager.get_equipment_details(selected_id)
-        if not equipment_details or len(equipment_details) == 0:
-            print("Error: No data found for equipment")
-            return
+        positions = self.image_prefetcher.neighbour_positions(selected_index, self.equipment_listbox.size())
+        self.image_prefetcher.prefetch([self.equipment_listbox.get(position) for position in positions])
+        
+        # A newer selection makes these requests stale, so fast clicking never shows an old item.
+        # The image only needs the name, so it doesn't wait for the full row
+        self.db_async.call(
+            "get_equipment_fields", selected_id, ("id", "name"),
+            key="selection",
+            callback=self.show_selection
+        )
+        self.db_async.call(
+            "get_equipment_details", selected_id,
+            key="selection_details",
+            callback=lambda equipment_details: self.display_details(selected_id, equipment_details)
+        )
         
-        # Access the first tuple from the list (since it's a list of tuples)
-        equipment_tuple = equipment_details[0]
-        if len(equipment_tuple) < 2:
-            print("Error: Insufficient data in equipment tuple")
+    def show_selection(self, equipment):
+        if equipment is None:
+            logger.error("No data found for the selected equipment")
             return
         
-        # Now use equipment_tuple for further processing
-        # self.populate_fields_for_edit(equipment_tuple)
         self.right_frame.grid()
-        display_image(self.image_frame, equipment_tuple[1])  # Assuming the name is at index 1
-        self.display_details(selected_id)
+        display_image(self.image_frame, equipment.name)
     
     def update_image(self, item_name):
         display_image(self.image_frame, item_name)
         
-    def display_details(self, equipment_id):
+    def display_details(self, equipment_id, equipment_details=None):
+        if equipment_details is None:
+            # Shares on_select's key, so a newer selection wins over this one
+            self.db_async.call(
+                "get_equipment_details", equipment_id,
+                key="selection_details",
+                callback=lambda details: self.display_details(equipment_id, details)
+            )
+            return
+        
         for widget in self.container_frame.winfo_children():
             widget.destroy()
             
-        equipment_details = self.db_manager.get_equipment_details(equipment_id)
         if equipment_details:
-            equipment_tuple = equipment_details[0]
+            equipment = equipment_details[0]
             
-            column_names = [
-                "ID", "Name", "Type", "Brand", "Model", "Serial Number",
-                "Purchase Company", "Date of Purchase", "Cost", "Date Insured",
-                "Storage Location", "Status", "Current Holder", "Current Condition",
-                "Description", "Website URL", "Model Number", "Kit Name", "Carrier",
-                "Tracking Number", "Shipping Address", "Shipping City",
-                "Shipping State", "Shipping ZIP", "Shipped Date",
-                "Box Number", "Destination Name", "Shipping Status", "Weight",
-                "Owner", "Not Purchased"
-            ]
-            
-            for index, (col_name, detail) in enumerate(zip(column_names, equipment_tuple)):
-                
+            # Labels follow the record's own fields, so a schema change can't shift them
+            fields = [field for field in DISPLAY_COLUMNS if field in equipment._fields]
+            for index, field in enumerate(fields):
+                detail = getattr(equipment, field)
                 
-                label = tk.Label(self.container_frame, text=col_name + ":", font=self.bold_font)
+                label = tk.Label(self.container_frame, text=column_label(field) + ":", font=self.bold_font)
                 label.grid(row=index, column=0, sticky="w")
                 
-                if col_name == "Not Purchased":
-                    detail = "Yes" if detail else "No"  # Assuming detail is a boolean
+                if field == "not_purchased":
+                    detail = "Yes" if detail else "No"
                     
-                if col_name == "Website URL" and detail:
+                if field == "website_url" and detail:
                     hyperlink = tk.Label(self.container_frame, text=detail, fg="blue", cursor="hand2")
                     hyperlink.grid(row=index, column=1, sticky="w")
                     hyperlink.bind("<Button-1>", lambda e, url=detail: webbrowser.open(url) if url else None)
@@ -856,37 +1017,75 @@ class MainApplication(tk.Tk):
                     value_label = tk.Label(self.container_frame, text=str(detail), font=self.value_font)
                     value_label.grid(row=index, column=1, sticky="w")
                     
-    def create_scrollable_frame(self, parent, row, column, rowspan, columnspan):
-        # Create a frame to contain the Canvas and Scrollbar
-        frame_container = tk.Frame(parent)
-        frame_container.grid(row=row, column=column, rowspan=rowspan, columnspan=columnspan, sticky='nsew')
-        
-        canvas = tk.Canvas(frame_container)
-        scrollbar = tk.Scrollbar(frame_container, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas)
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(
-                scrollregion=canvas.bbox("all")
+    def export_to_excel(self):
+        export_window = tk.Toplevel(self)
+        export_window.title("Export Equipment")
+        
+        # Column picker, preselected to the columns the export has always written
+        tk.Label(export_window, text="Columns to export:", font=self.bold_font).grid(row=0, column=0, columnspan=2, padx=10, pady=5, sticky='w')
+        columns_listbox = tk.Listbox(export_window, selectmode=tk.MULTIPLE, exportselection=False, width=30, height=16)
+        columns_listbox.grid(row=1, column=0, columnspan=2, padx=10, pady=5)
+        for position, column in enumerate(EQUIPMENT_COLUMNS):
+            columns_listbox.insert(tk.END, column_label(column))
+            if column in DEFAULT_EXPORT_COLUMNS:
+                columns_listbox.selection_set(position)
+        
+        progress_bar = ttk.Progressbar(export_window, orient='horizontal', length=240, mode='determinate')
+        progress_bar.grid(row=2, column=0, columnspan=2, padx=10, pady=5)
+        status_label = tk.Label(export_window, text="")
+        status_label.grid(row=3, column=0, columnspan=2, padx=10)
+        cancel_event = threading.Event()
+        
+        def show_progress(done, total):
+            if progress_bar.winfo_exists():
+                progress_bar.config(maximum=max(total, 1), value=done)
+                status_label.config(text=f"{done} of {total} rows")
+        
+        def finish(rows_written, file_path):
+            if export_window.winfo_exists():
+                export_window.destroy()
+            messagebox.showinfo("Success", f"{rows_written} rows exported successfully to {file_path}")
+        
+        def fail(error):
+            if isinstance(error, ExportCancelled):
+                return
+            if export_window.winfo_exists():
+                export_button.config(state=tk.NORMAL)
+            messagebox.showerror("Error", f"Export failed: {error}")
+        
+        def start_export():
+            selected = [EQUIPMENT_COLUMNS[position] for position in columns_listbox.curselection()]
+            if not selected:
+                messagebox.showerror("Error", "Select at least one column to export", parent=export_window)
+                return
+            file_path = filedialog.asksaveasfilename(
+                parent=export_window,
+                defaultextension=".xlsx",
+                filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("All files", "*.*")]
+            )
+            if not file_path:
+                return
+            cancel_event.clear()
+            export_button.config(state=tk.DISABLED)
+            self.db_async.submit(
+                export_equipment, self.db_manager, file_path, selected,
+                progress=lambda done, total: self.db_async.post(show_progress, done, total),
+                cancel_event=cancel_event,
+                key="export",
+                callback=lambda rows_written: finish(rows_written, file_path),
+                errback=fail
             )
-        )
-        
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
         
-        canvas.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        def cancel_export():
+            # A running export stops at its next chunk and removes the partial file
+            cancel_event.set()
+            if export_window.winfo_exists():
+                export_window.destroy()
         
-        return scrollable_frame
-    
-    def export_to_excel(self):
-        data = self.db_manager.fetch_all_equipment()
-        df = pd.DataFrame(data, columns=["Name", "Brand", "Model", "Model Number", "Serial Number", "Purchase Company", "Date of Purchase", "Cost", "Owner", "Website URL"])
-        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")])
-        if file_path:
-            df.to_excel(file_path, index=False)
-            messagebox.showinfo("Success", f"Data exported successfully to {file_path}")
+        export_button = tk.Button(export_window, text="Export", command=start_export)
+        export_button.grid(row=4, column=0, padx=10, pady=10)
+        tk.Button(export_window, text="Cancel", command=cancel_export).grid(row=4, column=1, padx=10, pady=10)
+        export_window.protocol("WM_DELETE_WINDOW", cancel_export)
 
     def open_shipping_window(self):
         self.shipping_window = tk.Toplevel(self)
@@ -1017,68 +1216,89 @@ class MainApplication(tk.Tk):
         select_all_button.grid(column=0, row=row, padx=10, pady=10, columnspan=2)
         row += 1
     
-        # Create a Listbox to display equipment or kits
-        #self.shipping_listbox = tk.Listbox(self.shipping_window, width=50, height=15)
-        #self.shipping_listbox.grid(column=3, row=row, columnspan=2, padx=10, pady=10)
-    
-        # Create scrollable frame for checkboxes
-        self.checkbox_frame = self.create_scrollable_frame(items_frame, row, 0, row, 2)
-        self.checkbox_vars = {}
+        # Checklist of equipment or kits; only the visible rows are drawn
+        self.shipping_checklist = VirtualChecklist(items_frame, font=self.value_font, width=40, height=25)
+        self.shipping_checklist.grid(column=0, row=row, columnspan=2, sticky='nsew')
     
-        # Populate the Listbox with checkboxes
+        # Populate the checklist
         self.populate_shipping_listbox()
         
     def set_shipping_info_to_null(self):
         # Define the fields to set to null
         fields_to_nullify = ['carrier', 'tracking_number', 'shipping_address', 'shipping_city', 'shipping_state', 'shipping_zip', 'shipped_date', 'box_number', 'shipping_destination_name', 'shipping_status']
         
-        # Construct the nullify query
-        query_parts = [f"{field} = NULL" for field in fields_to_nullify]
-        update_query = "UPDATE equipment SET " + ", ".join(query_parts) + " WHERE id = %s"
+        self.apply_shipping_to_selection(
+            dict.fromkeys(fields_to_nullify),
+            success_text="Shipping info set to null successfully",
+            failure_text="Shipping info could not be reset. No items were changed."
+        )
         
-        # Apply to individual items or kits based on view mode
-        if self.view_mode.get() == 0:
-            selected_item_ids = [item_id for (item_name, item_id), value in self.checkbox_vars.items() if value.get() == 1]
-            for equipment_id in selected_item_ids:
-                self.db_manager.execute_query(update_query, (equipment_id,))
+    def apply_shipping_to_selection(self, shipping_info, success_text, failure_text):
+        # Apply to individual items or kits based on view mode, all in one transaction
+        checked = self.shipping_checklist.checked_keys()
+        by_kit = self.view_mode.get() == 1
+        if by_kit:
+            selection = {'kit_names': checked}
         else:
-            selected_kits = [kit_name for kit_name, value in self.checkbox_vars.items() if value.get() == 1]
-            for kit in selected_kits:
-                equipment_ids = self.fetch_equipment_ids_by_kit(kit)
-                for equipment_id in equipment_ids:
-                    self.db_manager.execute_query(update_query, (equipment_id,))
-                    
-        messagebox.showinfo("Success", "Shipping info set to null successfully")
+            selection = {'equipment_ids': checked}
+        queued_ids, queued_kits, versions = self.shipping_versions(checked, by_kit)
+            
+        def report(changed, queued):
+            if changed is None:
+                messagebox.showerror("Error", failure_text)
+            elif queued:
+                self.show_saved(f"{success_text} ({len(checked)} {'kits' if by_kit else 'items'})", queued=True)
+            else:
+                self.show_saved(f"{success_text} ({changed} items changed)")
+                
+        def failed(error):
+            logger.error("Error updating shipping info", exc_info=error)
+            messagebox.showerror("Error", failure_text)
+                
+        self.save_write(
+            lambda: self.db_manager.bulk_update_shipping_info(shipping_info, **selection),
+            lambda: self.journal.bulk_update_shipping_info(shipping_info, queued_ids, queued_kits, versions=versions),
+            report, failed
+        )
+            
+    def shipping_versions(self, checked, by_kit):
+        """
+        :return: (item ids, kit names, versions) to queue a shipping change with, taken
+            from the rows as the window showed them.
+        """
+        equipment_ids, kit_names = [], []
+        if not by_kit:
+            equipment_ids = list(checked)
+            versions = self.row_versions(ids=checked)
+        else:
+            # Kits become the items they had on screen, so each one's version can be checked
+            versions = {}
+            for kit_name in checked:
+                members = self.row_versions(kit_names=[kit_name])
+                if members:
+                    versions.update(members)
+                    equipment_ids.extend(members)
+                else:
+                    kit_names.append(kit_name)
+        return equipment_ids, kit_names, versions
         
     def select_all_shipping_items(self):
-        for var in self.checkbox_vars.values():
-            var.set(1)  # Set each checkbox variable to checked
+        self.shipping_checklist.check_all()
         
     def populate_shipping_listbox(self):
-        # Clear existing checkboxes
-        for widget in self.checkbox_frame.winfo_children():
-            widget.destroy()
-            
-        self.checkbox_vars.clear()
-        
+        # Loaded on a worker; switching view mode again makes a pending load stale.
+        # set_rows replaces the rows and clears every check in one go
+        def show_rows(rows):
+            if self.shipping_window.winfo_exists():
+                self.shipping_checklist.set_rows(rows)
+                
         if self.view_mode.get() == 0:
             # Populate with individual items, sorted by name
-            equipment_list = self.db_manager.get_equipment_list()
-            sorted_equipment_list = sorted(equipment_list, key=lambda item: item[1])  # Sort by name (item[1])
-            for id, name in sorted_equipment_list:
-                var = tk.IntVar()
-                checkbox = tk.Checkbutton(self.checkbox_frame, text=name, variable=var)
-                checkbox.pack(anchor='w')
-                self.checkbox_vars[(name, id)] = var
+            load = lambda: sorted(self.db_manager.get_equipment_list(), key=lambda item: item.name or "")
         else:
             # Populate with kits, sorted alphabetically
-            kit_list = self.db_manager.fetch_kit_names()
-            sorted_kit_list = sorted(kit_list)  # Sort kits alphabetically
-            for kit_name in sorted_kit_list:
-                var = tk.IntVar()
-                checkbox = tk.Checkbutton(self.checkbox_frame, text=kit_name, variable=var)
-                checkbox.pack(anchor='w')
-                self.checkbox_vars[kit_name] = var
+            load = lambda: [(kit_name, kit_name) for kit_name in sorted(self.db_manager.fetch_kit_names())]
+        self.db_async.submit(load, key="shipping_list", callback=show_rows)
                 
     def apply_shipping_info(self):
         shipping_info = self.collect_shipping_info()
@@ -1087,21 +1307,11 @@ class MainApplication(tk.Tk):
             messagebox.showwarning("No Selection", "No fields selected for update.")
             return
         
-        # For individual items
-        if self.view_mode.get() == 0:
-            selected_item_ids = [item_id for (item_name, item_id), value in self.checkbox_vars.items() if value.get() == 1]
-            for equipment_id in selected_item_ids:
-                self.db_manager.update_shipping_info(equipment_id, shipping_info)
-                
-        # For kits
-        else:
-            selected_kits = [kit_name for kit_name, value in self.checkbox_vars.items() if value.get() == 1]
-            for kit in selected_kits:
-                equipment_ids = self.fetch_equipment_ids_by_kit(kit)
-                for equipment_id in equipment_ids:
-                    self.db_manager.update_shipping_info(equipment_id, shipping_info)
-                    
-        messagebox.showinfo("Success", "Shipping info updated successfully")
+        self.apply_shipping_to_selection(
+            shipping_info,
+            success_text="Shipping info updated successfully",
+            failure_text="Shipping info could not be updated. No items were changed."
+        )
                 
     def collect_shipping_info(self):
         # Collect the shipping information based on the selected checkboxes
@@ -1128,20 +1338,284 @@ class MainApplication(tk.Tk):
             shipping_info['shipping_status'] = self.entry_shipping_status.get()
         return shipping_info
     
-    def fetch_equipment_ids_by_kit(self, kit_name):
-        # Fetch all equipment IDs belonging to a specific kit
-        query = "SELECT id FROM equipment WHERE kit_name = %s"
-        return [row[0] for row in self.db_manager.fetch_data(query, (kit_name,))]
-        
     def save_sql_file(self):
-        directory = filedialog.askdirectory()
-        if directory:
-            output_file = f"{directory}/equipment_backup.sql"  # Specify filename
-            backup_table_to_sql(host_ct, user_ct, passwd_ct, database_ct, 'equipment', output_file)
-            tk.messagebox.showinfo("Success", f"SQL file saved to {output_file}")
-        else:
-            tk.messagebox.showwarning("No Directory", "No directory was selected.")
+        output_file = filedialog.asksaveasfilename(
+            initialfile="equipment_backup.sql",
+            defaultextension=".sql",
+            filetypes=[("SQL files", "*.sql"), ("Compressed SQL files", "*.sql.gz"), ("All files", "*.*")]
+        )
+        if not output_file:
+            tk.messagebox.showwarning("No File", "No file was selected.")
+            return
+        
+        # Gzip is picked from the .gz extension
+        self.db_async.submit(
+            backup_table, self.db_manager, output_file,
+            key="backup",
+            callback=lambda rows_written: tk.messagebox.showinfo("Success", f"SQL file with {rows_written} rows saved to {output_file}"),
+            errback=lambda e: tk.messagebox.showerror("Error", f"Backup failed: {e}")
+        )
                         
+    def restore_sql_file(self):
+        dump_file = filedialog.askopenfilename(filetypes=[("SQL files", "*.sql *.sql.gz"), ("All files", "*.*")])
+        if not dump_file:
+            return
+        
+        def confirm(stats):
+            # Validate the whole dump before anything is dropped
+            if not messagebox.askyesno("Restore SQL File", f"Replace the equipment table with the {stats['rows']} rows in {os.path.basename(dump_file)}?"):
+                return
+            self.db_async.submit(
+                restore_dump, self.db_manager, dump_file,
+                key="restore",
+                callback=restored,
+                errback=lambda e: messagebox.showerror("Error", f"Restore failed: {e}")
+            )
+        
+        def restored(stats):
+            self.reload_search_index()
+            self.refresh_dropdowns()
+            self.refresh_equipment_list()
+            messagebox.showinfo("Success", f"Restored {stats['rows']} rows in {stats['seconds']:.1f} s ({stats['rows_per_second']:.0f} rows/s)")
+        
+        self.db_async.submit(
+            restore_dump, None, dump_file,
+            dry_run=True,
+            key="restore",
+            callback=confirm,
+            errback=lambda e: messagebox.showerror("Error", f"The dump could not be read: {e}")
+        )
+        
+    def row_versions(self, **rows):
+        # Versions as the window last showed them; without a snapshot the server's are taken as they come
+        if self.snapshot is None:
+            return {}
+        return self.snapshot.row_versions(**rows)
+        
+    def can_write_through(self):
+        # Changes still waiting in the journal go first, so nothing reaches the server out of order
+        return self.syncer.online is not False and not self.journal.counts().get("pending")
+        
+    def save_write(self, write, queue, on_saved, on_error=None):
+        """
+        Makes a change straight through the DatabaseManager, or queues it in the journal
+        while the server can't be reached. Runs on the writer thread, so the window never
+        waits on the server and changes reach it in the order they were saved.
+
+        :param write: Callable making the change on the server.
+        :param queue: Callable queuing the same change in the journal.
+        :param on_saved: Called on the Tk thread with (result of whichever callable ran, whether the change was queued).
+        :param on_error: Called on the Tk thread with any other error, e.g. WriteConflict;
+            by default it is logged and reported in a message box.
+        """
+        def run():
+            # Decided on the writer thread, so a change can't overtake one queued just before it
+            if self.can_write_through():
+                try:
+                    return write(), False
+                except CONNECTION_ERRORS as e:
+                    logger.warning("Server unreachable, queuing the change: %s", e)
+            return queue(), True
+        
+        def failed(error):
+            logger.error("Error saving a change", exc_info=error)
+            messagebox.showerror("Error", "The change could not be saved")
+            
+        self.db_async.submit(run, callback=lambda outcome: on_saved(*outcome), errback=on_error or failed, serial=True)
+        
+    def show_saved(self, message, queued=False):
+        if queued:
+            # The change is safe in the journal; say so, since it has to wait for the server
+            self.syncer.flush()
+            message += "\n\nThe change is saved on this computer and will be sent to the server in the background."
+        self.update_sync_status()
+        messagebox.showinfo("Success", message)
+        
+    def on_close(self):
+        # Saves already handed to the writer thread still reach the server or the journal first
+        self.db_async.shutdown(wait_for_writes=10)
+        self.syncer.stop(timeout=5)
+        self.image_prefetcher.shutdown()
+        self.db_manager.close()
+        self.journal.close()
+        self.destroy()
+        
+    def on_journal_synced(self, writes, results):
+        applied = False
+        for write in writes:
+            outcome, detail = results.get(write.seq, (None, None))
+            if outcome != "applied":
+                continue
+            applied = True
+            if write.op == "insert":
+                # The item now has its server id, which the list will show it under
+                self.search_index.rekey(write.equipment_id, detail)
+        if applied:
+            self.refresh_equipment_list(select_id=self.equipment_listbox.selected_id())
+        self.update_sync_status()
+        
+    def update_sync_status(self):
+        status = self.syncer.status()
+        waiting = status["pending"]
+        problems = status["conflict"] + status["failed"]
+        if problems:
+            text, colour = f"{problems} change{'s' if problems != 1 else ''} need{'s' if problems == 1 else ''} review", "red"
+        elif waiting and status["online"] is False:
+            text, colour = f"Offline: {waiting} change{'s' if waiting != 1 else ''} saved on this computer", "dark orange"
+        elif waiting:
+            text, colour = f"Sending {waiting} change{'s' if waiting != 1 else ''}...", "dark orange"
+        elif status["online"] is False:
+            text, colour = "Offline", "dark orange"
+        else:
+            text, colour = "All changes saved", "dark green"
+        self.sync_status_label.config(text=text, fg=colour)
+        
+    def open_pending_window(self):
+        pending_window = tk.Toplevel(self)
+        pending_window.title("Pending Changes")
+        
+        columns = ("action", "item", "queued", "status", "detail")
+        headings = ("Action", "Item", "Queued", "Status", "Detail")
+        labels = {"insert": "Add", "update": "Edit", "delete": "Delete", "shipping": "Shipping", "rename": "Rename"}
+        
+        tk.Label(pending_window, text="Changes not yet on the server", font=self.bold_font).grid(row=0, column=0, columnspan=5, padx=10, pady=5, sticky='w')
+        entries_tree = ttk.Treeview(pending_window, columns=columns, show="headings", height=15)
+        for column, heading in zip(columns, headings):
+            entries_tree.heading(column, text=heading)
+            entries_tree.column(column, width=420 if column == "detail" else 110, anchor='w')
+        entries_tree.grid(row=1, column=0, columnspan=5, padx=10, pady=5)
+        
+        state_label = tk.Label(pending_window, text="", justify='left')
+        state_label.grid(row=2, column=0, columnspan=5, padx=10, sticky='w')
+        
+        def describe(write):
+            payload = write.payload
+            if write.op == "rename":
+                return f"{payload['old_name']} -> {payload['new_name']}"
+            if write.op == "shipping" and write.equipment_id is None:
+                targets = len(payload.get("equipment_ids", ())) + len(payload.get("kit_names", ()))
+                return f"{targets} items/kits"
+            return payload.get("name") or f"#{write.equipment_id}"
+        
+        def refresh():
+            if not pending_window.winfo_exists():
+                return
+            selected = entries_tree.selection()
+            entries_tree.delete(*entries_tree.get_children())
+            for write in self.journal.entries():
+                entries_tree.insert("", tk.END, iid=str(write.seq), values=(
+                    labels.get(write.op, write.op), describe(write), write.created_at, write.status, write.error or ""
+                ))
+            entries_tree.selection_set([iid for iid in selected if entries_tree.exists(iid)])
+            status = self.syncer.status()
+            connection = {True: "connected", False: "offline", None: "not tried yet"}[status["online"]]
+            last_sync = status["last_sync"].strftime("%H:%M:%S") if status["last_sync"] else "never"
+            state_label.config(text=f"Server: {connection}, last sync {last_sync}" + (f"\nLast error: {status['last_error']}" if status["last_error"] else ""))
+            # Keep the list live while the window is open
+            pending_window.after(2000, refresh)
+        
+        def selected_seqs():
+            return [int(iid) for iid in entries_tree.selection()]
+        
+        def retry(overwrite=False):
+            for seq in selected_seqs():
+                self.journal.retry(seq, overwrite=overwrite)
+            self.syncer.flush()
+            self.update_sync_status()
+        
+        def discard():
+            seqs = selected_seqs()
+            if seqs and messagebox.askyesno("Discard Changes", f"Discard {len(seqs)} change(s)? They will never reach the server.", parent=pending_window):
+                for seq in seqs:
+                    self.journal.discard(seq)
+                self.update_sync_status()
+        
+        tk.Button(pending_window, text="Sync Now", command=self.syncer.flush).grid(row=3, column=0, padx=10, pady=10)
+        tk.Button(pending_window, text="Retry", command=retry).grid(row=3, column=1, padx=10, pady=10)
+        tk.Button(pending_window, text="Keep Mine", command=lambda: retry(overwrite=True)).grid(row=3, column=2, padx=10, pady=10)
+        tk.Button(pending_window, text="Discard", command=discard).grid(row=3, column=3, padx=10, pady=10)
+        tk.Button(pending_window, text="Close", command=pending_window.destroy).grid(row=3, column=4, padx=10, pady=10)
+        refresh()
+        
+    def diagnostics_extra(self):
+        # Shown next to the query statistics and saved with them
+        return {
+            "pool": self.db_manager.pool_stats(),
+            "detail_cache": {"hits": self.db_manager.detail_cache.hits, "misses": self.db_manager.detail_cache.misses},
+            "journal": self.syncer.status(),
+        }
+        
+    def open_diagnostics_window(self):
+        diagnostics_window = tk.Toplevel(self)
+        diagnostics_window.title("Database Diagnostics")
+        instrumentation = self.db_manager.instrumentation
+        
+        columns = ("count", "errors", "rows", "connect", "execute", "p50", "p95", "p99", "max", "actions")
+        headings = ("Calls", "Errors", "Rows", "Connect ms", "Execute ms", "p50 ms", "p95 ms", "p99 ms", "Max ms", "Actions")
+        
+        tk.Label(diagnostics_window, text="Queries by total time", font=self.bold_font).grid(row=0, column=0, columnspan=3, padx=10, pady=5, sticky='w')
+        queries_tree = ttk.Treeview(diagnostics_window, columns=columns, height=15)
+        queries_tree.heading("#0", text="Statement")
+        queries_tree.column("#0", width=420)
+        for column, heading in zip(columns, headings):
+            queries_tree.heading(column, text=heading)
+            queries_tree.column(column, width=160 if column == "actions" else 75, anchor='w' if column == "actions" else 'e')
+        queries_tree.grid(row=1, column=0, columnspan=3, padx=10, pady=5)
+        
+        threshold = instrumentation.slow_query_threshold
+        slow_title = f"Slow queries (over {threshold * 1000:.0f} ms)" if threshold is not None else "Slow query log is off"
+        tk.Label(diagnostics_window, text=slow_title, font=self.bold_font).grid(row=2, column=0, columnspan=3, padx=10, pady=5, sticky='w')
+        slow_listbox = tk.Listbox(diagnostics_window, width=150, height=8)
+        slow_listbox.grid(row=3, column=0, columnspan=3, padx=10, pady=5)
+        
+        summary_label = tk.Label(diagnostics_window, text="", justify='left')
+        summary_label.grid(row=4, column=0, columnspan=3, padx=10, sticky='w')
+        
+        def refresh():
+            if not diagnostics_window.winfo_exists():
+                return
+            queries_tree.delete(*queries_tree.get_children())
+            for stats in instrumentation.snapshot():
+                actions = ", ".join(f"{label} ×{count}" for label, count in sorted(stats["actions"].items(), key=lambda item: -item[1]))
+                queries_tree.insert("", tk.END, text=stats["shape"], values=(
+                    stats["count"], stats["errors"], stats["rows"],
+                    f"{stats['connect_ms_avg']:.1f}", f"{stats['execute_ms_avg']:.1f}",
+                    f"{stats['p50_ms']:.1f}", f"{stats['p95_ms']:.1f}", f"{stats['p99_ms']:.1f}", f"{stats['max_ms']:.1f}",
+                    actions
+                ))
+            slow_listbox.delete(0, tk.END)
+            for entry in reversed(instrumentation.to_dict()["slow_queries"]):
+                slow_listbox.insert(tk.END, f"{entry['at']}  {entry['ms']:.0f} ms  [{entry['action'] or '-'}]  {entry['query']}")
+            extra = self.diagnostics_extra()
+            summary_label.config(text="Pool: " + ", ".join(f"{key} {value}" for key, value in extra["pool"].items())
+                                 + f"\nDetail cache: {extra['detail_cache']['hits']} hits, {extra['detail_cache']['misses']} misses")
+            # Keep the numbers live while the window is open
+            diagnostics_window.after(2000, refresh)
+        
+        def save_json():
+            file_path = filedialog.asksaveasfilename(
+                parent=diagnostics_window,
+                initialfile="db_diagnostics.json",
+                defaultextension=".json",
+                filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            )
+            if not file_path:
+                return
+            try:
+                instrumentation.dump_json(file_path, self.diagnostics_extra())
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not save diagnostics: {e}", parent=diagnostics_window)
+                
+        def reset():
+            instrumentation.reset()
+            queries_tree.delete(*queries_tree.get_children())
+            slow_listbox.delete(0, tk.END)
+        
+        tk.Button(diagnostics_window, text="Save JSON", command=save_json).grid(row=5, column=0, padx=10, pady=10)
+        tk.Button(diagnostics_window, text="Reset", command=reset).grid(row=5, column=1, padx=10, pady=10)
+        tk.Button(diagnostics_window, text="Close", command=diagnostics_window.destroy).grid(row=5, column=2, padx=10, pady=10)
+        refresh()
+        
     def reset_fields(self):
         # Clearing text entries
         self.entry_name.delete(0, tk.END)
@@ -1176,6 +1650,13 @@ class MainApplication(tk.Tk):
         
         
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+    startup.mark("Modules imported")
     app = MainApplication()
+    startup.mark("Window built")
+    if startup.REPORT_FLAG in sys.argv:
+        app.update()  # Draw the window now so the first paint can be timed
+        startup.mark("First paint")
+        startup.print_report()
     app.mainloop()
     
@@ -0,0 +1,112 @@
+# migrations.py
+import logging
+import os
+from mysql.connector import Error
+from restore import iter_dump
+
+logger = logging.getLogger(__name__)
+
+# Its CREATE TABLE is the base equipment schema, used when a database has no table yet
+SCHEMA_DUMP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "equipment_backup.sql")
+
+# (name, columns) of the secondary indexes backing the app's hot queries:
+# list filters ordered by name, kit lookups, box reports, renames and DISTINCT lookups
+EQUIPMENT_INDEXES = (
+    ("idx_equipment_kit_name", "kit_name, name"),
+    ("idx_equipment_type", "type, name"),
+    ("idx_equipment_owner", "owner, name"),
+    ("idx_equipment_not_purchased", "not_purchased, name"),
+    ("idx_equipment_box_number", "box_number, name, weight, kit_name"),
+    ("idx_equipment_name", "name"),
+)
+
+def base_schema_ddl(dump_file=SCHEMA_DUMP):
+    """
+    :return: The equipment CREATE TABLE statement from the schema dump.
+    """
+    for item in iter_dump(dump_file):
+        if item[0] == "ddl":
+            return item[1]
+    raise RuntimeError(f"{dump_file} has no CREATE TABLE for equipment")
+
+def create_equipment_table(backend, cursor):
+    # A new SQLite file (or empty server database) starts from the same schema as the dump
+    if not backend.table_exists(cursor, "equipment"):
+        for statement in backend.create_table_statements(base_schema_ddl()):
+            cursor.execute(statement)
+
+def add_not_purchased_column(backend, cursor):
+    # Older dumps (including equipment_backup.sql) predate the not_purchased flag
+    if not backend.column_exists(cursor, "equipment", "not_purchased"):
+        cursor.execute("ALTER TABLE equipment ADD COLUMN not_purchased BOOLEAN DEFAULT FALSE")
+
+def add_equipment_indexes(backend, cursor):
+    for index_name, columns in EQUIPMENT_INDEXES:
+        if not backend.index_exists(cursor, "equipment", index_name):
+            cursor.execute(f"CREATE INDEX {index_name} ON equipment ({columns})")
+
+def add_version_column(backend, cursor):
+    # Counts saves from the edit form, shipping changes and renames, so a queued offline
+    # write can tell the row changed on the server after it was read (see journal.py)
+    if not backend.column_exists(cursor, "equipment", "version"):
+        cursor.execute("ALTER TABLE equipment ADD COLUMN version INT NOT NULL DEFAULT 0")
+
+def add_client_key_column(backend, cursor):
+    # Set by the client that added the item, so replaying a queued insert whose first
+    # attempt reached the server finds that row instead of adding it twice (see journal.py)
+    if not backend.column_exists(cursor, "equipment", "client_key"):
+        cursor.execute("ALTER TABLE equipment ADD COLUMN client_key CHAR(36) NULL")
+    if not backend.index_exists(cursor, "equipment", "idx_equipment_client_key"):
+        cursor.execute("CREATE UNIQUE INDEX idx_equipment_client_key ON equipment (client_key)")
+
+# Applied in order; every step must be safe to re-run against a database that already has it
+MIGRATIONS = (
+    (1, "Add not_purchased column", add_not_purchased_column),
+    (2, "Secondary indexes for filters, kits, boxes and names", add_equipment_indexes),
+    (3, "Row version for offline edit conflict detection", add_version_column),
+    (4, "Client key for idempotent replay of offline inserts", add_client_key_column),
+)
+
+def get_schema_version(cursor):
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+def run_migrations(db_manager, reapply=False):
+    """
+    Brings the equipment schema up to the latest version. Safe to call on every startup.
+
+    :param db_manager: DatabaseManager to run the migrations through.
+    :param reapply: Run every step again, even those already recorded; used after the table was recreated from a dump.
+    :return: List of the versions applied by this call.
+    """
+    applied = []
+    backend = db_manager.backend
+    try:
+        with db_manager.create_connection() as conn:
+            cursor = conn.cursor()
+            create_equipment_table(backend, cursor)
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS schema_version ("
+                "version INT NOT NULL PRIMARY KEY, "
+                "description VARCHAR(255) NOT NULL, "
+                "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+            )
+            current = get_schema_version(cursor)
+            for version, description, migrate in MIGRATIONS:
+                if version <= current and not reapply:
+                    continue
+                migrate(backend, cursor)
+                # IGNORE in case another client raced us to the same version
+                cursor.execute(
+                    f"{backend.insert_ignore} INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                conn.commit()
+                applied.append(version)
+            cursor.close()
+    except Error as e:
+        logger.error("Error running schema migrations: %s", e)
+    if applied:
+        # DDL can change what SELECT * returns, so nothing cached is trustworthy any more
+        db_manager.clear_caches()
+    return applied
@@ -0,0 +1,131 @@
+# pics_index.py
+import os
+import threading
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # Optional; without it the directory mtime is checked instead
+    INotify = None
+
+# Resolved next to this file so the app works from any working directory
+PICS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Pics")
+
+# When an item has both, the earlier extension wins
+IMAGE_EXTENSIONS = ('.png', '.jpg')
+
+class PicsIndex:
+    """
+    Maps equipment names to image files in the Pics directory.
+
+    The directory is scanned once with os.scandir; later lookups only rescan when
+    the directory changed (inotify events where available, otherwise the
+    directory's mtime), and a rescan only touches the entries that were added or
+    removed.
+
+    :param directory: Directory holding the equipment images.
+    :param use_inotify: Watch the directory with inotify when inotify_simple is installed.
+    """
+    def __init__(self, directory=PICS_DIR, use_inotify=True):
+        self.directory = directory
+        self._files = set()  # File names seen by the last scan
+        self._paths = {}  # equipment name -> image path
+        self._folded = {}  # casefolded name -> equipment name, for case-insensitive filesystems
+        self._mtime_ns = None
+        self._lock = threading.Lock()
+        self._inotify = None
+        if use_inotify and INotify is not None:
+            try:
+                self._inotify = INotify()
+                self._inotify.add_watch(directory, flags.CREATE | flags.DELETE | flags.MOVED_FROM | flags.MOVED_TO | flags.CLOSE_WRITE)
+            except OSError:
+                self._inotify = None
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """
+        Rescans the directory if it changed since the last scan.
+
+        :param force: Rescan even if no change was detected.
+        """
+        with self._lock:
+            if not force and not self._changed():
+                return
+            try:
+                mtime_ns = os.stat(self.directory).st_mtime_ns
+                current = {entry.name for entry in os.scandir(self.directory) if entry.is_file()}
+            except OSError:
+                mtime_ns, current = None, set()
+            removed = self._files - current
+            added = current - self._files
+            self._files = current
+            self._mtime_ns = mtime_ns
+            touched = {os.path.splitext(file_name)[0] for file_name in removed | added}
+            for name in touched:
+                self._resolve(name)
+
+    def _changed(self):
+        if self._inotify is not None:
+            return bool(self._inotify.read(timeout=0))
+        try:
+            return os.stat(self.directory).st_mtime_ns != self._mtime_ns
+        except OSError:
+            return self._mtime_ns is not None
+
+    def _resolve(self, name):
+        for extension in IMAGE_EXTENSIONS:
+            if f"{name}{extension}" in self._files:
+                self._paths[name] = os.path.join(self.directory, f"{name}{extension}")
+                self._folded[name.casefold()] = name
+                return
+        self._paths.pop(name, None)
+        if self._folded.get(name.casefold()) == name:
+            del self._folded[name.casefold()]
+
+    def path_for(self, name):
+        """
+        :param name: Equipment name.
+        :return: Path of the item's image, or None if there is none.
+        """
+        self.refresh()
+        with self._lock:
+            path = self._paths.get(name)
+            if path is None:
+                path = self._paths.get(self._folded.get(str(name).casefold()))
+            return path
+
+    def rename(self, old_name, new_name):
+        """
+        Renames an item's image to follow the item, keeping its extension.
+
+        :return: New path, or None if the item had no image.
+        """
+        old_path = self.path_for(old_name)
+        if old_path is None:
+            return None
+        new_path = os.path.join(self.directory, f"{new_name}{os.path.splitext(old_path)[1]}")
+        os.rename(old_path, new_path)
+        self.refresh(force=True)
+        return new_path
+
+    def image_names(self):
+        self.refresh()
+        with self._lock:
+            return set(self._paths)
+
+    def missing_images(self, equipment_names):
+        """
+        :param equipment_names: Names of the equipment rows.
+        :return: Sorted names that have no image.
+        """
+        return sorted(name for name in set(equipment_names) if self.path_for(name) is None)
+
+    def unmatched_images(self, equipment_names):
+        """
+        :param equipment_names: Names of the equipment rows.
+        :return: Sorted image paths whose name matches no row.
+        """
+        wanted = {str(name).casefold() for name in equipment_names}
+        self.refresh()
+        with self._lock:
+            paths = dict(self._paths)
+        return sorted(path for name, path in paths.items() if name.casefold() not in wanted)
@@ -0,0 +1,71 @@
+# prefetch.py
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class ImagePrefetcher:
+    """
+    Decodes the thumbnails of the list entries around the current selection on
+    background threads, so arrow-key browsing finds them already in the
+    ThumbnailCache that display_image reads.
+
+    :param cache: ThumbnailCache the decoded thumbnails are stored in.
+    :param index: PicsIndex used to find each item's image.
+    :param radius: Number of entries to prefetch on each side of the selection.
+    :param max_workers: Number of decoding threads.
+    """
+    def __init__(self, cache, index, radius=3, max_workers=2):
+        self.cache = cache
+        self.index = index
+        self.radius = radius
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-prefetch")
+        self._futures = {}  # image path -> Future of its decode
+        self.submitted = 0
+
+    def neighbour_positions(self, selected_index, count):
+        """
+        Positions around selected_index, nearest first, alternating after/before
+        since the next entry is the likeliest one to be shown.
+
+        :param selected_index: Position of the current selection.
+        :param count: Number of entries in the list.
+        :return: List of positions.
+        """
+        positions = []
+        for distance in range(1, self.radius + 1):
+            for position in (selected_index + distance, selected_index - distance):
+                if 0 <= position < count:
+                    positions.append(position)
+        return positions
+
+    def prefetch(self, names):
+        """
+        Queues the thumbnails of the given items, most important first. Queued work
+        for items that are no longer wanted is cancelled.
+
+        :param names: Equipment names in priority order.
+        """
+        wanted = []
+        for name in names:
+            path = self.index.path_for(name)
+            if path is not None:
+                wanted.append(path)
+
+        for path, future in list(self._futures.items()):
+            if future.done() or (path not in wanted and future.cancel()):
+                del self._futures[path]
+
+        for path in wanted:
+            if path not in self._futures:
+                self._futures[path] = self.executor.submit(self._decode, path)
+                self.submitted += 1
+
+    def _decode(self, path):
+        try:
+            self.cache.get_thumbnail(path)
+        except Exception:
+            logger.exception("Error prefetching image %s", path)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# restore.py
+"""
+Loads an equipment dump (equipment_backup.sql, as written by mysqldump or
+backup.py, optionally gzipped) back into the database without the mysql CLI.
+
+Usage (from the "USS Video Equipment" directory):
+    python restore.py equipment_backup.sql [--dry-run] [--keep-table] [--batch-size 1000]
+"""
+import argparse
+import decimal
+import gzip
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# One value inside a VALUES tuple: NULL, a quoted string, a hex literal or a number
+_VALUE = re.compile(r"NULL|'((?:[^'\\]|\\.|'')*)'|0x([0-9A-Fa-f]*)|(-?[0-9]+(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?)", re.S)
+_ESCAPED = re.compile(r"\\(.)|''", re.S)
+_UNESCAPES = {"0": "\0", "n": "\n", "r": "\r", "t": "\t", "b": "\b", "Z": "\x1a"}
+_COLUMN_LINE = re.compile(r"^\s+`([^`]+)`\s")
+
+class DumpFormatError(Exception):
+    pass
+
+def _unescape(text):
+    if "\\" not in text and "''" not in text:
+        return text
+    return _ESCAPED.sub(lambda m: "'" if m.group(1) is None else _UNESCAPES.get(m.group(1), m.group(1)), text)
+
+def parse_values(text, pos, line_number):
+    """
+    Parses the tuples of a multi-row INSERT statement.
+
+    :param text: Statement text.
+    :param pos: Offset of the first "(" after VALUES.
+    :param line_number: Line of the statement in the dump, for error messages.
+    :return: Generator of row lists.
+    """
+    try:
+        while True:
+            if text[pos] != "(":
+                raise DumpFormatError(f"Line {line_number}: expected '(' at offset {pos}")
+            pos += 1
+            row = []
+            while True:
+                match = _VALUE.match(text, pos)
+                if match is None:
+                    raise DumpFormatError(f"Line {line_number}: unreadable value at offset {pos}")
+                string, hex_digits, number = match.groups()
+                if string is not None:
+                    row.append(_unescape(string))
+                elif hex_digits is not None:
+                    row.append(bytes.fromhex(hex_digits))
+                elif number is not None:
+                    row.append(int(number) if number.lstrip("-").isdigit() else decimal.Decimal(number))
+                else:
+                    row.append(None)
+                pos = match.end()
+                separator = text[pos]
+                pos += 1
+                if separator == ")":
+                    break
+                if separator != ",":
+                    raise DumpFormatError(f"Line {line_number}: expected ',' or ')' at offset {pos - 1}")
+            yield row
+            separator = text[pos]
+            pos += 1
+            if separator == ";":
+                return
+            if separator != ",":
+                raise DumpFormatError(f"Line {line_number}: expected ',' or ';' at offset {pos - 1}")
+    except IndexError:
+        raise DumpFormatError(f"Line {line_number}: statement ends in the middle of a row") from None
+
+def open_dump(dump_file):
+    if dump_file.lower().endswith(".gz"):
+        return gzip.open(dump_file, "rt", encoding="utf-8")
+    return open(dump_file, "r", encoding="utf-8")
+
+def iter_dump(dump_file, table="equipment"):
+    """
+    Reads a dump one line at a time. mysqldump keeps each statement on one line, so
+    memory is bounded by the longest INSERT rather than the file size.
+
+    :return: Generator of ("ddl", CREATE TABLE text, column names) and ("rows", row list) items.
+    """
+    insert_prefix = f"INSERT INTO `{table}` VALUES "
+    create_prefix = f"CREATE TABLE `{table}` ("
+    ddl_lines = None
+    with open_dump(dump_file) as dump:
+        for line_number, line in enumerate(dump, start=1):
+            if ddl_lines is not None:
+                ddl_lines.append(line)
+                if line.rstrip().endswith(";"):
+                    ddl = "".join(ddl_lines).rstrip().rstrip(";")
+                    columns = [match.group(1) for match in map(_COLUMN_LINE.match, ddl_lines[1:]) if match]
+                    ddl_lines = None
+                    yield ("ddl", ddl, columns)
+            elif line.startswith(create_prefix):
+                ddl_lines = [line]
+            elif line.startswith(insert_prefix):
+                yield ("rows", list(parse_values(line, len(insert_prefix), line_number)))
+    if ddl_lines is not None:
+        raise DumpFormatError(f"CREATE TABLE `{table}` is not terminated")
+
+def restore_dump(db_manager, dump_file, table="equipment", batch_size=1000, transaction_rows=50000, dry_run=False, recreate_table=True, progress=None):
+    """
+    Loads the rows of a dump into a table.
+
+    The rows are loaded into a staging table built from the dump's CREATE TABLE,
+    which replaces the table only once every row is in; if the load fails the
+    existing table is left as it was. With recreate_table False the rows are added
+    to the existing table instead. Rows go in through executemany batches inside
+    large transactions, with key, unique and foreign key checks switched off until
+    the load is done.
+
+    :param db_manager: DatabaseManager to load into; may be None for a dry run.
+    :param dump_file: Path of the dump (.sql or .sql.gz).
+    :param table: Table whose statements are restored; other tables in the dump are ignored.
+    :param batch_size: Rows per executemany call.
+    :param transaction_rows: Rows per commit.
+    :param dry_run: Only parse and validate the dump; nothing is written.
+    :param recreate_table: Replace the table with the one defined in the dump.
+    :param progress: Optional callable(rows_done), called after each batch.
+    :return: Dict with rows, statements, seconds and rows_per_second.
+    """
+    if not table.replace("_", "").isalnum():
+        raise ValueError(f"Invalid table name: {table}")
+    started = time.perf_counter()
+    stats = {"rows": 0, "statements": 0, "seconds": 0.0, "rows_per_second": 0.0, "dry_run": dry_run}
+
+    if dry_run:
+        columns = None
+        for item in iter_dump(dump_file, table):
+            if item[0] == "ddl":
+                columns = item[2]
+                continue
+            for row in item[1]:
+                if columns is None:
+                    columns = [None] * len(row)  # No CREATE TABLE, so the first row sets the width
+                if len(row) != len(columns):
+                    raise DumpFormatError(f"Row {stats['rows'] + 1} has {len(row)} values, expected {len(columns)}")
+                stats["rows"] += 1
+            stats["statements"] += 1
+            if progress is not None:
+                progress(stats["rows"])
+    else:
+        backend = db_manager.backend
+        staging = f"{table}__restore"
+        with db_manager.create_connection() as conn:
+            cursor = conn.cursor()
+            backend.disable_checks(cursor)
+            target = staging if recreate_table else table
+            keys_disabled = False
+            staged = False
+            index_statements = []
+            insert = None
+            pending = []  # Rows waiting for the next executemany, possibly from several statements
+            uncommitted = 0
+            
+            def flush():
+                nonlocal uncommitted
+                cursor.executemany(insert, pending)
+                stats["rows"] += len(pending)
+                uncommitted += len(pending)
+                pending.clear()
+                if uncommitted >= transaction_rows:
+                    conn.commit()
+                    uncommitted = 0
+                if progress is not None:
+                    progress(stats["rows"])
+            
+            try:
+                for item in iter_dump(dump_file, table):
+                    if item[0] == "ddl":
+                        _, ddl, columns = item
+                        if recreate_table:
+                            statements = backend.create_table_statements(ddl)
+                            cursor.execute(f"DROP TABLE IF EXISTS `{staging}`")
+                            cursor.execute(statements[0].replace(f"CREATE TABLE `{table}`", f"CREATE TABLE `{staging}`", 1))
+                            staged = True
+                            # SQLite index names are per database, so these wait until the old table is gone
+                            index_statements = statements[1:]
+                        backend.disable_keys(cursor, target)
+                        keys_disabled = True
+                        column_list = ", ".join(f"`{column}`" for column in columns)
+                        insert = f"INSERT INTO `{target}` ({column_list}) VALUES ({', '.join(['%s'] * len(columns))})"
+                        continue
+                    rows = item[1]
+                    if insert is None:
+                        if recreate_table:
+                            raise DumpFormatError(f"The dump has no CREATE TABLE for `{table}` to recreate it from")
+                        # Without a table definition the values can only be matched by position
+                        insert = f"INSERT INTO `{table}` VALUES ({', '.join(['%s'] * len(rows[0]))})"
+                    for row in rows:
+                        pending.append(row)
+                        if len(pending) >= batch_size:
+                            flush()
+                    stats["statements"] += 1
+                if pending:
+                    flush()
+                if keys_disabled:
+                    backend.enable_keys(cursor, target)
+                    keys_disabled = False
+                conn.commit()
+                if staged:
+                    backend.replace_table(cursor, staging, table, index_statements)
+                    staged = False
+            except BaseException:
+                # Clean up without letting a second error hide the one that stopped the load
+                try:
+                    conn.rollback()
+                    if keys_disabled:
+                        backend.enable_keys(cursor, target)
+                    if staged:
+                        cursor.execute(f"DROP TABLE IF EXISTS `{staging}`")
+                        conn.commit()
+                    backend.enable_checks(cursor)
+                except Exception:
+                    logger.exception("Could not clean up after the failed restore of %s", dump_file)
+                raise
+            else:
+                # The connection goes back to the pool, so don't leave the checks off for the next caller
+                backend.enable_checks(cursor)
+            finally:
+                cursor.close()
+        db_manager.clear_caches()
+        if recreate_table:
+            from migrations import run_migrations
+            # The dump's table may predate columns and indexes the app relies on
+            run_migrations(db_manager, reapply=True)
+
+    stats["seconds"] = time.perf_counter() - started
+    if stats["seconds"] > 0:
+        stats["rows_per_second"] = stats["rows"] / stats["seconds"]
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Restore the equipment table from a SQL dump.")
+    parser.add_argument("dump_file", help="Dump to load (.sql or .sql.gz)")
+    parser.add_argument("--dry-run", action="store_true", help="Only parse and validate the dump")
+    parser.add_argument("--keep-table", action="store_true", help="Add the rows to the existing table instead of recreating it")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per executemany call")
+    parser.add_argument("--transaction-rows", type=int, default=50000, help="Rows per commit")
+    args = parser.parse_args()
+
+    db_manager = None
+    if not args.dry_run:
+        from db import DatabaseManager
+        db_manager = DatabaseManager()
+    stats = restore_dump(
+        db_manager, args.dump_file,
+        batch_size=args.batch_size,
+        transaction_rows=args.transaction_rows,
+        dry_run=args.dry_run,
+        recreate_table=not args.keep_table
+    )
+    action = "Validated" if args.dry_run else "Restored"
+    print(f"{action} {stats['rows']} rows from {stats['statements']} INSERT statements "
+          f"in {stats['seconds']:.2f} s ({stats['rows_per_second']:.0f} rows/s)")
+    if db_manager is not None:
+        db_manager.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# search_index.py
+import bisect
+import re
+import threading
+from snapshot import fold_key
+
+# Columns the search box looks in, in the order matches are shown
+SEARCH_FIELDS = ("name", "brand", "model", "model_number", "serial_number")
+
+# Prefix shown before a match found outside the name
+FIELD_LABELS = {"brand": "Brand", "model": "Model", "model_number": "Model #", "serial_number": "SN"}
+
+_TOKEN = re.compile(r"\w+")
+
+# Sorts after every token that starts with a given prefix
+_PREFIX_END = "\U0010ffff"
+
+# Prefixes up to this length can match thousands of tokens (every serial number starts
+# with a digit), so their id sets are kept instead of being rebuilt on each keystroke
+MEMO_PREFIX_LENGTH = 2
+
+def tokenize(text):
+    """
+    :return: Lowercased word tokens of a value.
+    """
+    return _TOKEN.findall(str(text).lower()) if text else []
+
+class SearchIndex:
+    """
+    Type-ahead index over the equipment name, brand, model, model number and serial
+    number. Every word of those fields is kept in one sorted token list, so all words
+    starting with what the user typed are found with two bisects; each token maps to
+    the set of ids containing it. Several search words must all match (as prefixes).
+
+    Rows are added, changed and removed one at a time, so saving an item doesn't
+    rebuild the index.
+    """
+    def __init__(self):
+        self._tokens = []  # Sorted distinct tokens
+        self._postings = {}  # token -> set of ids
+        self._records = {}  # id -> tuple of SEARCH_FIELDS values
+        self._record_tokens = {}  # id -> set of its tokens, for removal
+        self._prefix_ids = {}  # short prefix -> set of ids with a token starting with it
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, db_manager):
+        """
+        Builds the index from the whole table, replacing what was there.
+        """
+        query = f"SELECT id, {', '.join(SEARCH_FIELDS)} FROM equipment"
+        rows = db_manager.fetch_data(query)
+        postings = {}
+        records = {}
+        record_tokens = {}
+        for equipment_id, *values in rows:
+            tokens = set()
+            for value in values:
+                tokens.update(tokenize(value))
+            for token in tokens:
+                ids = postings.get(token)
+                if ids is None:
+                    ids = postings[token] = set()
+                ids.add(equipment_id)
+            records[equipment_id] = tuple(values)
+            record_tokens[equipment_id] = tokens
+        with self._lock:
+            self._tokens = sorted(postings)
+            self._postings = postings
+            self._records = records
+            self._record_tokens = record_tokens
+            self._prefix_ids = {}
+            # The first keystroke is the most expensive lookup, so have those ready
+            for first in {token[0] for token in self._tokens}:
+                self._ids_with_prefix(first)
+            self.loaded = True
+
+    def update(self, equipment_id, values):
+        """
+        Adds an item or replaces its entry.
+
+        :param equipment_id: ID of the item.
+        :param values: Dict with the SEARCH_FIELDS values; missing fields keep their indexed value.
+        """
+        equipment_id = int(equipment_id)
+        with self._lock:
+            old = self._records.get(equipment_id, (None,) * len(SEARCH_FIELDS))
+            record = tuple(values.get(field, previous) for field, previous in zip(SEARCH_FIELDS, old))
+            self._remove(equipment_id)
+            tokens = set()
+            for value in record:
+                tokens.update(tokenize(value))
+            for token in tokens:
+                ids = self._postings.get(token)
+                if ids is None:
+                    ids = self._postings[token] = set()
+                    bisect.insort(self._tokens, token)
+                ids.add(equipment_id)
+            self._records[equipment_id] = record
+            self._record_tokens[equipment_id] = tokens
+            self._update_prefix_ids(equipment_id, tokens)
+
+    def remove(self, equipment_id):
+        with self._lock:
+            self._remove(int(equipment_id))
+
+    def rekey(self, old_id, new_id):
+        """
+        Moves an item to another id, e.g. once an item added offline gets its server id.
+        """
+        with self._lock:
+            record = self._records.get(int(old_id))
+            if record is None:
+                return
+            self._remove(int(old_id))
+        self.update(new_id, dict(zip(SEARCH_FIELDS, record)))
+
+    def rename(self, old_name, new_name):
+        """
+        Follows DatabaseManager.update_equipment_name, which renames every item with old_name.
+        Names are compared with fold_key, the way the server's collation matches them, so
+        items whose name differs from old_name only in case or accents are renamed too.
+        """
+        old_key = fold_key(old_name)
+        with self._lock:
+            renamed = [equipment_id for equipment_id, record in self._records.items() if fold_key(record[0]) == old_key]
+        for equipment_id in renamed:
+            self.update(equipment_id, {"name": new_name})
+
+    def _update_prefix_ids(self, equipment_id, tokens):
+        for prefix, ids in self._prefix_ids.items():
+            if any(token.startswith(prefix) for token in tokens):
+                ids.add(equipment_id)
+            else:
+                ids.discard(equipment_id)
+
+    def _remove(self, equipment_id):
+        if equipment_id in self._record_tokens:
+            self._update_prefix_ids(equipment_id, ())
+        for token in self._record_tokens.pop(equipment_id, ()):
+            ids = self._postings[token]
+            ids.discard(equipment_id)
+            if not ids:
+                del self._postings[token]
+                position = bisect.bisect_left(self._tokens, token)
+                del self._tokens[position]
+        self._records.pop(equipment_id, None)
+
+    def _prefix_range(self, term):
+        lo = bisect.bisect_left(self._tokens, term)
+        hi = bisect.bisect_left(self._tokens, term + _PREFIX_END, lo)
+        return lo, hi
+
+    def _ids_with_prefix(self, term):
+        ids = self._prefix_ids.get(term)
+        if ids is not None:
+            return ids
+        lo, hi = self._prefix_range(term)
+        ids = set().union(*(self._postings[token] for token in self._tokens[lo:hi]))
+        if len(term) <= MEMO_PREFIX_LENGTH:
+            self._prefix_ids[term] = ids
+        return ids
+
+    def match(self, query):
+        """
+        :param query: Text typed by the user.
+        :return: Set of ids where every word of the query starts some indexed word.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return set()
+        with self._lock:
+            # Intersect starting from the word with the fewest matching ids
+            id_sets = sorted((self._ids_with_prefix(term) for term in set(terms)), key=len)
+            return id_sets[0].intersection(*id_sets[1:])
+
+    def search(self, query, rows=None):
+        """
+        Filters rows down to the ones matching the query, keeping their order.
+
+        :param query: Text typed by the user.
+        :param rows: (id, name) rows to filter, e.g. the list after the dropdown filters;
+            None searches every indexed item and orders the result by name.
+        :return: List of the matching rows.
+        """
+        matches = self.match(query)
+        if rows is not None:
+            return [row for row in rows if row[0] in matches]
+        with self._lock:
+            found = [(equipment_id, self._records[equipment_id][0]) for equipment_id in matches]
+        return sorted(found, key=lambda row: (row[1] or "").lower())
+
+    def highlight(self, equipment_id, query):
+        """
+        Builds the text shown for a search hit: the name, followed by any other field
+        that matched, plus the spans to highlight.
+
+        :return: (label, list of (start, end) character spans in the label).
+        """
+        terms = tokenize(query)
+        with self._lock:
+            record = self._records.get(int(equipment_id))
+        if record is None:
+            return None, []
+        label = str(record[0] or "")
+        spans = self._spans(label, 0, terms)
+        for field, value in zip(SEARCH_FIELDS[1:], record[1:]):
+            if not value:
+                continue
+            prefix = f"  ·  {FIELD_LABELS[field]} "
+            value_spans = self._spans(str(value), len(label) + len(prefix), terms)
+            if value_spans:
+                label += prefix + str(value)
+                spans.extend(value_spans)
+        return label, spans
+
+    def _spans(self, text, offset, terms):
+        spans = []
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            return spans  # Lowercasing changed the length, so positions wouldn't line up
+        for word in _TOKEN.finditer(lowered):
+            longest = max((len(term) for term in terms if word.group().startswith(term)), default=0)
+            if longest:
+                spans.append((offset + word.start(), offset + word.start() + longest))
+        return spans
@@ -0,0 +1,258 @@
+# snapshot.py
+import logging
+import threading
+import time
+import unicodedata
+from array import array
+from mysql.connector import Error
+from db import record_type
+
+logger = logging.getLogger(__name__)
+
+# What filter() returns, the same shape as DatabaseManager's list queries
+EquipmentListEntry = record_type(("id", "name"))
+
+def fold_key(value):
+    """
+    Index key of a filter value. Text is case-folded and stripped of accents, so lookups
+    match the way the server's utf8mb4_0900_ai_ci collation compares ("sony" = "Sóny").
+    """
+    if not isinstance(value, str):
+        return value
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+class EquipmentSnapshot:
+    """
+    Column-oriented, in-memory copy of the equipment list used to answer the
+    kit/type/owner/purchased filters without a round trip to the server.
+
+    When the server can't be reached the last loaded copy keeps answering, and
+    writes still waiting in the journal are laid over it, so the list shows what
+    the user saved rather than what the server last had.
+
+    :param db_manager: DatabaseManager used to load the table.
+    :param max_age: Seconds between checks of the server for changes made by other clients.
+    :param journal: Optional WriteJournal whose pending writes are shown in the list.
+    :param retry_after: Seconds to wait after a failed load before asking the server again.
+    """
+    FILTER_COLUMNS = ("kit_name", "type", "owner", "not_purchased")
+
+    def __init__(self, db_manager, max_age=30, journal=None, retry_after=5):
+        self.db_manager = db_manager
+        self.max_age = max_age
+        self.journal = journal
+        self.retry_after = retry_after
+        self.ids = array('i')
+        self.names = []
+        self.versions = array('i')
+        self.positions = {}  # id -> row position
+        # column -> value -> array of row positions, ascending (so already in name order)
+        self.indexes = {column: {} for column in self.FILTER_COLUMNS}
+        self.stamp = None
+        self.write_version = None
+        self.checked_at = 0.0
+        self.failed_at = None  # When the last load or check failed, None after a success
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # Worker threads may filter concurrently
+
+    def change_stamp(self):
+        """
+        Cheap server-side change check: the row count, highest id and sum of the row
+        versions, which moves whenever another client saves, ships or renames an item.
+
+        :return: Tuple of (row count, max id, version sum).
+        :raises Error: If the query fails.
+        """
+        rows = self.db_manager.fetch_data("SELECT COUNT(*), MAX(id), COALESCE(SUM(version), 0) FROM equipment", raise_errors=True)
+        return tuple(rows[0])
+
+    def load(self):
+        """
+        Loads the filterable columns of every row and rebuilds the inverted indexes.
+
+        :raises Error: If a query fails; the copy loaded before is kept.
+        """
+        write_version = self.db_manager.write_version
+        stamp = self.change_stamp()
+        query = "SELECT id, name, kit_name, type, owner, not_purchased, version FROM equipment ORDER BY name"
+        rows = self.db_manager.fetch_data(query, raise_errors=True)
+        
+        ids = array('i')
+        names = []
+        versions = array('i')
+        positions = {}
+        indexes = {column: {} for column in self.FILTER_COLUMNS}
+        for position, (equipment_id, name, kit_name, type_, owner, not_purchased, version) in enumerate(rows):
+            ids.append(equipment_id)
+            names.append(name)
+            versions.append(version)
+            positions[equipment_id] = position
+            if not_purchased is not None:
+                not_purchased = bool(not_purchased)
+            for column, value in zip(self.FILTER_COLUMNS, (kit_name, type_, owner, not_purchased)):
+                if value is None:
+                    continue  # NULL never matches a "column = value" filter
+                key = fold_key(value)
+                postings = indexes[column].get(key)
+                if postings is None:
+                    postings = indexes[column][key] = array('i')
+                postings.append(position)
+                
+        with self._lock:
+            self.ids = ids
+            self.names = names
+            self.versions = versions
+            self.positions = positions
+            self.indexes = indexes
+            self.stamp = stamp
+            self.write_version = write_version
+            self.checked_at = time.monotonic()
+            self.failed_at = None
+            self.loads += 1
+
+    def refresh_if_stale(self):
+        """
+        Reloads when this app wrote to the table, or when the server reports a different
+        row count / max id. The server is asked at most once every max_age seconds, and
+        after a failure not again for retry_after seconds; meanwhile the last copy is used.
+        """
+        with self._refresh_lock:
+            if self.failed_at is not None and time.monotonic() - self.failed_at < self.retry_after:
+                return
+            try:
+                if self.stamp is None or self.write_version != self.db_manager.write_version:
+                    self.load()
+                    return
+                if time.monotonic() - self.checked_at < self.max_age:
+                    return
+                stamp = self.change_stamp()
+                if stamp != self.stamp:
+                    self.load()
+                else:
+                    self.checked_at = time.monotonic()
+                    self.failed_at = None
+            except Error as e:
+                self.failed_at = time.monotonic()
+                logger.warning("Could not refresh the equipment list, showing the last loaded copy: %s", e)
+
+    def filter(self, kit_name=None, type=None, owner=None, not_purchased=None, ids=None):
+        """
+        Returns the rows matching every given filter, ordered by name. None means "any".
+
+        :param ids: Optional set of ids to keep, e.g. the matches of a search.
+        :return: List of Equipment records with id and name.
+        """
+        self.refresh_if_stale()
+        wanted = {"kit_name": kit_name, "type": type, "owner": owner, "not_purchased": not_purchased}
+        rows = self._filter_loaded(wanted, ids)
+        if self.journal is not None:
+            writes = self.journal.pending()
+            if writes:
+                rows = self._overlay(rows, writes, wanted, ids)
+        return rows
+
+    def _filter_loaded(self, wanted, ids):
+        with self._lock:
+            row_ids, names, indexes, positions = self.ids, self.names, self.indexes, self.positions
+            
+        postings = []
+        if ids is not None:
+            # Turned into a posting list of its own, so it keeps the name order like the others
+            matches = sorted(positions[i] for i in ids if i in positions)
+            if not matches:
+                return []
+            postings.append(matches)
+        for column, value in wanted.items():
+            if value is None:
+                continue
+            matches = indexes[column].get(fold_key(value))
+            if not matches:
+                return []
+            postings.append(matches)
+            
+        if not postings:
+            return list(map(EquipmentListEntry, row_ids, names))
+        
+        # Walk the shortest posting list and probe the others
+        postings.sort(key=len)
+        others = [set(p) for p in postings[1:]]
+        return [EquipmentListEntry(row_ids[pos], names[pos]) for pos in postings[0] if all(pos in other for other in others)]
+
+    def _overlay(self, rows, writes, wanted, ids):
+        """
+        Applies queued writes to a filtered list: items added or edited in the journal
+        are shown with their saved values, deleted ones are left out and renamed ones
+        get their new name.
+
+        :param rows: Filtered rows of the loaded copy.
+        :param writes: Pending journal writes, oldest first.
+        :return: New list, ordered by name.
+        """
+        with self._lock:
+            row_ids, names, positions = self.ids, self.names, self.positions
+            loaded = self.stamp is not None
+        edited = {}  # id -> filter values and name as saved, or None once deleted
+        renamed = {}  # id -> new name of items renamed but otherwise as loaded
+        for write in writes:
+            if write.op in ("insert", "update"):
+                edited[write.equipment_id] = {column: write.payload.get(column) for column in ("name",) + self.FILTER_COLUMNS}
+                renamed.pop(write.equipment_id, None)
+            elif write.op == "delete":
+                edited[write.equipment_id] = None
+            elif write.op == "rename":
+                old_key = fold_key(write.payload["old_name"])
+                new_name = write.payload["new_name"]
+                targets = write.payload.get("versions") or None
+                for equipment_id, values in edited.items():
+                    if values is not None and (targets is None or equipment_id in targets) and fold_key(values["name"]) == old_key:
+                        values["name"] = new_name
+                for position, equipment_id in enumerate(row_ids):
+                    if equipment_id in edited or (targets is not None and equipment_id not in targets):
+                        continue
+                    if fold_key(renamed.get(equipment_id, names[position])) == old_key:
+                        renamed[equipment_id] = new_name
+        if not edited and not renamed:
+            return rows
+
+        result = [
+            EquipmentListEntry(row.id, renamed.get(row.id, row.name))
+            for row in rows if row.id not in edited
+        ]
+        for equipment_id, values in edited.items():
+            if values is None or (ids is not None and equipment_id not in ids):
+                continue
+            if equipment_id > 0 and loaded and equipment_id not in positions:
+                continue  # Gone from the server, so the edit will come back as a conflict
+            if all(value is None or self._same(values[column], value) for column, value in wanted.items()):
+                result.append(EquipmentListEntry(equipment_id, values["name"]))
+        result.sort(key=lambda row: fold_key(row.name or ""))
+        return result
+
+    @staticmethod
+    def _same(saved, wanted):
+        if saved is None:
+            return False  # Like NULL in the loaded copy, never matches a filter
+        if isinstance(wanted, bool):
+            return bool(saved) == wanted
+        return fold_key(saved) == fold_key(wanted)
+
+    def row_versions(self, ids=(), kit_names=(), names=()):
+        """
+        Versions of the rows as last loaded, i.e. as the window showed them; changes
+        queued in the journal carry them so the server can tell if it has moved on.
+        Doesn't go to the server, so it also answers while it can't be reached.
+
+        :return: Dict of id -> version of the rows with any of the ids, kits or names.
+        """
+        with self._lock:
+            row_ids, row_names, versions, indexes, positions = self.ids, self.names, self.versions, self.indexes, self.positions
+            
+        wanted = {positions[equipment_id] for equipment_id in ids if equipment_id in positions}
+        for kit_name in kit_names:
+            wanted.update(indexes["kit_name"].get(fold_key(kit_name), ()))
+        if names:
+            keys = {fold_key(name) for name in names}
+            wanted.update(position for position, name in enumerate(row_names) if fold_key(name) in keys)
+        return {row_ids[position]: versions[position] for position in sorted(wanted)}
@@ -0,0 +1,118 @@
+# startup.py
+import builtins
+import importlib
+import sys
+import threading
+import time
+
+# Pass on the command line to print where startup time went once the window is drawn
+REPORT_FLAG = "--startup-report"
+
+STARTED_AT = time.perf_counter()
+
+# module name -> seconds spent importing it on first use
+deferred_imports = {}
+# (label, seconds since STARTED_AT)
+milestones = []
+
+class LazyModule:
+    """
+    Stands in for a module that is only imported the first time one of its
+    attributes is used, so heavy libraries don't slow down every launch.
+
+    :param name: Full module name, e.g. "PIL.Image".
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            started = time.perf_counter()
+            module = importlib.import_module(self._name)
+            deferred_imports.setdefault(self._name, time.perf_counter() - started)
+            self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_import(name):
+    """
+    :param name: Full module name.
+    :return: The module if it is already imported, otherwise a LazyModule for it.
+    """
+    return sys.modules.get(name) or LazyModule(name)
+
+def mark(label):
+    """
+    Records how long after startup a point was reached.
+
+    :param label: Name shown in the report.
+    """
+    milestones.append((label, time.perf_counter() - STARTED_AT))
+
+class ImportTimer:
+    """
+    Times every first-time import made on the installing thread, in the same
+    self/cumulative layout as python -X importtime.
+    """
+    def __init__(self):
+        self.records = []  # (name, self seconds, cumulative seconds, depth) in completion order
+        self._stack = []
+        self._original = None
+        self._thread = None
+
+    def install(self):
+        if self._original is not None:
+            return
+        self._thread = threading.get_ident()
+        self._original = builtins.__import__
+        builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules or threading.get_ident() != self._thread:
+            return self._original(name, globals, locals, fromlist, level)
+        self._stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.records.append((name, elapsed - children, elapsed, len(self._stack)))
+
+import_timer = ImportTimer()
+
+def print_report(min_cumulative=0.001):
+    """
+    Prints the import breakdown, the deferred imports that have happened so far and
+    the milestones.
+
+    :param min_cumulative: Imports faster than this many seconds (cumulative) are left out.
+    """
+    import_timer.uninstall()
+    if import_timer.records:
+        print("import time:   self [us] | cumulative | imported package")
+        for name, own, cumulative, depth in import_timer.records:
+            if cumulative >= min_cumulative:
+                print(f"import time: {own * 1e6:11.0f} | {cumulative * 1e6:10.0f} | {'  ' * depth}{name}")
+        top_level = sum(cumulative for _, _, cumulative, depth in import_timer.records if depth == 0)
+        print(f"Eager imports: {top_level * 1000:.1f} ms")
+    if deferred_imports:
+        print("Deferred imports loaded so far:")
+        for name, seconds in deferred_imports.items():
+            print(f"  {name}: {seconds * 1000:.1f} ms")
+    for label, seconds in milestones:
+        print(f"{label}: {seconds * 1000:.1f} ms after startup")
@@ -0,0 +1,55 @@
+# conftest.py
+import datetime
+import decimal
+import os
+import sys
+import types
+import pytest
+
+# The app's modules sit flat in the directory above
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modules.connect as ct
+
+# db.py picks between ct.local and ct.remote when it is imported; a connect.py with a
+# single server serves as both, since these tests only ever open SQLite files
+for server_name in ("local", "remote"):
+    if not hasattr(ct, server_name):
+        setattr(ct, server_name, types.SimpleNamespace(host=ct.host, user=ct.user, passwd=ct.passwd, database=ct.database))
+
+from backends import SQLiteBackend
+from db import DatabaseManager, FORM_COLUMNS
+from journal import WriteJournal, JournalSyncer
+from migrations import run_migrations
+
+@pytest.fixture
+def db_manager(tmp_path):
+    manager = DatabaseManager(backend=SQLiteBackend(str(tmp_path / "server.sqlite3")))
+    run_migrations(manager)
+    yield manager
+    manager.close()
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = WriteJournal(str(tmp_path / "pending_writes.sqlite3"))
+    yield journal
+    journal.close()
+
+@pytest.fixture
+def syncer(journal, db_manager):
+    return JournalSyncer(journal, db_manager)
+
+@pytest.fixture
+def form():
+    def make(name, **fields):
+        """
+        :return: Data as the add/update form collects it.
+        """
+        data = dict.fromkeys(FORM_COLUMNS)
+        data.update(
+            name=name, type="Camera", owner="USS", weight="2.5", kit_name="Kit A", not_purchased=False,
+            date_of_purchase=datetime.date(2021, 3, 4), cost=decimal.Decimal("1299.99")
+        )
+        data.update(fields)
+        return data
+    return make
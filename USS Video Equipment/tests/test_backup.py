@@ -0,0 +1,69 @@
+# test_backup.py
+import datetime
+import decimal
+import gzip
+import pytest
+import backup
+from backup import backup_table, sql_literal
+
+@pytest.mark.parametrize("value, literal", [
+    (None, "NULL"),
+    (True, "1"),
+    (7, "7"),
+    (decimal.Decimal("1299.99"), "1299.99"),
+    (datetime.date(2021, 3, 4), "'2021-03-04'"),
+    (datetime.datetime(2021, 3, 4, 5, 6, 7), "'2021-03-04 05:06:07'"),
+    (b"\x00\xff", "0x00ff"),
+    (b"", "''"),
+    ("O'Brien \"kit\" \\ \n\r\x1a\0", "'O\\'Brien \\\"kit\\\" \\\\ \\n\\r\\Z\\0'"),
+])
+def test_sql_literal_matches_mysqldump(value, literal):
+    assert sql_literal(value) == literal
+
+@pytest.fixture
+def filled(db_manager, form):
+    for number in range(5):
+        db_manager.add_or_update_equipment(form(f"Item {number}"))
+    return db_manager
+
+def insert_lines(text):
+    return [line for line in text.splitlines() if line.startswith("INSERT INTO `equipment` VALUES ")]
+
+def test_backup_streams_rows_in_chunks(filled, tmp_path):
+    dump_file = tmp_path / "equipment_backup.sql"
+    seen = []
+    assert backup_table(filled, str(dump_file), chunk_size=2, progress=seen.append) == 5
+
+    assert seen == [2, 4, 5]
+    text = dump_file.read_text(encoding="utf-8")
+    assert "CREATE TABLE `equipment`" in text
+    (statement,) = insert_lines(text)
+    assert statement.count("'Item ") == 5
+    assert not (tmp_path / "equipment_backup.sql.tmp").exists()
+
+def test_long_inserts_are_split(filled, tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "MAX_INSERT_BYTES", 200)
+    dump_file = tmp_path / "equipment_backup.sql"
+    backup_table(filled, str(dump_file))
+
+    statements = insert_lines(dump_file.read_text(encoding="utf-8"))
+    assert len(statements) > 1
+    assert sum(statement.count("'Item ") for statement in statements) == 5
+
+def test_gz_extension_compresses(filled, tmp_path):
+    dump_file = tmp_path / "equipment_backup.sql.gz"
+    backup_table(filled, str(dump_file))
+
+    with gzip.open(dump_file, "rt", encoding="utf-8") as dump:
+        assert dump.read().count("'Item ") == 5
+
+def test_failed_backup_keeps_previous_dump(filled, tmp_path):
+    dump_file = tmp_path / "equipment_backup.sql"
+    dump_file.write_text("previous dump", encoding="utf-8")
+
+    def fail(rows_written):
+        raise OSError("disk full")
+    with pytest.raises(OSError):
+        backup_table(filled, str(dump_file), progress=fail)
+    assert dump_file.read_text(encoding="utf-8") == "previous dump"
+    assert not (tmp_path / "equipment_backup.sql.tmp").exists()
@@ -0,0 +1,45 @@
+# test_detail_cache.py
+from db import RowCache
+
+def test_least_recently_used_row_is_evicted():
+    cache = RowCache(max_size=2)
+    cache.put(1, "one")
+    cache.put(2, "two")
+    cache.get(1)
+    cache.put(3, "three")
+
+    assert cache.get(2) is None
+    assert (cache.get(1), cache.get(3)) == ("one", "three")
+    assert (cache.hits, cache.misses) == (3, 1)
+
+def test_read_started_before_invalidation_is_not_stored():
+    cache = RowCache()
+    generation = cache.generation
+    cache.invalidate(1)  # A write lands while the read is still on the wire
+    cache.put(1, "stale", generation)
+    assert cache.get(1) is None
+
+    cache.put(1, "fresh", cache.generation)
+    assert cache.get(1) == "fresh"
+
+def test_clear_also_bumps_the_generation():
+    cache = RowCache()
+    generation = cache.generation
+    cache.put(1, "one")
+    cache.clear()
+    cache.put(2, "two", generation)
+
+    assert cache.get(1) is None and cache.get(2) is None
+
+def test_details_come_from_the_cache_until_the_item_changes(db_manager, form):
+    item = db_manager.add_or_update_equipment(form("Camera"))
+    (first,) = db_manager.get_equipment_details(item)
+    misses = db_manager.detail_cache.misses
+    (second,) = db_manager.get_equipment_details(item)
+    assert second is first and db_manager.detail_cache.misses == misses
+    # A projection is cut out of the cached full row
+    assert db_manager.get_equipment_fields(item, ["name", "kit_name"]) == ("Camera", "Kit A")
+
+    db_manager.add_or_update_equipment(form("Camera 2"), is_update=True, equipment_id=item)
+    (third,) = db_manager.get_equipment_details(item)
+    assert third.name == "Camera 2"
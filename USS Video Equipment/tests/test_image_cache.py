@@ -0,0 +1,66 @@
+# test_image_cache.py
+import os
+import pytest
+from PIL import Image
+from image_cache import ThumbnailCache
+
+def picture(directory, name, size=(800, 600), color="red"):
+    path = str(directory / name)
+    Image.new("RGB", size, color).save(path)
+    return path
+
+@pytest.fixture
+def pics(tmp_path):
+    directory = tmp_path / "Pics"
+    directory.mkdir()
+    return directory
+
+def test_thumbnails_are_scaled_down(pics):
+    cache = ThumbnailCache(max_size=100, disk_dir=None)
+    assert cache.get_thumbnail(picture(pics, "Camera.png")).size == (100, 75)
+
+def test_memory_keeps_most_recently_used(pics):
+    cache = ThumbnailCache(max_size=50, memory_items=2, disk_dir=None)
+    first, second, third = (picture(pics, f"{name}.png") for name in ("A", "B", "C"))
+    cache.get_thumbnail(first)
+    cache.get_thumbnail(second)
+    cache.get_thumbnail(first)
+    cache.get_thumbnail(third)  # Pushes out B, the least recently used
+
+    hits = cache.stats["memory_hits"]
+    cache.get_thumbnail(first)
+    assert cache.stats["memory_hits"] == hits + 1
+    cache.get_thumbnail(second)
+    assert cache.stats["memory_hits"] == hits + 1
+
+def test_disk_level_survives_a_new_cache(pics, tmp_path):
+    path = picture(pics, "Camera.png")
+    ThumbnailCache(max_size=50, disk_dir=str(tmp_path / "thumbs")).get_thumbnail(path)
+
+    cache = ThumbnailCache(max_size=50, disk_dir=str(tmp_path / "thumbs"))
+    assert cache.get_thumbnail(path).size == (50, 38)
+    assert cache.stats["disk_hits"] == 1
+
+def test_replaced_picture_is_decoded_again(pics):
+    cache = ThumbnailCache(max_size=50, disk_dir=None)
+    path = picture(pics, "Camera.png")
+    cache.get_thumbnail(path)
+    picture(pics, "Camera.png", size=(300, 600), color="blue")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert cache.get_thumbnail(path).size == (25, 50)
+
+def test_disk_cache_evicts_oldest_files(pics, tmp_path):
+    thumbs = tmp_path / "thumbs"
+    first = picture(pics, "A.png")
+    ThumbnailCache(max_size=50, disk_dir=str(thumbs)).get_thumbnail(first)
+    (old,) = thumbs.glob("*.png")
+    os.utime(old, (0, 0))
+
+    # Room for one thumbnail, so saving a second one evicts the older
+    cache = ThumbnailCache(max_size=50, disk_dir=str(thumbs), disk_bytes=old.stat().st_size * 1.5)
+    cache.get_thumbnail(picture(pics, "B.png", color="green"))
+
+    assert cache.stats["disk_evictions"] == 1
+    assert not old.exists() and len(list(thumbs.glob("*.png"))) == 1
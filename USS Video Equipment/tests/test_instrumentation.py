@@ -0,0 +1,55 @@
+# test_instrumentation.py
+import logging
+import pytest
+from instrumentation import Instrumentation, percentile, sql_shape, action
+
+@pytest.mark.parametrize("fraction, expected", [(0.01, 1), (0.07, 7), (0.5, 50), (0.95, 95), (0.99, 99), (1.0, 100)])
+def test_percentile_is_nearest_rank(fraction, expected):
+    assert percentile(list(range(1, 101)), fraction) == expected
+
+def test_percentile_of_short_lists():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([3.0], 0.99) == 3.0
+    assert percentile([1.0, 2.0], 0.5) == 1.0
+
+def test_queries_differing_only_in_values_share_a_shape():
+    assert sql_shape("SELECT * FROM equipment WHERE id = 12 AND name = 'O''Brien'") == "SELECT * FROM equipment WHERE id = ? AND name = ?"
+    assert sql_shape("UPDATE equipment SET carrier = %s WHERE id IN (%s, %s, %s)") == "UPDATE equipment SET carrier = ? WHERE id IN (...)"
+    assert sql_shape("DELETE FROM equipment WHERE id IN (%s,%s)") == sql_shape("DELETE FROM equipment WHERE id IN (%s, %s, %s, %s)")
+
+def test_stats_per_shape():
+    instrumentation = Instrumentation()
+    for number in range(1, 101):
+        instrumentation.record(f"SELECT name FROM equipment WHERE id = {number}", 0.0, number / 1000, rows=1)
+    with action("Delete"):
+        instrumentation.record("DELETE FROM equipment WHERE id = %s", 0.0, 0.5, error=RuntimeError("gone"))
+
+    # Most total time first
+    select, delete = instrumentation.snapshot()
+    assert (delete["count"], delete["errors"], delete["actions"]) == (1, 1, {"Delete": 1})
+    assert (select["count"], select["rows"]) == (100, 100)
+    assert select["p50_ms"] == pytest.approx(50) and select["p95_ms"] == pytest.approx(95)
+    assert select["max_ms"] == pytest.approx(100)
+
+def test_slow_queries_are_logged_and_kept(caplog):
+    instrumentation = Instrumentation(slow_query_threshold=0.2)
+    with caplog.at_level(logging.WARNING, logger="db.slow"):
+        instrumentation.record("SELECT 1", 0.0, 0.1)
+        with action("Refresh"):
+            instrumentation.record("SELECT   *\nFROM equipment", 0.05, 0.25, rows=3)
+
+    (entry,) = instrumentation.slow_queries
+    assert entry["query"] == "SELECT * FROM equipment"
+    assert (entry["action"], entry["rows"]) == ("Refresh", 3)
+    assert entry["ms"] == pytest.approx(300) and entry["connect_ms"] == pytest.approx(50)
+    (message,) = caplog.messages
+    assert "action Refresh" in message and "SELECT * FROM equipment" in message
+
+def test_manager_times_its_queries(db_manager, form):
+    db_manager.instrumentation.reset()
+    db_manager.add_or_update_equipment(form("Camera"))
+    db_manager.fetch_data("SELECT name FROM equipment WHERE id = %s", (1,))
+
+    shapes = {stats["shape"]: stats for stats in db_manager.instrumentation.snapshot()}
+    assert shapes["SELECT name FROM equipment WHERE id = ?"]["rows"] == 1
+    assert any(shape.startswith("INSERT INTO equipment") for shape in shapes)
@@ -0,0 +1,126 @@
+# test_journal.py
+import threading
+import pytest
+from backends import SQLiteBackend
+from db import DatabaseManager
+from journal import JournalSyncer
+
+def rows(db_manager):
+    return db_manager.fetch_data("SELECT id, name, carrier, version FROM equipment ORDER BY id")
+
+def add(db_manager, form, *names):
+    return [db_manager.add_or_update_equipment(form(name)) for name in names]
+
+@pytest.mark.parametrize("batch_size", [1, 100])
+def test_chained_edits_build_on_each_other(db_manager, journal, syncer, form, batch_size):
+    (item,) = add(db_manager, form, "Camera")
+    # Every write below was made while the window still showed version 0
+    journal.add_or_update_equipment(form("Camera 2"), is_update=True, equipment_id=item, base_version=0)
+    journal.bulk_update_shipping_info({"carrier": "UPS"}, [item], versions={item: 0})
+    journal.add_or_update_equipment(form("Camera 3"), is_update=True, equipment_id=item, base_version=0)
+    journal.update_equipment_name("Camera 3", "Camera 4", versions={item: 0})
+    syncer.batch_size = batch_size
+
+    assert syncer.sync_once() == 4
+    assert journal.counts() == {}
+    assert rows(db_manager) == [(item, "Camera 4", "UPS", 4)]
+
+def test_edit_queued_after_sync_builds_on_synced_edit(db_manager, journal, syncer, form):
+    (item,) = add(db_manager, form, "Camera")
+    journal.add_or_update_equipment(form("Camera 2"), is_update=True, equipment_id=item, base_version=0)
+    syncer.sync_once()
+    journal.add_or_update_equipment(form("Camera 3"), is_update=True, equipment_id=item, base_version=0)
+
+    syncer.sync_once()
+    assert rows(db_manager) == [(item, "Camera 3", None, 2)]
+
+def test_temporary_ids_are_remapped(db_manager, journal, syncer, form):
+    add(db_manager, form, "Existing")
+    first = journal.add_or_update_equipment(form("Offline 1"))
+    second = journal.add_or_update_equipment(form("Offline 2"))
+    assert first < 0 and second < 0
+    journal.bulk_update_shipping_info({"carrier": "FedEx"}, [first, second])
+    journal.delete_equipment(second)
+
+    # One write per batch, so later batches only find the server ids through the journal
+    syncer.batch_size = 1
+    assert syncer.sync_once() == 4
+    assert journal.counts() == {}
+    assert rows(db_manager) == [(1, "Existing", None, 0), (2, "Offline 1", "FedEx", 1)]
+
+def test_replayed_insert_is_not_added_twice(db_manager, journal, form):
+    journal.add_or_update_equipment(form("Tripod"))
+    writes = journal.pending()
+    # The server took the batch but the journal never heard back, so it is sent again
+    first = db_manager.apply_writes(writes)
+    second = db_manager.apply_writes(journal.pending())
+    journal.complete(writes, second)
+
+    assert first == second
+    assert journal.counts() == {}
+    assert [name for _, name, _, _ in rows(db_manager)] == ["Tripod"]
+
+def test_edit_of_changed_item_is_a_conflict(db_manager, journal, syncer, form):
+    (item,) = add(db_manager, form, "Camera")
+    db_manager.add_or_update_equipment(form("Changed elsewhere"), is_update=True, equipment_id=item)
+    journal.add_or_update_equipment(form("Mine"), is_update=True, equipment_id=item, base_version=0)
+    syncer.sync_once()
+
+    (entry,) = journal.entries()
+    assert entry.status == "conflict"
+    assert rows(db_manager) == [(item, "Changed elsewhere", None, 1)]
+
+    journal.retry(entry.seq, overwrite=True)
+    syncer.sync_once()
+    assert journal.counts() == {}
+    assert rows(db_manager) == [(item, "Mine", None, 2)]
+
+def test_shipping_conflict_leaves_every_item_alone(db_manager, journal, syncer, form):
+    first, second = add(db_manager, form, "Camera", "Lens")
+    db_manager.bulk_update_shipping_info({"carrier": "DHL"}, [second])
+    journal.bulk_update_shipping_info({"carrier": "UPS"}, [first, second], versions={first: 0, second: 0})
+    syncer.sync_once()
+
+    (entry,) = journal.entries()
+    assert entry.status == "conflict"
+    assert rows(db_manager) == [(first, "Camera", None, 0), (second, "Lens", "DHL", 1)]
+
+def test_delete_and_rename_of_changed_items_are_conflicts(db_manager, journal, syncer, form):
+    first, second = add(db_manager, form, "Camera", "Lens")
+    db_manager.add_or_update_equipment(form("Camera"), is_update=True, equipment_id=first)
+    db_manager.add_or_update_equipment(form("Lens"), is_update=True, equipment_id=second)
+    journal.delete_equipment(first, base_version=0)
+    journal.update_equipment_name("Lens", "Zoom Lens", versions={second: 0})
+    syncer.sync_once()
+
+    assert [entry.status for entry in journal.entries()] == ["conflict", "conflict"]
+    assert rows(db_manager) == [(first, "Camera", None, 1), (second, "Lens", None, 1)]
+
+def test_delete_of_deleted_item_is_applied(db_manager, journal, syncer, form):
+    (item,) = add(db_manager, form, "Camera")
+    db_manager.delete_equipment(item)
+    journal.delete_equipment(item, base_version=0)
+    syncer.sync_once()
+
+    assert journal.counts() == {}
+
+def status_after_first_attempt(syncer):
+    attempted = threading.Event()
+    syncer.on_status = attempted.set
+    syncer.start()
+    try:
+        assert attempted.wait(5)
+        return syncer.online
+    finally:
+        syncer.stop(5)
+
+def test_idle_syncer_is_online_only_once_the_server_answers(syncer):
+    assert syncer.online is None
+    assert status_after_first_attempt(syncer) is True
+
+def test_idle_syncer_notices_an_unreachable_server(journal, tmp_path):
+    db_manager = DatabaseManager(backend=SQLiteBackend(str(tmp_path / "missing" / "server.sqlite3")))
+    syncer = JournalSyncer(journal, db_manager)
+
+    assert status_after_first_attempt(syncer) is False
+    assert syncer.last_error
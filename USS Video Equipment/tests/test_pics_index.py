@@ -0,0 +1,54 @@
+# test_pics_index.py
+import os
+import pytest
+from pics_index import PicsIndex
+
+def touch(directory, file_name):
+    (directory / file_name).write_bytes(b"")
+    bump(directory)
+
+def bump(directory):
+    # Coarse filesystem timestamps could otherwise hide a change made within the same tick
+    stat = os.stat(directory)
+    os.utime(directory, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+@pytest.fixture
+def pics(tmp_path):
+    touch(tmp_path, "Camera.jpg")
+    touch(tmp_path, "Lens.png")
+    (tmp_path / "notes.txt").write_text("not an image")
+    return PicsIndex(str(tmp_path), use_inotify=False)
+
+def test_lookup_ignores_case_and_prefers_png(pics, tmp_path):
+    assert pics.path_for("Camera") == str(tmp_path / "Camera.jpg")
+    assert pics.path_for("camera") == str(tmp_path / "Camera.jpg")
+    assert pics.path_for("notes") is None
+
+    touch(tmp_path, "Camera.png")
+    assert pics.path_for("Camera") == str(tmp_path / "Camera.png")
+
+def test_changes_are_picked_up_on_next_lookup(pics, tmp_path):
+    touch(tmp_path, "Tripod.png")
+    os.remove(tmp_path / "Lens.png")
+    bump(tmp_path)
+
+    assert pics.path_for("Tripod") == str(tmp_path / "Tripod.png")
+    assert pics.path_for("Lens") is None
+    assert pics.image_names() == {"Camera", "Tripod"}
+
+def test_unchanged_directory_is_not_rescanned(pics, tmp_path, monkeypatch):
+    def fail(path):
+        raise AssertionError("rescanned")
+    monkeypatch.setattr(os, "scandir", fail)
+
+    assert pics.path_for("Lens") == str(tmp_path / "Lens.png")
+
+def test_rename_moves_the_file(pics, tmp_path):
+    assert pics.rename("Camera", "Camera 2") == str(tmp_path / "Camera 2.jpg")
+    assert pics.path_for("Camera") is None
+    assert pics.path_for("Camera 2") == str(tmp_path / "Camera 2.jpg")
+    assert pics.rename("Missing", "Still missing") is None
+
+def test_missing_and_unmatched_images(pics, tmp_path):
+    assert pics.missing_images(["Camera", "Tripod", "Tripod"]) == ["Tripod"]
+    assert pics.unmatched_images(["camera"]) == [str(tmp_path / "Lens.png")]
@@ -0,0 +1,81 @@
+# test_pool.py
+import threading
+import pytest
+from mysql.connector.errors import OperationalError
+from backends import SQLiteBackend
+from db import ConnectionPool, PoolTimeoutError
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / "pool.sqlite3"))
+
+@pytest.fixture
+def pool(backend):
+    pool = ConnectionPool(backend, size=2, timeout=0.1, statement_cache_size=0)
+    yield pool
+    pool.close_all()
+
+def test_released_connection_is_reused(pool):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert pool.stats["created"] == 1 and pool.stats["checkouts"] == 2
+
+def test_pool_never_opens_more_than_its_size(pool):
+    first, second = pool.acquire(), pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.stats["created"] == 2 and pool.stats["waits"] == 1
+
+    pool.release(first)
+    assert pool.acquire() is first
+    pool.release(first)
+    pool.release(second)
+
+def test_waiting_caller_gets_the_released_connection(pool):
+    pool.timeout = 5
+    first, second = pool.acquire(), pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    pool.release(second)
+    waiter.join(5)
+
+    assert got == [second]
+    pool.release(first)
+    pool.release(second)
+
+def test_release_rolls_back_an_open_transaction(pool):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("CREATE TABLE items (name TEXT)")
+        conn.commit()
+        cursor.execute("INSERT INTO items VALUES ('left open')")
+        assert conn.in_transaction
+
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM items")
+        assert cursor.fetchall() == [(0,)]
+
+def test_connection_error_discards_the_connection(pool):
+    with pytest.raises(OperationalError):
+        with pool.connection() as broken:
+            raise OperationalError(msg="lost connection")
+    assert pool.stats["discarded"] == 1
+
+    with pool.connection() as conn:
+        assert conn is not broken
+    assert pool.stats["created"] == 2
+
+def test_stale_connection_is_pinged_and_reconnected(pool):
+    pool.ping_after = 0
+    with pool.connection() as conn:
+        pass
+    conn.conn.close()  # The server dropped the idle session
+
+    with pool.connection() as again:
+        assert again is conn
+        again.cursor().execute("SELECT 1")
+    assert pool.stats["reconnects"] == 1
@@ -0,0 +1,77 @@
+# test_restore.py
+import datetime
+import decimal
+import pytest
+from backup import backup_table
+from restore import restore_dump, DumpFormatError
+
+TRICKY_TEXT = "O'Brien's \"kit\" \\ C:\\path\n\tsecond line\r\x1a end \0 héllo ✓"
+PHOTO = bytes(range(256))
+
+def snapshot_rows(db_manager):
+    return db_manager.fetch_data(
+        "SELECT id, name, description, serial_number, cost, weight, date_of_purchase, not_purchased, version, photo "
+        "FROM equipment ORDER BY id"
+    )
+
+@pytest.fixture
+def filled(db_manager, form):
+    # A binary column, so the dump has hex literals to read back
+    db_manager.execute_query("ALTER TABLE equipment ADD COLUMN photo BLOB")
+    db_manager.add_or_update_equipment(form(TRICKY_TEXT, description="''", serial_number="'; DROP TABLE equipment; --"))
+    db_manager.add_or_update_equipment(form("Plain", description=None, cost=None, date_of_purchase=None, not_purchased=True))
+    db_manager.add_or_update_equipment(form("Empty", description="", weight="0"))
+    db_manager.execute_query("UPDATE equipment SET photo = %s WHERE id = 1", (PHOTO,))
+    db_manager.execute_query("UPDATE equipment SET photo = %s WHERE id = 3", (b"",))
+    return db_manager
+
+@pytest.mark.parametrize("dump_name", ["equipment_backup.sql", "equipment_backup.sql.gz"])
+def test_round_trip_keeps_every_value(filled, tmp_path, dump_name):
+    before = snapshot_rows(filled)
+    assert before[0][1] == TRICKY_TEXT and before[0][9] == PHOTO
+    assert before[1][2] is None and before[1][4] is None and before[1][6] is None
+    assert before[0][4] == decimal.Decimal("1299.99") and before[0][6] == datetime.date(2021, 3, 4)
+
+    dump_file = str(tmp_path / dump_name)
+    assert backup_table(filled, dump_file) == 3
+    filled.execute_query("DELETE FROM equipment")
+    stats = restore_dump(filled, dump_file, batch_size=2)
+
+    assert stats["rows"] == 3
+    after = snapshot_rows(filled)
+    # The empty blob is written as '' and comes back as text
+    assert after[:2] == before[:2]
+    assert after[2][:9] == before[2][:9] and not after[2][9]
+
+def test_restored_table_keeps_ids_counting_up(filled, tmp_path, form):
+    dump_file = str(tmp_path / "equipment_backup.sql")
+    backup_table(filled, dump_file)
+    restore_dump(filled, dump_file)
+
+    assert filled.add_or_update_equipment(form("After restore")) == 4
+
+def test_unreadable_dump_leaves_table_alone(filled, tmp_path):
+    before = snapshot_rows(filled)
+    dump_file = tmp_path / "equipment_backup.sql"
+    backup_table(filled, str(dump_file))
+    text = dump_file.read_text(encoding="utf-8")
+    dump_file.write_text(text.replace("INSERT INTO `equipment` VALUES (", "INSERT INTO `equipment` VALUES ((", 1), encoding="utf-8")
+
+    with pytest.raises(DumpFormatError):
+        restore_dump(filled, str(dump_file))
+    assert snapshot_rows(filled) == before
+    assert filled.fetch_data("SELECT name FROM sqlite_master WHERE name = 'equipment__restore'") == []
+
+def test_failed_swap_rolls_back_on_its_own(filled):
+    before = snapshot_rows(filled)
+    with filled.create_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("CREATE TABLE equipment__restore (id INTEGER PRIMARY KEY)")
+        conn.commit()
+        with pytest.raises(Exception):
+            filled.backend.replace_table(cursor, "equipment__restore", "equipment", ["CREATE INDEX broken ON nowhere (id)"])
+        cursor.close()
+
+    # Nothing is left open for the next user of the connection
+    assert snapshot_rows(filled) == before
+    assert filled.fetch_data("SELECT name FROM sqlite_master WHERE name = 'equipment__restore'") == [("equipment__restore",)]
@@ -0,0 +1,56 @@
+# test_search_index.py
+import pytest
+from search_index import SearchIndex
+
+@pytest.fixture
+def index(db_manager, form):
+    db_manager.add_or_update_equipment(form("Sony FX6", brand="Sony", model="FX6", serial_number="SN-4411"))
+    db_manager.add_or_update_equipment(form("Canon Lens", brand="Canon", model="RF 24-70", serial_number="AB12"))
+    db_manager.add_or_update_equipment(form("sony fx6", brand="Sony", serial_number="SN-4420"))
+    index = SearchIndex()
+    index.load(db_manager)
+    return index
+
+def test_every_word_must_start_an_indexed_word(index):
+    assert index.match("son") == {1, 3}
+    assert index.match("sony 4411") == {1}
+    assert index.match("RF 24") == {2}
+    assert index.match("ony") == set()
+    assert index.match("  ") == set()
+
+def test_search_orders_by_name_or_keeps_the_given_rows(index):
+    assert index.search("sony") == [(1, "Sony FX6"), (3, "sony fx6")]
+    assert index.search("sn", rows=[(3, "sony fx6"), (2, "Canon Lens"), (1, "Sony FX6")]) == [(3, "sony fx6"), (1, "Sony FX6")]
+
+def test_short_prefixes_follow_updates(index):
+    assert index.match("c") == {2}  # Memoised when the index loaded
+    index.update(4, {"name": "Cable", "brand": "Canare"})
+    index.update(2, {"name": "Lens", "brand": "Sigma"})
+
+    assert index.match("c") == {4}
+    assert index.match("ca") == {4}
+    assert index.match("lens") == {2} and index.match("rf") == {2}  # Fields not passed keep their value
+    index.remove(4)
+    assert index.match("c") == set()
+
+def test_rekey_moves_an_offline_item(index):
+    index.update(-1, {"name": "Tripod"})
+    index.rekey(-1, 9)
+    assert index.search("tri") == [(9, "Tripod")]
+
+def test_rename_matches_names_like_the_server(index):
+    index.rename("SONY FX6", "Sony FX6 Mk II")
+
+    assert index.search("mk") == [(1, "Sony FX6 Mk II"), (3, "Sony FX6 Mk II")]
+    assert index.match("mk ii sony") == {1, 3}
+
+def test_rename_leaves_no_stale_tokens(index):
+    index.rename("Canon Lens", "Zoom")
+    assert index.match("lens") == set()
+    assert index.match("canon") == {2}  # Still the brand
+    assert index._prefix_range("lens")[0] == index._prefix_range("lens")[1]
+
+def test_highlight_shows_other_matching_fields(index):
+    label, spans = index.highlight(1, "sony 44")
+    assert label == "Sony FX6  ·  Brand Sony  ·  SN SN-4411"
+    assert [label[start:end] for start, end in spans] == ["Sony", "Sony", "44"]
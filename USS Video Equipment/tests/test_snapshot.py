@@ -0,0 +1,72 @@
+# test_snapshot.py
+import pytest
+from backends import SQLiteBackend
+from db import DatabaseManager
+from snapshot import EquipmentSnapshot
+
+@pytest.fixture
+def filled(db_manager, form):
+    db_manager.add_or_update_equipment(form("Tripod", kit_name="Kit B", type="Grip"))
+    db_manager.add_or_update_equipment(form("Camera", owner="Sóny Rentals"))
+    db_manager.add_or_update_equipment(form("Lens", not_purchased=True))
+    return db_manager
+
+@pytest.fixture
+def snapshot(filled, journal):
+    return EquipmentSnapshot(filled, journal=journal)
+
+def names(rows):
+    return [row.name for row in rows]
+
+def test_filters_combine_and_keep_name_order(snapshot):
+    assert names(snapshot.filter()) == ["Camera", "Lens", "Tripod"]
+    assert names(snapshot.filter(kit_name="kit a")) == ["Camera", "Lens"]
+    assert names(snapshot.filter(kit_name="Kit A", not_purchased=False)) == ["Camera"]
+    assert names(snapshot.filter(owner="sony rentals")) == ["Camera"]
+    assert names(snapshot.filter(type="Grip", ids={1, 2})) == ["Tripod"]
+    assert snapshot.filter(type="Audio") == []
+    assert snapshot.loads == 1
+
+def test_own_writes_reload_at_once(snapshot, filled, form):
+    snapshot.filter()
+    filled.add_or_update_equipment(form("Boom"))
+
+    assert names(snapshot.filter()) == ["Boom", "Camera", "Lens", "Tripod"]
+    assert snapshot.loads == 2
+
+def test_other_clients_are_noticed_after_max_age(snapshot, filled, form, tmp_path):
+    snapshot.filter()
+    # Another client on the same database; this manager's write counter doesn't move
+    other = DatabaseManager(backend=SQLiteBackend(str(tmp_path / "server.sqlite3")))
+    other.add_or_update_equipment(form("Camera 2"), is_update=True, equipment_id=2)
+    other.close()
+
+    assert names(snapshot.filter()) == ["Camera", "Lens", "Tripod"]
+    snapshot.checked_at -= snapshot.max_age
+    assert names(snapshot.filter()) == ["Camera 2", "Lens", "Tripod"]
+
+def test_failed_load_keeps_the_last_copy(snapshot, filled):
+    snapshot.filter()
+    filled.execute_query("ALTER TABLE equipment RENAME TO equipment_away")
+
+    assert names(snapshot.filter()) == ["Camera", "Lens", "Tripod"]
+    assert snapshot.failed_at is not None and snapshot.loads == 1
+
+    filled.execute_query("ALTER TABLE equipment_away RENAME TO equipment")
+    assert names(snapshot.filter()) == ["Camera", "Lens", "Tripod"] and snapshot.loads == 1  # Still waiting to retry
+    snapshot.failed_at -= snapshot.retry_after
+    snapshot.filter()
+    assert snapshot.loads == 2 and snapshot.failed_at is None
+
+def test_pending_writes_are_shown(snapshot, journal, form):
+    snapshot.filter()
+    new_id = journal.add_or_update_equipment(form("Boom"))
+    journal.add_or_update_equipment(form("Tripod", kit_name="Kit A", type="Grip"), is_update=True, equipment_id=1, base_version=0)
+    journal.delete_equipment(3, base_version=0)
+    journal.update_equipment_name("camera", "Cinema Camera", versions={2: 0})
+
+    assert [(row.id, row.name) for row in snapshot.filter()] == [(new_id, "Boom"), (2, "Cinema Camera"), (1, "Tripod")]
+    assert names(snapshot.filter(kit_name="Kit B")) == []
+    assert names(snapshot.filter(type="Grip", kit_name="Kit A")) == ["Tripod"]
+    assert names(snapshot.filter(ids={new_id})) == ["Boom"]
+    assert names(snapshot.filter(not_purchased=True)) == []
@@ -1,9 +1,16 @@
 # utils.py
 import tkinter as tk
 from tkinter import font as tkFont  # Add this line to import the font module
-from PIL import Image, ImageTk
-import os
+import logging
 import webbrowser
+from image_cache import ThumbnailCache
+from pics_index import PicsIndex
+
+# Shared by every display_image call unless a caller passes its own
+thumbnail_cache = ThumbnailCache()
+pics_index = PicsIndex()
+
+logger = logging.getLogger(__name__)
 
 def open_hyperlink(url):
     """
@@ -37,35 +44,29 @@ def initialize_fonts():
     value_font = tkFont.Font(family="Helvetica", size=12)
     return heading_font, bold_font, value_font
 
-def display_image(image_frame, item_name):
+def display_image(image_frame, item_name, cache=None, index=None):
     """
     Displays an image in the specified frame. Clears the previous image if any.
 
     :param image_frame: Frame where the image is to be displayed.
     :param item_name: Name of the item whose image is to be displayed.
+    :param cache: ThumbnailCache to read from; defaults to the shared thumbnail_cache.
+    :param index: PicsIndex used to find the image; defaults to the shared pics_index.
     """
     # Clear the previous image
     for widget in image_frame.winfo_children():
         widget.destroy()
         
-    found_image = False
-    for extension in ['.png', '.jpg']:
-        image_path = os.path.join('Pics', f'{item_name}{extension}')
-        if os.path.exists(image_path):
-            found_image = True
-            break
+    image_path = (index or pics_index).path_for(item_name)
         
-    if found_image:
+    if image_path:
         try:
-            image = Image.open(image_path)
-            max_size = 400
-            image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(image)
+            photo = (cache or thumbnail_cache).get_photo(image_path)
             image_label = tk.Label(image_frame, image=photo, anchor="w")
             image_label.image = photo
             image_label.grid(row=0, column=0, sticky='w')
-        except Exception as e:
-            print(f"Error displaying image: {e}")
+        except Exception:
+            logger.exception("Error displaying image %s", image_path)
             error_label = tk.Label(image_frame, text="Error displaying image", anchor="w")
             error_label.grid(row=0, column=0, sticky='w')
     else:
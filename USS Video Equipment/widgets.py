@@ -1,5 +1,6 @@
 # widgets.py
 import tkinter as tk
+from tkinter import font as tkFont
 
 class DateInput:
     def __init__(self, parent, row, column):
@@ -53,11 +54,18 @@ class DateInput:
             self.year_var.set(str(date_obj.year))
 
 class ColumnDropdown:
-    def __init__(self, parent, column_name, db_manager, row, column, button_label="New"):
+    def __init__(self, parent, column_name, db_manager, row, column, button_label="New", values=None):
+        """
+        :param values: Options to start with; None queries them now, on the calling thread.
+        """
         self.column_name = column_name
         self.db_manager = db_manager
         self.var = tk.StringVar(parent)
-        self.update_options()
+        if values is None:
+            self.update_options()
+        else:
+            self.options = ['None'] + sorted(str(value) for value in values)
+            self.var.set(self.options[0])
         
         self.dropdown_frame = tk.Frame(parent)
         self.dropdown_frame.grid(row=row, column=column, sticky='w')
@@ -107,6 +115,16 @@ class ColumnDropdown:
         self.dropdown_menu = tk.OptionMenu(self.dropdown_menu.master, self.var, *self.options)
         self.dropdown_menu.grid(row=row, column=column, columnspan=columnspan)
         
+    def set_options(self, values):
+        """
+        Replaces the options with values fetched elsewhere, e.g. on a worker thread.
+        The current choice is kept when it is still offered.
+        """
+        current = self.var.get()
+        self.options = ['None'] + sorted(str(value) for value in values)
+        self.update_dropdown()
+        self.var.set(current if current in self.options else self.options[0])
+        
     def set_value(self, value):
         """Set the dropdown to a specific value, adding it to options if not already present."""
         if value not in self.options:
@@ -114,3 +132,320 @@ class ColumnDropdown:
             self.update_dropdown()
         self.var.set(value)
         
+class VirtualListbox(tk.Frame):
+    """
+    Single-selection list that only draws the rows currently on screen, so it stays
+    fast with tens of thousands of entries. Rows are (id, name) pairs held in plain
+    lists and replaced in one go with set_rows; the selection maps straight to the
+    row's integer id.
+
+    The Listbox methods the app relies on (curselection, get, size, selection_set,
+    selection_clear, see, activate, delete) behave the same, and selection changes made
+    by the user generate <<ListboxSelect>> on this widget.
+
+    Rows can be shown with a different label than their name, with parts of it marked
+    (e.g. the text matching a search), by passing decorate to set_rows.
+
+    :param width: Width in characters of the list font.
+    :param height: Number of visible rows.
+    """
+    text_indent = 4  # Pixels left of each row's text
+    max_marks = 3  # Marked spans drawn per row
+
+    def __init__(self, parent, font=None, width=20, height=10, select_background="#3874d1", select_foreground="white", mark_background="#ffe066", **kwargs):
+        super().__init__(parent, **kwargs)
+        self.font = font if isinstance(font, tkFont.Font) else tkFont.Font(font=font or "TkDefaultFont")
+        self.row_height = self.font.metrics("linespace") + 2
+        self.select_background = select_background
+        self.select_foreground = select_foreground
+        self.mark_background = mark_background
+        self.ids = []
+        self.names = []
+        self.decorate = None
+        self._positions = None  # id -> row index, built on first lookup after set_rows
+        self._top = 0  # Index of the first visible row
+        self._selected = None
+        self._items = []  # Canvas items of each visible slot, reused for whichever rows are on screen
+
+        self.canvas = tk.Canvas(
+            self, width=self.font.measure("0") * width, height=self.row_height * height,
+            background="white", highlightthickness=1, takefocus=1
+        )
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self._highlight = self.canvas.create_rectangle(0, 0, 0, 0, fill=self.select_background, width=0, state="hidden")
+
+        self.canvas.bind("<Configure>", lambda _: self._render())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", lambda _: self.yview("scroll", -3, "units"))
+        self.canvas.bind("<Button-5>", lambda _: self.yview("scroll", 3, "units"))
+        self.canvas.bind("<Up>", lambda _: self._move_selection(-1))
+        self.canvas.bind("<Down>", lambda _: self._move_selection(1))
+        self.canvas.bind("<Prior>", lambda _: self._move_selection(-self._page_rows()))
+        self.canvas.bind("<Next>", lambda _: self._move_selection(self._page_rows()))
+        self.canvas.bind("<Home>", lambda _: self._move_selection(-len(self.ids)))
+        self.canvas.bind("<End>", lambda _: self._move_selection(len(self.ids)))
+
+    def set_rows(self, rows, decorate=None):
+        """
+        Replaces every row at once. Clears the selection and scrolls to the top.
+
+        :param rows: Iterable of (id, name) pairs, in display order.
+        :param decorate: Optional callable(id) returning (label, [(start, end), ...]) to show
+            instead of the name with those character spans marked, or (None, []) to show
+            the name. Only called for rows as they scroll into view; get() still returns the name.
+        """
+        self.ids = []
+        self.names = []
+        for equipment_id, name in rows:
+            self.ids.append(self._key(equipment_id))
+            self.names.append("" if name is None else str(name))
+        self.decorate = decorate
+        self._positions = None
+        self._selected = None
+        self._top = 0
+        self._render()
+
+    def index_of(self, equipment_id):
+        """
+        :return: Row index of an id, or None if it isn't listed.
+        """
+        if self._positions is None:
+            self._positions = {row_id: index for index, row_id in enumerate(self.ids)}
+        return self._positions.get(self._key(equipment_id))
+
+    def selected_id(self):
+        """
+        :return: Integer id of the selected row, or None.
+        """
+        return None if self._selected is None else self.ids[self._selected]
+
+    def select_id(self, equipment_id):
+        """
+        Selects and scrolls to the row of an id, without generating <<ListboxSelect>>.
+
+        :return: True if the id is listed.
+        """
+        index = self.index_of(equipment_id)
+        if index is None:
+            return False
+        self.selection_set(index)
+        self.see(index)
+        return True
+
+    # Listbox-compatible API
+
+    def curselection(self):
+        return () if self._selected is None else (self._selected,)
+
+    def get(self, index):
+        return self.names[index]
+
+    def size(self):
+        return len(self.ids)
+
+    def selection_set(self, index):
+        if 0 <= index < len(self.ids):
+            self._selected = index
+            self._render()
+
+    def selection_clear(self, first=0, last=None):
+        self._selected = None
+        self._render()
+
+    def activate(self, index):
+        self.selection_set(index)
+
+    def delete(self, first=0, last=None):
+        # Only clearing the whole list is supported; use set_rows to fill it
+        self.set_rows(())
+
+    def see(self, index):
+        page = self._page_rows()
+        if index < self._top:
+            self._top = index
+        elif index >= self._top + page:
+            self._top = index - page + 1
+        self._clamp_top()
+        self._render()
+
+    def yview(self, *args):
+        if not args:
+            return self._fractions()
+        if args[0] == "moveto":
+            self._top = int(round(float(args[1]) * len(self.ids)))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self._page_rows() if args[2] == "pages" else 1)
+            self._top += step
+        self._clamp_top()
+        self._render()
+
+    # Internals
+
+    def _key(self, row_id):
+        return int(row_id)
+
+    def _page_rows(self):
+        height = self.canvas.winfo_height()
+        if height <= 1:  # Not mapped yet
+            height = int(self.canvas.cget("height"))
+        return max(1, height // self.row_height)
+
+    def _clamp_top(self):
+        self._top = max(0, min(self._top, len(self.ids) - self._page_rows()))
+
+    def _fractions(self):
+        if not self.ids:
+            return (0.0, 1.0)
+        return (self._top / len(self.ids), min(1.0, (self._top + self._page_rows()) / len(self.ids)))
+
+    def _render(self):
+        visible = self._page_rows() + 1  # One more for the partly visible row at the bottom
+        while len(self._items) < visible:
+            self._items.append(self._create_slot())
+        width = max(self.canvas.winfo_width(), int(self.canvas.cget("width")))
+        for slot, items in enumerate(self._items):
+            index = self._top + slot
+            if slot < visible and index < len(self.names):
+                self._draw_slot(items, index, slot * self.row_height)
+            else:
+                for item in items:
+                    self.canvas.itemconfigure(item, state="hidden")
+        if self._selected is not None and 0 <= self._selected - self._top < visible:
+            top = (self._selected - self._top) * self.row_height
+            self.canvas.coords(self._highlight, 0, top, width, top + self.row_height)
+            self.canvas.itemconfigure(self._highlight, state="normal")
+            self.canvas.tag_lower(self._highlight)
+        else:
+            self.canvas.itemconfigure(self._highlight, state="hidden")
+        self.scrollbar.set(*self._fractions())
+
+    def _create_slot(self):
+        # Canvas items making up one visible row: the text, then the marks drawn under it
+        marks = tuple(self.canvas.create_rectangle(0, 0, 0, 0, width=0, state="hidden") for _ in range(self.max_marks))
+        return (self.canvas.create_text(self.text_indent, 0, anchor="w", font=self.font),) + marks
+
+    def _draw_slot(self, items, index, top):
+        selected = index == self._selected
+        label, spans = None, ()
+        if self.decorate is not None:
+            label, spans = self.decorate(self.ids[index])
+        if label is None:
+            label = self.names[index]
+        self.canvas.coords(items[0], self.text_indent, top + self.row_height / 2)
+        self.canvas.itemconfigure(items[0], text=label, state="normal",
+                                  fill=self.select_foreground if selected else "black")
+        marks = items[1:1 + self.max_marks]
+        for mark, (start, end) in zip(marks, spans):
+            left = self.text_indent + self.font.measure(label[:start])
+            right = left + self.font.measure(label[start:end])
+            self.canvas.coords(mark, left, top + 1, right, top + self.row_height - 1)
+            # Outlined on the selected row so the selection colour still shows through
+            if selected:
+                self.canvas.itemconfigure(mark, state="normal", fill="", outline=self.mark_background, width=1)
+            else:
+                self.canvas.itemconfigure(mark, state="normal", fill=self.mark_background, outline="", width=0)
+        for mark in marks[len(spans):]:
+            self.canvas.itemconfigure(mark, state="hidden")
+
+    def _select_from_user(self, index):
+        index = max(0, min(index, len(self.ids) - 1))
+        if not self.ids or index == self._selected:
+            return
+        self._selected = index
+        self.see(index)
+        self.event_generate("<<ListboxSelect>>")
+
+    def _on_click(self, event):
+        self.canvas.focus_set()
+        index = self._top + int(event.y // self.row_height)
+        if index < len(self.ids):
+            self._select_from_user(index)
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.yview("scroll", -delta * 3, "units")
+
+    def _move_selection(self, step):
+        start = self._selected if self._selected is not None else (self._top - 1 if step > 0 else self._top + 1)
+        self._select_from_user(start + step)
+        return "break"
+
+class VirtualChecklist(VirtualListbox):
+    """
+    VirtualListbox with a check box on every row. Check state lives in a set of row
+    keys rather than one variable per row, so filling the list, checking everything
+    and reading the result never touch more widgets than are on screen.
+
+    Rows are (key, label) pairs; keys can be any hashable value, e.g. an equipment id
+    or a kit name. Clicking a row or pressing space toggles it.
+    """
+    def __init__(self, parent, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.box_size = max(8, self.row_height - 8)
+        self.text_indent = self.box_size + 10
+        self.checked = set()
+        self.canvas.bind("<space>", self._on_space)
+
+    def set_rows(self, rows, decorate=None):
+        self.checked = set()
+        super().set_rows(rows, decorate)
+
+    def check_all(self):
+        self.checked = set(self.ids)
+        self._render()
+
+    def clear_checks(self):
+        self.checked = set()
+        self._render()
+
+    def toggle(self, index):
+        key = self.ids[index]
+        if key in self.checked:
+            self.checked.discard(key)
+        else:
+            self.checked.add(key)
+        self._render()
+
+    def checked_keys(self):
+        """
+        :return: Keys of the checked rows, in display order.
+        """
+        return [key for key in self.ids if key in self.checked]
+
+    def _key(self, row_id):
+        return row_id
+
+    def _create_slot(self):
+        box = self.canvas.create_rectangle(0, 0, 0, 0, outline="black", fill="white")
+        tick = self.canvas.create_line(0, 0, 0, 0, fill="white", width=2)
+        return super()._create_slot() + (box, tick)
+
+    def _draw_slot(self, items, index, top):
+        super()._draw_slot(items, index, top)
+        box, tick = items[-2:]
+        left = 4
+        box_top = top + (self.row_height - self.box_size) / 2
+        size = self.box_size
+        checked = self.ids[index] in self.checked
+        self.canvas.coords(box, left, box_top, left + size, box_top + size)
+        self.canvas.itemconfigure(box, state="normal", fill=self.select_background if checked else "white")
+        self.canvas.coords(tick, left + size * 0.2, box_top + size * 0.55, left + size * 0.42, box_top + size * 0.78, left + size * 0.8, box_top + size * 0.25)
+        self.canvas.itemconfigure(tick, state="normal" if checked else "hidden")
+
+    def _on_click(self, event):
+        self.canvas.focus_set()
+        index = self._top + int(event.y // self.row_height)
+        if index < len(self.ids):
+            self._select_from_user(index)
+            self.toggle(index)
+
+    def _on_space(self, _):
+        if self._selected is not None:
+            self.toggle(self._selected)
+        return "break"